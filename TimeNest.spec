@@ -5,12 +5,12 @@ a = Analysis(
     ['C:\\Users\\ziyi127\\Desktop\\Dev\\TimeNest\\main.py'],
     pathex=[],
     binaries=[],
-    datas=[('C:\\Users\\ziyi127\\Desktop\\Dev\\TimeNest\\timetable.json', '.'), ('C:\\Users\\ziyi127\\Desktop\\Dev\\TimeNest\\TKtimetable.ico', '.'), ('C:\\Users\\ziyi127\\Desktop\\Dev\\TimeNest\\classtableMeta.json', '.'), ('C:\\Users\\ziyi127\\Desktop\\Dev\\TimeNest\\timetable_ui_settings.json', '.'), ('C:\\Users\\ziyi127\\Desktop\\Dev\\TimeNest\\ui', 'ui')],
+    datas=[('C:\\Users\\ziyi127\\Desktop\\Dev\\TimeNest\\timetable.json', '.'), ('C:\\Users\\ziyi127\\Desktop\\Dev\\TimeNest\\TKtimetable.ico', '.'), ('C:\\Users\\ziyi127\\Desktop\\Dev\\TimeNest\\classtableMeta.json', '.'), ('C:\\Users\\ziyi127\\Desktop\\Dev\\TimeNest\\timetable_ui_settings.json', '.'), ('C:\\Users\\ziyi127\\Desktop\\Dev\\TimeNest\\ui', 'ui'), ('C:\\Users\\ziyi127\\Desktop\\Dev\\TimeNest\\core', 'core')],
     hiddenimports=[],
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
-    excludes=['unittest', 'distutils', 'setuptools', 'pip', 'numpy', 'scipy', 'matplotlib', 'pandas', 'sklearn', 'tensorflow', 'torch', 'email', 'http', 'html', 'xml', 'urllib', 'ftplib', 'cgi', 'concurrent', 'multiprocessing', 'socket', 'ssl', 'sqlite3', 'mysql', 'psycopg2', 'pytest', 'nose'],
+    excludes=['unittest', 'distutils', 'setuptools', 'pip', 'numpy', 'scipy', 'matplotlib', 'pandas', 'sklearn', 'tensorflow', 'torch', 'email', 'http', 'html', 'xml', 'urllib', 'ftplib', 'cgi', 'concurrent', 'multiprocessing', 'socket', 'ssl', 'mysql', 'psycopg2', 'pytest', 'nose'],
     noarchive=False,
     optimize=0,
 )
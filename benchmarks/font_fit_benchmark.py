@@ -0,0 +1,102 @@
+# 此文件是字体适配的性能对比脚本：比较原来逐个字号向下测量的方式和FontFitCache的预测+二分查找
+# 用法: python benchmarks/font_fit_benchmark.py [--synthetic]
+# 有图形界面时使用真实的Tk字体测量；没有显示环境或指定--synthetic时使用按字符宽度估算的模拟测量，只比较测量次数
+import datetime
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.schedule_engine import ScheduleEngine
+from ui.font_fit import FontFitCache
+
+FONT_FAMILY = "Arial"
+START_SIZES = (12, 14, 16, 20)
+LABEL_WIDTHS = (120, 150, 200)
+
+
+def sample_timetable():
+    """生成用于产生界面文本的示例课表"""
+    subjects = ["语文", "数学", "英语", "物理", "化学", "生物", "历史", "地理", "信息技术与通用技术"]
+    times = [("08:00", "08:45"), ("08:55", "09:40"), ("10:00", "10:45"), ("10:55", "11:40"),
+             ("14:00", "14:45"), ("14:55", "15:40"), ("16:00", "16:45")]
+    timetable = {}
+    for day_index, day in enumerate(["monday", "tuesday", "wednesday", "thursday", "friday"]):
+        timetable[day] = [
+            {"subject": subjects[(day_index + i) % len(subjects)], "start_time": start, "end_time": end}
+            for i, (start, end) in enumerate(times)
+        ]
+    return timetable
+
+
+def collect_texts():
+    """按分钟扫描一周，收集update_info会显示的所有文本"""
+    engine = ScheduleEngine(sample_timetable())
+    start = datetime.datetime(2026, 9, 7)
+    texts = set()
+    for minute in range(0, 7 * 24 * 60, 1):
+        state = engine.evaluate(start + datetime.timedelta(minutes=minute))
+        texts.add(state.class_info_text)
+        texts.add(state.next_class_text)
+    return sorted(texts)
+
+
+class SyntheticFontFitCache(FontFitCache):
+    """不依赖显示环境的模拟测量：中文字符按一个字号宽，其余字符按0.55个字号宽，并模拟取整误差"""
+
+    def measure(self, family, size, text):
+        self.measurements += 1
+        return sum(size if ord(char) > 0x2E80 else int(size * 0.55 + 0.5) for char in text)
+
+
+def linear_fit(fitter, family, size, text, width):
+    """原来_adjust_font_size的逐个字号向下查找"""
+    for candidate in range(size, 7, -1):
+        if fitter.measure(family, candidate, text) < width:
+            return candidate
+    return 8
+
+
+def run(fitter_class):
+    texts = collect_texts()
+    cases = [(size, text, width) for size in START_SIZES for text in texts for width in LABEL_WIDTHS]
+
+    linear = fitter_class()
+    started = time.perf_counter()
+    linear_results = [linear_fit(linear, FONT_FAMILY, size, text, width) for size, text, width in cases]
+    linear_time = time.perf_counter() - started
+
+    fitted = fitter_class()
+    started = time.perf_counter()
+    fitted_results = [fitted.search(FONT_FAMILY, size, text, width) for size, text, width in cases]
+    fitted_time = time.perf_counter() - started
+
+    differences = sum(1 for a, b in zip(linear_results, fitted_results) if a != b)
+    print(f"文本 {len(texts)} 条，测试用例 {len(cases)} 个")
+    print(f"逐个字号查找: 测量 {linear.measurements} 次，平均每次 {linear.measurements / len(cases):.2f} 次，"
+          f"耗时 {linear_time * 1000:.1f} 毫秒")
+    print(f"预测+二分查找: 测量 {fitted.measurements} 次，平均每次 {fitted.measurements / len(cases):.2f} 次，"
+          f"耗时 {fitted_time * 1000:.1f} 毫秒")
+    print(f"结果不同的用例: {differences} 个")
+
+
+def main():
+    if "--synthetic" not in sys.argv:
+        try:
+            import tkinter as tk
+            root = tk.Tk()
+            root.withdraw()
+        except Exception as e:
+            print(f"无法创建Tk窗口，改用模拟测量: {e}")
+        else:
+            print("使用Tk字体测量")
+            run(FontFitCache)
+            root.destroy()
+            return
+    print("使用模拟测量")
+    run(SyntheticFontFitCache)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+# 此文件是悬浮窗两种渲染方式的性能对比脚本：Frame+四个Label的grid布局 与 单画布itemconfig
+# 用法: python benchmarks/render_benchmark.py [秒数]
+# 需要图形界面。模拟指定秒数的每秒刷新（默认一小时），统计Tk配置调用、布局事件和耗时
+import datetime
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import tkinter as tk
+import tkinter.font as tkFont
+
+from core.schedule_engine import ScheduleEngine, WEEKDAYS_CN
+from ui.canvas_renderer import CanvasRenderer
+from ui.font_fit import FontFitCache
+from ui.label_renderer import LabelRenderer
+
+WIDTH, HEIGHT = 280, 80
+
+
+def sample_timetable():
+    """生成示例课表"""
+    subjects = ["语文", "数学", "英语", "物理", "化学", "生物", "历史"]
+    times = [("08:00", "08:45"), ("08:55", "09:40"), ("10:00", "10:45"), ("10:55", "11:40"),
+             ("14:00", "14:45"), ("14:55", "15:40"), ("16:00", "16:45")]
+    return {day: [{"subject": subject, "start_time": start, "end_time": end}
+                  for subject, (start, end) in zip(subjects, times)]
+            for day in ["monday", "tuesday", "wednesday", "thursday", "friday"]}
+
+
+def build_labels(root):
+    """按DragWindow的方式创建Frame和四个Label"""
+    frame = tk.Frame(root)
+    frame.grid(sticky='nsew')
+    for index in range(2):
+        frame.columnconfigure(index, weight=1)
+        frame.rowconfigure(index, weight=1)
+    labels = []
+    for row, column, size, wraplength in ((0, 0, 18, 0), (1, 0, 16, 0), (0, 1, 13, 150), (1, 1, 13, 150)):
+        label = tk.Label(frame, font=tkFont.Font(family="Arial", size=size), wraplength=wraplength)
+        label.grid(row=row, column=column, sticky='nsew', padx=2, pady=2)
+        labels.append(label)
+    return frame, labels
+
+
+def build_canvas(root):
+    """创建单画布和四个文本项"""
+    renderer = CanvasRenderer(root, "white", WIDTH, HEIGHT)
+    items = [renderer.add_text(row, column, tkFont.Font(family="Arial", size=size), "black", wraplength)
+             for row, column, size, wraplength in ((0, 0, 18, 0), (1, 0, 16, 0), (0, 1, 13, 150), (1, 1, 13, 150))]
+    return renderer, items
+
+
+def simulate(root, labels, seconds):
+    """模拟每秒刷新：时间和日期每秒更新，课程信息由引擎计算，文字变化时调整字号，每次刷新后处理布局"""
+    engine = ScheduleEngine(sample_timetable())
+    label_renderer = LabelRenderer()
+    font_fit_cache = FontFitCache()
+    configure_events = [0]
+    for label in labels:
+        if isinstance(label, tk.Widget):
+            label.bind("<Configure>", lambda event: configure_events.__setitem__(0, configure_events[0] + 1))
+
+    def fit(label, text, use_glyph_table):
+        family, size = label_renderer.get(label, "font") or ("Arial", tkFont.nametofont(str(label['font']))['size'])
+        size = font_fit_cache.fit(family, size, text, label.winfo_width(), use_glyph_table)
+        label_renderer.render(label, font=(family, size))
+
+    start = datetime.datetime(2026, 9, 7, 7, 30)
+    started = time.perf_counter()
+    for second in range(seconds):
+        now = start + datetime.timedelta(seconds=second)
+        state = engine.evaluate(now)
+        texts = (now.strftime("%H:%M:%S"), f"{now.strftime('%m-%d')} {WEEKDAYS_CN[now.weekday()]}",
+                 state.class_info_text, state.next_class_text)
+        for index, (label, text) in enumerate(zip(labels, texts)):
+            if label_renderer.render(label, text=text):
+                fit(label, text, index < 2)
+        root.update_idletasks()
+    elapsed = time.perf_counter() - started
+    return elapsed, label_renderer.stats(), configure_events[0]
+
+
+def main():
+    seconds = int(sys.argv[1]) if len(sys.argv) > 1 else 3600
+    try:
+        root = tk.Tk()
+    except tk.TclError as e:
+        print(f"需要图形界面才能运行: {e}")
+        return
+    root.geometry(f"{WIDTH}x{HEIGHT}")
+
+    frame, labels = build_labels(root)
+    root.update()
+    elapsed, stats, configure_events = simulate(root, labels, seconds)
+    print(f"Label布局: {seconds}次刷新耗时 {elapsed * 1000:.1f} 毫秒（每次 {elapsed / seconds * 1000000:.0f} 微秒），"
+          f"配置调用 {stats['issued']} 次，布局事件 {configure_events} 次")
+    frame.destroy()
+
+    renderer, items = build_canvas(root)
+    root.update()
+    elapsed, stats, _ = simulate(root, items, seconds)
+    canvas_stats = renderer.stats()
+    print(f"单画布: {seconds}次刷新耗时 {elapsed * 1000:.1f} 毫秒（每次 {elapsed / seconds * 1000000:.0f} 微秒），"
+          f"itemconfig调用 {canvas_stats['itemconfig_calls']} 次，重新布局 {canvas_stats['layout_passes']} 次")
+    root.destroy()
+
+
+if __name__ == "__main__":
+    main()
@@ -67,6 +67,7 @@ def get_nuitka_command(current_dir):
         '--windows-disable-console',  # Windows下禁用控制台
         '--follow-imports',  # 跟随导入
         '--include-data-dir=' + os.path.join(current_dir, 'ui') + '=ui',  # 包含UI目录
+        '--include-data-dir=' + os.path.join(current_dir, 'core') + '=core',  # 包含课程表引擎目录
         '--no-prefer-source-code',  # 不优先使用源代码
         '--python-flag=no_site',  # 不加载site模块
         '--python-flag=no_warnings',  # 不显示警告
@@ -96,7 +97,6 @@ def get_nuitka_command(current_dir):
         '--nofollow-import-to=multiprocessing',
         '--nofollow-import-to=socket',
         '--nofollow-import-to=ssl',
-        '--nofollow-import-to=sqlite3',
         '--nofollow-import-to=mysql',
         '--nofollow-import-to=psycopg2',
         '--nofollow-import-to=pytest',
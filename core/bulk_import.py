@@ -0,0 +1,334 @@
+# 此文件是全校课表的批量导入工具，不依赖tkinter
+# 从教务导出的CSV或XLSX表格中逐行读取（每行为某个班级某天的一节课），按班级拆分，
+# 为每个班级生成timetable.json和classtableMeta.json（或课程表数据库timetable.db）
+# XLSX只用标准库zipfile和iterparse逐行解析，读完的行立即释放；按班级缓存的记录超过上限时写入临时文件，
+# 每个班级只输出一次，内存占用与表格大小和行的顺序无关
+#
+# 用法: python -m core.bulk_import 全校课表.xlsx 输出目录 [--sheet 工作表名] [--db] [--rotation-start 2026-08-31]
+import argparse
+import csv
+import datetime
+import hashlib
+import json
+import os
+import re
+import sys
+import tempfile
+import zipfile
+import xml.etree.ElementTree as ET
+
+from core.class_repository import INVALID_NAME_CHARACTERS
+from core.schedule_engine import WEEKDAYS_EN, WEEKDAYS_CN
+from core.timetable_store import TimetableStore
+
+# 表头名称（中文或英文，不区分大小写）-> 字段
+HEADER_ALIASES = {
+    "class": "class", "班级": "class", "class_id": "class",
+    "day": "day", "星期": "day", "weekday": "day",
+    "period": "period", "节次": "period", "第几节": "period",
+    "start_time": "start_time", "开始时间": "start_time", "上课时间": "start_time",
+    "end_time": "end_time", "结束时间": "end_time", "下课时间": "end_time",
+    "subject": "subject", "课程": "subject", "科目": "subject",
+    "teacher": "teacher", "教师": "teacher", "老师": "teacher",
+    "classroom": "classroom", "教室": "classroom",
+    "week": "week", "轮换周": "week", "周次": "week",
+}
+REQUIRED_FIELDS = ("class", "day", "period", "subject")
+
+# 星期的各种写法 -> 英文星期键
+DAY_ALIASES = {}
+for _index, (_day_en, _day_cn) in enumerate(zip(WEEKDAYS_EN, WEEKDAYS_CN)):
+    for _alias in (_day_en, _day_en[:3], _day_cn, "星期" + _day_cn[1], str(_index + 1)):
+        DAY_ALIASES[_alias] = _day_en
+DAY_ALIASES["星期天"] = DAY_ALIASES["周天"] = "sunday"
+
+SPREADSHEET_NS = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+RELATIONSHIP_NS = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+PACKAGE_RELATIONSHIP_NS = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+
+# 按班级拆分时内存中最多缓存的课程记录数，超出时追加到各班级的临时文件
+SPOOL_LIMIT = 50000
+
+
+# ---- 读取表格 ----
+
+def iter_csv_rows(path, encoding="utf-8-sig"):
+    """逐行读取CSV文件"""
+    with open(path, 'r', encoding=encoding, newline='') as f:
+        for row in csv.reader(f):
+            yield row
+
+
+def _column_index(cell_ref):
+    """单元格引用（如"C12"）的列序号，从0开始"""
+    index = 0
+    for char in cell_ref:
+        if not char.isalpha():
+            break
+        index = index * 26 + ord(char.upper()) - ord('A') + 1
+    return index - 1
+
+
+def _sheet_path(archive, sheet_name=None):
+    """在工作簿中查找工作表文件，不指定名称时为第一个工作表"""
+    workbook = ET.fromstring(archive.read("xl/workbook.xml"))
+    relations = ET.fromstring(archive.read("xl/_rels/workbook.xml.rels"))
+    targets = {rel.get("Id"): rel.get("Target") for rel in relations.iter(PACKAGE_RELATIONSHIP_NS + "Relationship")}
+    for sheet in workbook.iter(SPREADSHEET_NS + "sheet"):
+        if sheet_name is None or sheet.get("name") == sheet_name:
+            target = targets[sheet.get(RELATIONSHIP_NS + "id")]
+            return target.lstrip("/") if target.startswith("/") else "xl/" + target
+    raise ValueError(f"工作簿中没有名为{sheet_name}的工作表")
+
+
+def _shared_strings(archive):
+    """读取共享字符串表（只保存不重复的字符串，与行数无关）"""
+    if "xl/sharedStrings.xml" not in archive.namelist():
+        return []
+    strings = []
+    root = None
+    with archive.open("xl/sharedStrings.xml") as f:
+        for event, element in ET.iterparse(f, events=("start", "end")):
+            if root is None:
+                root = element
+            if event == "end" and element.tag == SPREADSHEET_NS + "si":
+                strings.append("".join(text.text or "" for text in element.iter(SPREADSHEET_NS + "t")))
+                # 从根元素上移除已读取的字符串，否则空元素会一直留在树中
+                root.remove(element)
+    return strings
+
+
+def iter_xlsx_rows(path, sheet_name=None):
+    """逐行读取XLSX工作表，每读完一行就把该行的XML元素从sheetData中移除，内存占用与行数无关"""
+    with zipfile.ZipFile(path) as archive:
+        shared_strings = _shared_strings(archive)
+        with archive.open(_sheet_path(archive, sheet_name)) as f:
+            sheet_data = None
+            for event, element in ET.iterparse(f, events=("start", "end")):
+                if event == "start":
+                    if element.tag == SPREADSHEET_NS + "sheetData":
+                        sheet_data = element
+                    continue
+                if element.tag != SPREADSHEET_NS + "row":
+                    continue
+                row = []
+                for cell in element.iter(SPREADSHEET_NS + "c"):
+                    column = _column_index(cell.get("r", "")) if cell.get("r") else len(row)
+                    cell_type = cell.get("t")
+                    if cell_type == "inlineStr":
+                        value = "".join(text.text or "" for text in cell.iter(SPREADSHEET_NS + "t"))
+                    else:
+                        value_element = cell.find(SPREADSHEET_NS + "v")
+                        value = value_element.text if value_element is not None and value_element.text else ""
+                        if cell_type == "s" and value:
+                            value = shared_strings[int(value)]
+                    # 空单元格不会出现在XML中，按列号补齐
+                    row.extend([""] * (column - len(row)))
+                    row.append(value)
+                # 只清空元素时空的<row>仍挂在sheetData上，会随行数累积
+                if sheet_data is not None:
+                    sheet_data.remove(element)
+                element.clear()
+                yield row
+
+
+def iter_rows(path, sheet_name=None, encoding="utf-8-sig"):
+    """按扩展名逐行读取CSV或XLSX文件"""
+    if path.lower().endswith(".xlsx"):
+        return iter_xlsx_rows(path, sheet_name)
+    return iter_csv_rows(path, encoding)
+
+
+# ---- 解析记录 ----
+
+def _normalize_time(value):
+    """统一时间格式为HH:MM，兼容Excel中以一天的小数保存的时间（如0.3333为08:00）"""
+    value = value.strip()
+    try:
+        fraction = float(value)
+    except ValueError:
+        match = re.match(r"^(\d{1,2}):(\d{2})", value)
+        return f"{int(match.group(1)):02d}:{match.group(2)}" if match else value
+    minutes = round(fraction % 1 * 24 * 60)
+    return f"{minutes // 60 % 24:02d}:{minutes % 60:02d}"
+
+
+def _to_int(value):
+    """整数单元格（XLSX中可能是"3.0"）转换为int"""
+    return int(float(value))
+
+
+def iter_records(rows):
+    """把表格行转换为课程记录字典，第一行（或第一个包含必需列的行）为表头，跳过空行"""
+    fields = None
+    for line_number, row in enumerate(rows, start=1):
+        cells = [str(cell).strip() for cell in row]
+        if not any(cells):
+            continue
+        if fields is None:
+            fields = [HEADER_ALIASES.get(cell.lower()) for cell in cells]
+            missing = [field for field in REQUIRED_FIELDS if field not in fields]
+            if missing:
+                raise ValueError(f"表头缺少必需的列: {', '.join(missing)}")
+            continue
+
+        record = {field: cell for field, cell in zip(fields, cells) if field}
+        try:
+            day = DAY_ALIASES.get(record["day"].lower(), DAY_ALIASES.get(record["day"]))
+            if day is None:
+                raise ValueError(f"无法识别的星期: {record['day']}")
+            yield {
+                "class": record["class"],
+                "week": _to_int(record["week"]) if record.get("week") else 1,
+                "day": day,
+                "period": _to_int(record["period"]),
+                "slot": {
+                    "start_time": _normalize_time(record.get("start_time", "")),
+                    "end_time": _normalize_time(record.get("end_time", "")),
+                    "subject": record["subject"],
+                    "teacher": record.get("teacher", ""),
+                    "classroom": record.get("classroom", "")
+                }
+            }
+        except (KeyError, ValueError) as e:
+            print(f"跳过第{line_number}行: {e}")
+
+
+# ---- 输出 ----
+
+def build_timetable(records, rotation_start=""):
+    """把一个班级的课程记录整理为timetable.json格式（第2周起的记录放入轮换设置）"""
+    weeks = {}
+    for record in records:
+        weeks.setdefault(record["week"], {}).setdefault(record["day"], {})[record["period"]] = record["slot"]
+
+    def ordered(days):
+        return {day: [periods[period] for period in sorted(periods)] for day, periods in days.items()}
+
+    data = {"timetable": ordered(weeks.get(1, {}))}
+    cycle_weeks = max(weeks)
+    if cycle_weeks > 1:
+        data["rotation"] = {
+            "start_date": rotation_start,
+            "cycle_weeks": cycle_weeks,
+            "weeks": {str(week): ordered(days) for week, days in sorted(weeks.items()) if week > 1}
+        }
+    return data
+
+
+def class_directory(output_dir, class_id):
+    """班级的输出目录，班级名中不能用于文件名的字符替换为下划线，班级名为空、.或..时输出到_目录"""
+    name = re.sub(INVALID_NAME_CHARACTERS, "_", class_id).strip()
+    return os.path.join(output_dir, name if name not in ("", ".", "..") else "_")
+
+
+class ClassWriter:
+    """把每个班级的课表写入各自的目录：JSON格式为timetable.json和classtableMeta.json，数据库格式为timetable.db"""
+
+    def __init__(self, output_dir, use_database=False, rotation_start=""):
+        self.output_dir = output_dir
+        self.use_database = use_database
+        self.rotation_start = rotation_start
+        # 已输出的班级（只保存班级名）
+        self.written = set()
+        # 已使用的输出目录名（统一为小写，兼容不区分大小写的文件系统）-> 班级名
+        self.directories = {}
+
+    def _directory(self, class_id):
+        """班级的输出目录；不同班级的目录名替换字符后相同时，后一个班级的目录名加上班级名的散列值"""
+        directory = class_directory(self.output_dir, class_id)
+        key = os.path.basename(directory).lower()
+        if key in self.directories:
+            suffix = hashlib.sha1(class_id.encode("utf-8")).hexdigest()[:8]
+            directory = f"{directory}_{suffix}"
+            print(f"班级{class_id}与班级{self.directories[key]}的目录名相同，输出到{os.path.basename(directory)}")
+            key = os.path.basename(directory).lower()
+        self.directories[key] = class_id
+        return directory
+
+    def write(self, class_id, records):
+        """输出一个班级的全部课程记录（每个班级只调用一次）"""
+        directory = self._directory(class_id)
+        os.makedirs(directory, exist_ok=True)
+        data = build_timetable(records, self.rotation_start)
+
+        if self.use_database:
+            store = TimetableStore(os.path.join(directory, "timetable.db"))
+        else:
+            # JSON格式也经过内存中的课程表数据库转换，与程序导出的格式完全一致
+            store = TimetableStore(":memory:")
+        try:
+            store.replace_timetable(data)
+            if not self.use_database:
+                store.export_files(os.path.join(directory, "timetable.json"),
+                                   os.path.join(directory, "classtableMeta.json"))
+        finally:
+            store.close()
+        self.written.add(class_id)
+
+
+def _spool(buffers, spool_paths, spool_dir):
+    """把缓存的课程记录追加到各班级的临时文件，并清空缓存"""
+    for class_id, buffer in buffers.items():
+        if class_id not in spool_paths:
+            spool_paths[class_id] = os.path.join(spool_dir, f"{len(spool_paths)}.jsonl")
+        with open(spool_paths[class_id], 'a', encoding='utf-8') as f:
+            f.writelines(json.dumps(record, ensure_ascii=False) + "\n" for record in buffer)
+    buffers.clear()
+
+
+def import_records(records, writer, spool_limit=SPOOL_LIMIT):
+    """按班级拆分课程记录，读完后每个班级只输出一次，返回输出的班级数
+
+    教务系统导出的表格通常按星期或节次排序，同一班级的行并不连续。读取时按班级缓存记录，
+    缓存超过spool_limit条时追加到各班级的临时文件，内存占用与表格大小无关。
+    """
+    # 班级按第一次出现的顺序输出
+    class_ids = {}
+    buffers = {}
+    spool_paths = {}
+    buffered = 0
+    with tempfile.TemporaryDirectory(prefix="timenest_import_") as spool_dir:
+        for record in records:
+            class_ids.setdefault(record["class"], None)
+            buffers.setdefault(record["class"], []).append(record)
+            buffered += 1
+            if buffered >= spool_limit:
+                _spool(buffers, spool_paths, spool_dir)
+                buffered = 0
+
+        for class_id in class_ids:
+            class_records = []
+            if class_id in spool_paths:
+                with open(spool_paths[class_id], 'r', encoding='utf-8') as f:
+                    class_records = [json.loads(line) for line in f]
+            class_records.extend(buffers.pop(class_id, []))
+            writer.write(class_id, class_records)
+    return len(writer.written)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="从CSV或XLSX表格批量导入全校课表，按班级输出")
+    parser.add_argument("source", help="CSV或XLSX文件，每行为某个班级某天的一节课")
+    parser.add_argument("output_dir", help="输出目录，每个班级一个子目录")
+    parser.add_argument("--sheet", help="XLSX中要读取的工作表名称，默认为第一个工作表")
+    parser.add_argument("--encoding", default="utf-8-sig", help="CSV文件的编码，默认为utf-8-sig（教务系统导出的文件可能是gbk）")
+    parser.add_argument("--db", action="store_true", help="输出为课程表数据库timetable.db，而不是两个JSON文件")
+    parser.add_argument("--rotation-start", default="", help="有轮换周时第1周中的任意一天（YYYY-MM-DD）")
+    args = parser.parse_args(argv)
+
+    if args.rotation_start:
+        try:
+            datetime.datetime.strptime(args.rotation_start, "%Y-%m-%d")
+        except ValueError:
+            parser.error("--rotation-start的格式应为YYYY-MM-DD")
+
+    writer = ClassWriter(args.output_dir, args.db, args.rotation_start)
+    records = iter_records(iter_rows(args.source, args.sheet, args.encoding))
+    count = import_records(records, writer)
+    print(f"导入完成，共{count}个班级，输出到{args.output_dir}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,233 @@
+# 此文件是多个班级课表的仓库，不依赖tkinter
+# 以班级ID为键管理课表：课程表数据库在第一次使用时才打开，编译好的课程表引擎保存在容量有限的LRU中，
+# 超出容量时丢弃最久没有使用的班级。支持两种保存方式：
+#   directory：根目录下每个班级一个子目录（timetable.db，以及作为导入导出格式的timetable.json和classtableMeta.json），
+#              与批量导入工具的输出相同
+#   database：所有班级保存在同一个数据库文件中，以班级ID区分
+import collections
+import json
+import os
+import re
+import sqlite3
+
+from core.schedule_engine import ScheduleEngine, normalize_timetable
+from core.timetable_store import TimetableStore, file_signature, list_class_ids
+
+STORAGE_DIRECTORY = "directory"
+STORAGE_DATABASE = "database"
+
+# 默认最多保留多少个班级的编译结果
+DEFAULT_CAPACITY = 16
+
+# 不能用于文件名（目录名）的字符
+INVALID_NAME_CHARACTERS = r'[\\/:*?"<>|]'
+
+
+def is_class_directory(directory):
+    """目录中是否有课表（timetable.db、timetable.json或classtableMeta.json）"""
+    return any(os.path.exists(os.path.join(directory, name))
+               for name in ("timetable.db", "timetable.json", "classtableMeta.json"))
+
+
+def load_class_directory(directory):
+    """读取一个课表目录，返回 (timetable数据, classtableMeta数据)
+
+    只读取不修改：JSON文件比数据库新时在内存中导入。
+    """
+    timetable_path = os.path.join(directory, "timetable.json")
+    meta_path = os.path.join(directory, "classtableMeta.json")
+    db_path = os.path.join(directory, "timetable.db")
+    has_files = os.path.exists(timetable_path) or os.path.exists(meta_path)
+
+    store = TimetableStore(db_path) if os.path.exists(db_path) else None
+    try:
+        if store is None or (has_files and store.source_changed(timetable_path, meta_path)):
+            if store is not None:
+                store.close()
+            store = TimetableStore(":memory:")
+            store.import_files(timetable_path, meta_path)
+        return store.export_timetable(), store.export_classtable_meta()
+    finally:
+        store.close()
+
+
+def build_engine(data, classtable_meta, calendar=None):
+    """用timetable.json格式的课表和classtableMeta数据创建课程表引擎"""
+    return ScheduleEngine(normalize_timetable(data), classtable_meta, calendar, data.get("rotation"))
+
+
+class ClassRepository:
+    """按班级ID读取和修改多个班级的课表
+
+    root在directory方式下为各班级目录的上级目录，在database方式下为数据库文件；
+    calendar_path为所有班级共用的学期日历（可选）。
+    """
+
+    def __init__(self, root, storage=STORAGE_DIRECTORY, capacity=DEFAULT_CAPACITY, calendar_path=None):
+        if storage not in (STORAGE_DIRECTORY, STORAGE_DATABASE):
+            raise ValueError(f"不支持的课表保存方式: {storage}")
+        self.root = root
+        self.storage = storage
+        self.capacity = max(1, capacity)
+        self.calendar_path = calendar_path
+        # database方式下所有班级共用的连接，第一次使用时才打开
+        self.connection = None
+        # 已打开的课程表数据库：班级ID -> TimetableStore（只有需要修改课表的班级才保持打开）
+        self.stores = {}
+        # 编译结果的LRU：班级ID -> (数据版本, 课程表引擎)，最近使用的在末尾
+        self.engines = collections.OrderedDict()
+        # 学期日历的文件状态和内容
+        self.calendar_signature = None
+        self.calendar = None
+        # 统计信息
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    # ---- 班级和存储 ----
+
+    def _connection(self):
+        if self.connection is None:
+            directory = os.path.dirname(os.path.abspath(self.root))
+            os.makedirs(directory, exist_ok=True)
+            self.connection = sqlite3.connect(self.root)
+            # 创建存储对象时会按需升级数据库结构
+            TimetableStore(self.root, "", self.connection)
+        return self.connection
+
+    def class_ids(self):
+        """所有班级的ID，按名称排序"""
+        if self.storage == STORAGE_DATABASE:
+            if self.connection is None and not os.path.exists(self.root):
+                return []
+            return list_class_ids(self._connection())
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(name for name in os.listdir(self.root) if is_class_directory(os.path.join(self.root, name)))
+
+    def validate_class_id(self, class_id):
+        """检查班级ID，不能作为班级ID时抛出ValueError
+
+        directory方式下班级ID是根目录下的目录名，不能包含路径分隔符等字符，也不能是.或..，
+        否则课表会写到根目录之外。
+        """
+        if not class_id:
+            raise ValueError("班级ID不能为空")
+        if self.storage == STORAGE_DIRECTORY and (re.search(INVALID_NAME_CHARACTERS, class_id)
+                                                  or class_id.strip() in (".", "..")):
+            raise ValueError(f"班级名称不能包含 \\ / : * ? \" < > | 等字符，也不能是.或..: {class_id}")
+
+    def class_directory(self, class_id):
+        """directory方式下班级的目录，database方式下为None"""
+        if self.storage == STORAGE_DATABASE:
+            return None
+        self.validate_class_id(class_id)
+        return os.path.join(self.root, class_id)
+
+    def source_paths(self, class_id):
+        """班级的timetable.json和classtableMeta.json（database方式下没有JSON文件，返回空列表）"""
+        directory = self.class_directory(class_id)
+        if directory is None:
+            return []
+        return [os.path.join(directory, "timetable.json"), os.path.join(directory, "classtableMeta.json")]
+
+    def store(self, class_id):
+        """返回班级的课程表数据库（不存在时创建），JSON文件在上次导入导出后被修改过时先导入"""
+        self.validate_class_id(class_id)
+        store = self.stores.get(class_id)
+        if store is None:
+            if self.storage == STORAGE_DATABASE:
+                store = TimetableStore(self.root, class_id, self._connection())
+            else:
+                directory = self.class_directory(class_id)
+                os.makedirs(directory, exist_ok=True)
+                store = TimetableStore(os.path.join(directory, "timetable.db"))
+            self.stores[class_id] = store
+        paths = self.source_paths(class_id)
+        if any(os.path.exists(path) for path in paths) and store.source_changed(*paths):
+            print(f"发现更新的课程表文件，正在导入班级{class_id}的课程表数据库...")
+            store.import_files(*paths)
+        return store
+
+    # ---- 编译结果 ----
+
+    def _load_calendar(self):
+        """读取学期日历，文件改变时重新读取"""
+        if not self.calendar_path:
+            return None
+        signature = file_signature([self.calendar_path])
+        if signature != self.calendar_signature:
+            self.calendar_signature = signature
+            self.calendar = None
+            if os.path.exists(self.calendar_path):
+                with open(self.calendar_path, 'r', encoding='utf-8') as f:
+                    self.calendar = json.load(f)
+            # 学期日历影响所有班级的编译结果
+            self.engines.clear()
+        return self.calendar
+
+    def _data_version(self, class_id):
+        """判断编译结果是否过期的依据：本进程中的修改次数，以及其他进程的修改
+        （directory方式下为各文件的状态，database方式下为SQLite的data_version）"""
+        store = self.stores.get(class_id)
+        revision = (id(store), store.revision) if store is not None else None
+        directory = self.class_directory(class_id)
+        if directory is None:
+            return revision, self._connection().execute("PRAGMA data_version").fetchone()[0]
+        return revision, file_signature([os.path.join(directory, "timetable.db")] + self.source_paths(class_id))
+
+    def engine(self, class_id):
+        """返回班级编译好的课程表引擎，最近使用过且数据没有改变时直接返回LRU中的结果"""
+        calendar = self._load_calendar()
+        version = self._data_version(class_id)
+        cached = self.engines.get(class_id)
+        if cached is not None and cached[0] == version:
+            self.engines.move_to_end(class_id)
+            self.hits += 1
+            return cached[1]
+
+        self.misses += 1
+        opened_here = class_id not in self.stores
+        store = self.store(class_id)
+        engine = build_engine(store.export_timetable(), store.export_classtable_meta(), calendar)
+        if opened_here:
+            # 只是为了编译而打开的数据库不保持打开，避免同时打开大量文件
+            self.stores.pop(class_id).close()
+        self.engines[class_id] = (self._data_version(class_id), engine)
+        self.engines.move_to_end(class_id)
+        while len(self.engines) > self.capacity:
+            self.engines.popitem(last=False)
+            self.evictions += 1
+        return engine
+
+    def invalidate(self, class_id):
+        """丢弃班级的编译结果，下次使用时重新编译"""
+        self.engines.pop(class_id, None)
+
+    # ---- 保存和关闭 ----
+
+    def flush(self):
+        """directory方式下把有改动的班级导出为timetable.json和classtableMeta.json"""
+        for class_id, store in self.stores.items():
+            paths = self.source_paths(class_id)
+            if store.dirty and paths:
+                try:
+                    store.export_files(*paths)
+                except Exception as e:
+                    print(f"导出班级{class_id}的课程表时出错: {e}")
+
+    def close(self):
+        """导出有改动的班级并关闭所有数据库"""
+        self.flush()
+        for store in self.stores.values():
+            store.close()
+        self.stores = {}
+        self.engines.clear()
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+    def stats(self):
+        """LRU的命中、未命中和淘汰次数"""
+        return {"cached": len(self.engines), "capacity": self.capacity,
+                "hits": self.hits, "misses": self.misses, "evictions": self.evictions}
@@ -0,0 +1,95 @@
+# 此文件是预编译课表的缓存，不依赖tkinter
+# 课程表引擎的预编译结果用pickle保存在数据文件旁边，以各数据文件的大小、修改时间和内容哈希为键：
+# 大小和修改时间都没变时直接使用缓存；只有修改时间变了（内容哈希相同）时也使用缓存并更新键；其余情况重新编译
+import hashlib
+import os
+import pickle
+
+# 缓存格式版本，预编译结果的结构改变时加1，旧缓存会被忽略
+CACHE_FORMAT = 2
+
+
+def _file_hash(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def _source_entry(path):
+    """数据文件的 (大小, 修改时间, 内容哈希)，文件不存在时返回None"""
+    try:
+        stat = os.stat(path)
+        return stat.st_size, stat.st_mtime_ns, _file_hash(path)
+    except OSError:
+        return None
+
+
+class CompiledCache:
+    """以source_paths中各文件为键的预编译结果缓存"""
+
+    def __init__(self, cache_path, source_paths):
+        self.cache_path = cache_path
+        self.source_paths = list(source_paths)
+        # 统计信息
+        self.hits = 0
+        self.misses = 0
+
+    def _sources_match(self, stored_sources):
+        """检查数据文件是否与缓存记录的一致，返回 (是否一致, 是否只有修改时间变化)"""
+        if len(stored_sources) != len(self.source_paths):
+            return False, False
+        touched = False
+        for path, stored in zip(self.source_paths, stored_sources):
+            try:
+                stat = os.stat(path)
+            except OSError:
+                if stored is not None:
+                    return False, False
+                continue
+            if stored is None or stat.st_size != stored[0]:
+                return False, False
+            if stat.st_mtime_ns != stored[1]:
+                # 修改时间变了，再比较内容哈希
+                if _file_hash(path) != stored[2]:
+                    return False, False
+                touched = True
+        return True, touched
+
+    def load(self):
+        """返回缓存的预编译结果，缓存不存在、已过期或损坏时返回None"""
+        try:
+            if not os.path.exists(self.cache_path):
+                self.misses += 1
+                return None
+            with open(self.cache_path, 'rb') as f:
+                cached = pickle.load(f)
+            if cached.get("format") != CACHE_FORMAT:
+                self.misses += 1
+                return None
+            matched, touched = self._sources_match(cached["sources"])
+            if not matched:
+                self.misses += 1
+                return None
+            self.hits += 1
+            # 只有修改时间变化时更新键，下次启动不必再计算哈希
+            if touched:
+                self.save(cached["state"])
+            return cached["state"]
+        except Exception as e:
+            print(f"读取课表缓存时出错: {e}")
+            self.misses += 1
+            return None
+
+    def save(self, state):
+        """保存预编译结果，先写临时文件再替换，写入失败时只输出错误"""
+        try:
+            cached = {
+                "format": CACHE_FORMAT,
+                "sources": [_source_entry(path) for path in self.source_paths],
+                "state": state
+            }
+            temp_path = self.cache_path + ".tmp"
+            with open(temp_path, 'wb') as f:
+                pickle.dump(cached, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temp_path, self.cache_path)
+        except Exception as e:
+            print(f"保存课表缓存时出错: {e}")
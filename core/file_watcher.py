@@ -0,0 +1,125 @@
+# 此文件是课程表文件的变更检测，不依赖tkinter
+# Linux下优先用inotify（通过ctypes调用libc）监听所在目录的写入、替换和删除事件，
+# 其他系统或inotify不可用时比较文件的大小和修改时间；
+# 发现可能的变化后再比较文件内容的哈希值，只修改了时间等元数据时不报告变化
+import ctypes
+import ctypes.util
+import hashlib
+import os
+import struct
+
+# inotify是可选的，不可用时（Windows、macOS等）使用stat轮询
+try:
+    _libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+    _inotify_init1 = _libc.inotify_init1
+    _inotify_add_watch = _libc.inotify_add_watch
+    _inotify_add_watch.argtypes = (ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32)
+    INOTIFY_AVAILABLE = True
+except (OSError, AttributeError):
+    INOTIFY_AVAILABLE = False
+
+# inotify事件：写入后关闭、移入（先写临时文件再重命名的替换方式）、创建和删除
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_DELETE
+
+# inotify事件头：监听描述符、事件类型、cookie、文件名长度
+EVENT_HEADER = struct.Struct("iIII")
+
+
+def content_hash(path):
+    """文件内容的哈希值，文件不存在或无法读取时返回None"""
+    try:
+        with open(path, 'rb') as f:
+            return hashlib.sha256(f.read()).hexdigest()
+    except OSError:
+        return None
+
+
+def stat_key(path):
+    """文件的(大小, 修改时间)，文件不存在时返回None"""
+    try:
+        stat = os.stat(path)
+        return stat.st_size, stat.st_mtime_ns
+    except OSError:
+        return None
+
+
+class FileWatcher:
+    """检测一组文件的内容变化，由调用方定期调用poll()"""
+
+    def __init__(self, paths, use_inotify=True):
+        self.paths = [os.path.abspath(path) for path in paths]
+        self.hashes = {path: content_hash(path) for path in self.paths}
+        self.stat_keys = {path: stat_key(path) for path in self.paths}
+        self.fd = None
+        # 监听描述符 -> 目录
+        self.watch_dirs = {}
+        if use_inotify and INOTIFY_AVAILABLE:
+            self._start_inotify()
+        self.mode = "inotify" if self.fd is not None else "stat"
+
+    def _start_inotify(self):
+        """为文件所在的目录添加inotify监听，失败时改用stat轮询"""
+        fd = _inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if fd < 0:
+            return
+        for directory in sorted({os.path.dirname(path) for path in self.paths}):
+            wd = _inotify_add_watch(fd, os.fsencode(directory), WATCH_MASK)
+            if wd < 0:
+                os.close(fd)
+                self.watch_dirs = {}
+                return
+            self.watch_dirs[wd] = directory
+        self.fd = fd
+
+    def _inotify_candidates(self):
+        """读出所有待处理的inotify事件，返回涉及的被监听文件"""
+        touched = set()
+        while True:
+            try:
+                buffer = os.read(self.fd, 4096)
+            except BlockingIOError:
+                break
+            if not buffer:
+                break
+            offset = 0
+            while offset < len(buffer):
+                wd, _, _, name_length = EVENT_HEADER.unpack_from(buffer, offset)
+                offset += EVENT_HEADER.size
+                name = buffer[offset:offset + name_length].rstrip(b"\0")
+                offset += name_length
+                directory = self.watch_dirs.get(wd)
+                if directory is not None and name:
+                    touched.add(os.path.join(directory, os.fsdecode(name)))
+        return [path for path in self.paths if path in touched]
+
+    def _stat_candidates(self):
+        """返回大小或修改时间变化了的文件"""
+        candidates = []
+        for path in self.paths:
+            key = stat_key(path)
+            if key != self.stat_keys[path]:
+                self.stat_keys[path] = key
+                candidates.append(path)
+        return candidates
+
+    def poll(self):
+        """返回上次调用以来内容发生变化的文件列表（包括被创建和删除的文件）"""
+        candidates = self._inotify_candidates() if self.fd is not None else self._stat_candidates()
+        changed = []
+        for path in candidates:
+            digest = content_hash(path)
+            if digest != self.hashes[path]:
+                self.hashes[path] = digest
+                changed.append(path)
+        return changed
+
+    def close(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
@@ -0,0 +1,291 @@
+# 此文件是课程表的iCalendar（ICS）导出，不依赖tkinter
+# 把课程表引擎的编译结果导出为日历文件：同一节课（课表键、节次、时间、课程、教师、教室都相同）按轮换周期
+# 导出为一个带RRULE的重复事件，放假等缺课的日期写为EXDATE，临时调课写为带RECURRENCE-ID的单次修改，
+# 调休日和日历中的特殊课表导出为单独的事件。文件大小只与不同课程的数量有关，与导出的周数无关
+#
+# 用法: python -m core.ics_export 课表目录 输出.ics [--start 2026-09-01] [--end 2027-01-20]
+#       python -m core.ics_export --batch 班级目录的上级目录 输出目录 [--workers 4]
+import argparse
+import datetime
+import hashlib
+import json
+import os
+import sys
+
+from core.class_repository import build_engine, is_class_directory, load_class_directory
+from core.schedule_engine import WEEKDAYS_EN, MINUTES_PER_DAY, weekday_of_ordinal
+
+# 没有学期日历时默认导出的周数（从今天起）
+DEFAULT_EXPORT_WEEKS = 20
+# 重复事件中连续缺课超过这么多次（如寒暑假）时拆分为两个重复事件，而不是写出一长串EXDATE
+MAX_SKIPPED_OCCURRENCES = 2
+# iCalendar每行最多75个字节，超出部分折行
+LINE_LIMIT = 75
+PRODUCT_ID = "-//TimeNest//Timetable//ZH"
+
+
+# ---- iCalendar格式 ----
+
+def escape_text(text):
+    """转义iCalendar文本中的反斜杠、分号、逗号和换行"""
+    return (str(text).replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,")
+            .replace("\r\n", "\\n").replace("\n", "\\n"))
+
+
+def fold_line(line):
+    """按RFC 5545把超过75字节的行折行（续行以空格开头），不拆开UTF-8字符"""
+    encoded = line.encode("utf-8")
+    if len(encoded) <= LINE_LIMIT:
+        return line
+    parts = []
+    current = ""
+    current_size = 0
+    limit = LINE_LIMIT
+    for char in line:
+        size = len(char.encode("utf-8"))
+        if current_size + size > limit:
+            parts.append(current)
+            current, current_size = "", 0
+            # 续行开头的空格占一个字节
+            limit = LINE_LIMIT - 1
+        current += char
+        current_size += size
+    parts.append(current)
+    return "\r\n ".join(parts)
+
+
+def format_local(ordinal, minutes):
+    """日期序号和当天分钟数对应的本地时间（不带时区的floating时间），如20260901T080000"""
+    date = datetime.date.fromordinal(ordinal)
+    return f"{date:%Y%m%d}T{minutes // 60:02d}{minutes % 60:02d}00"
+
+
+# ---- 整理课程 ----
+
+def default_export_range(engine, today):
+    """导出的日期范围：有学期日历时为整个学期，否则为今天起DEFAULT_EXPORT_WEEKS周，返回 (开始日期, 结束日期)"""
+    if engine.first_ordinal is not None:
+        return datetime.date.fromordinal(engine.first_ordinal), datetime.date.fromordinal(engine.last_ordinal)
+    return today, today + datetime.timedelta(days=DEFAULT_EXPORT_WEEKS * 7 - 1)
+
+
+def collect_occurrences(engine, start_date, end_date):
+    """按天查找导出范围内的课程
+
+    返回 (series, extras)：
+    series以 (课表键, 节次, 开始分钟, 结束分钟, 课程, 教师, 教室) 为键，值为按轮换周期正常上课的日期序号列表；
+    extras为调休日和特殊课表日的 (日期序号, 开始分钟, 结束分钟, 课表键, 节次, 课程信息, 说明)。
+    """
+    series = {}
+    extras = []
+    for ordinal in range(start_date.toordinal(), end_date.toordinal() + 1):
+        day_key, name = engine.resolve_day(datetime.date.fromordinal(ordinal))
+        if day_key is None:
+            # 放假
+            continue
+        starts, ends, records = engine.compiled_profiles[engine.bell_profile_of(ordinal)].get(day_key, ([], [], []))
+        regular = day_key == engine.day_key_for(ordinal, WEEKDAYS_EN[weekday_of_ordinal(ordinal)])
+        for start, end, (period_index, class_info) in zip(starts, ends, records):
+            if regular:
+                key = (day_key, period_index, start, end, class_info.get("subject", ""),
+                       class_info.get("teacher", ""), class_info.get("classroom", ""))
+                series.setdefault(key, []).append(ordinal)
+            else:
+                extras.append((ordinal, start, end, day_key, period_index, class_info, name))
+    return series, extras
+
+
+def split_runs(ordinals, step):
+    """把同一节课的上课日期按步长（轮换周期的天数）拆分为若干段，返回 [(日期序号列表, 缺课的日期序号列表)]"""
+    runs = []
+    current, skipped = [ordinals[0]], []
+    for ordinal in ordinals[1:]:
+        missing = (ordinal - current[-1]) // step - 1
+        if missing > MAX_SKIPPED_OCCURRENCES:
+            runs.append((current, skipped))
+            current, skipped = [ordinal], []
+            continue
+        skipped.extend(current[-1] + step * i for i in range(1, missing + 1))
+        current.append(ordinal)
+    runs.append((current, skipped))
+    return runs
+
+
+# ---- 导出 ----
+
+def _uid(seed, *parts):
+    digest = hashlib.sha1(repr((seed,) + parts).encode("utf-8")).hexdigest()[:20]
+    return f"{digest}@timenest"
+
+
+def _event_lines(uid, stamp, ordinal, start, end, class_info, subject=None, description=""):
+    """一个事件的公共行（不含BEGIN/END）"""
+    lines = [
+        f"UID:{uid}",
+        f"DTSTAMP:{stamp}",
+        f"DTSTART:{format_local(ordinal, start)}",
+        f"DTEND:{format_local(ordinal + end // MINUTES_PER_DAY, end % MINUTES_PER_DAY)}",
+        f"SUMMARY:{escape_text(subject if subject is not None else class_info.get('subject', ''))}",
+    ]
+    if class_info.get("classroom"):
+        lines.append(f"LOCATION:{escape_text(class_info['classroom'])}")
+    details = [f"教师: {class_info['teacher']}"] if class_info.get("teacher") else []
+    if description:
+        details.append(description)
+    if details:
+        lines.append(f"DESCRIPTION:{escape_text(chr(10).join(details))}")
+    return lines
+
+
+def export_calendar(engine, start_date, end_date, calendar_name="课程表", now=None):
+    """把start_date到end_date（含）的课程导出为iCalendar文本
+
+    时间为不带时区的本地时间，与悬浮窗的计算方式一致。
+    """
+    now = now or datetime.datetime.now(datetime.timezone.utc)
+    stamp = now.astimezone(datetime.timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    step = 7 * engine.cycle_weeks
+    series, extras = collect_occurrences(engine, start_date, end_date)
+
+    lines = ["BEGIN:VCALENDAR", "VERSION:2.0", f"PRODID:{PRODUCT_ID}", "CALSCALE:GREGORIAN",
+             f"X-WR-CALNAME:{escape_text(calendar_name)}"]
+    for key, ordinals in series.items():
+        _, period_index, start, end, subject, teacher, classroom = key
+        class_info = {"subject": subject, "teacher": teacher, "classroom": classroom}
+        for run, skipped in split_runs(ordinals, step):
+            uid = _uid(calendar_name, key, run[0])
+            if len(run) == 1:
+                # 只上一次的课不需要重复规则，临时调课直接写入事件
+                single_change = engine.overlays.get((run[0], period_index))
+                lines.append("BEGIN:VEVENT")
+                lines.extend(_event_lines(uid, stamp, run[0], start, end, class_info,
+                                          single_change["new_class"] if single_change else None))
+                lines.append("END:VEVENT")
+                continue
+
+            lines.append("BEGIN:VEVENT")
+            lines.extend(_event_lines(uid, stamp, run[0], start, end, class_info))
+            rule = "RRULE:FREQ=WEEKLY"
+            if engine.cycle_weeks > 1:
+                rule += f";INTERVAL={engine.cycle_weeks}"
+            lines.append(f"{rule};UNTIL={format_local(run[-1], start)}")
+            if skipped:
+                lines.append("EXDATE:" + ",".join(format_local(ordinal, start) for ordinal in skipped))
+            lines.append("END:VEVENT")
+
+            # 临时调课：修改重复事件中的某一次
+            for ordinal in run:
+                single_change = engine.overlays.get((ordinal, period_index))
+                if single_change is None:
+                    continue
+                lines.append("BEGIN:VEVENT")
+                lines.extend(_event_lines(uid, stamp, ordinal, start, end, class_info,
+                                          single_change["new_class"], f"临时调课，原课程: {subject}"))
+                lines.append(f"RECURRENCE-ID:{format_local(ordinal, start)}")
+                lines.append("END:VEVENT")
+
+    for ordinal, start, end, day_key, period_index, class_info, name in extras:
+        single_change = engine.overlays.get((ordinal, period_index))
+        lines.append("BEGIN:VEVENT")
+        lines.extend(_event_lines(_uid(calendar_name, ordinal, day_key, period_index), stamp, ordinal, start, end,
+                                  class_info, single_change["new_class"] if single_change else None, name))
+        lines.append("END:VEVENT")
+    lines.append("END:VCALENDAR")
+    return "".join(fold_line(line) + "\r\n" for line in lines)
+
+
+def write_calendar(path, text):
+    """先写临时文件再替换，避免日历应用读到写了一半的文件"""
+    temp_path = path + ".tmp"
+    with open(temp_path, 'w', encoding='utf-8', newline='') as f:
+        f.write(text)
+    os.replace(temp_path, path)
+
+
+# ---- 读取课表目录 ----
+
+def load_calendar(path):
+    """读取学期日历，文件不存在时返回None"""
+    if not path or not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def engine_for_directory(directory, calendar=None):
+    """用课表目录中的数据创建课程表引擎"""
+    data, classtable_meta = load_class_directory(directory)
+    return build_engine(data, classtable_meta, calendar)
+
+
+def _export_directory(job):
+    """进程池中导出一个班级，返回 (班级目录, 输出文件, 错误信息)"""
+    directory, output_path, calendar, start_date, end_date = job
+    try:
+        engine = engine_for_directory(directory, calendar)
+        if start_date is None or end_date is None:
+            default_start, default_end = default_export_range(engine, datetime.date.today())
+            start_date, end_date = start_date or default_start, end_date or default_end
+        write_calendar(output_path, export_calendar(engine, start_date, end_date,
+                                                    os.path.basename(os.path.normpath(directory))))
+        return directory, output_path, None
+    except Exception as e:
+        return directory, output_path, str(e)
+
+
+def export_directories(directories, output_dir, calendar=None, start_date=None, end_date=None, workers=None):
+    """用进程池批量导出多个班级，每个班级输出为output_dir中的"目录名.ics"，返回 (成功数, 失败数)"""
+    os.makedirs(output_dir, exist_ok=True)
+    jobs = [(directory, os.path.join(output_dir, os.path.basename(os.path.normpath(directory)) + ".ics"),
+             calendar, start_date, end_date) for directory in directories]
+    succeeded = failed = 0
+    # 进程池只在批量导出时使用，打包的程序中没有concurrent模块
+    import concurrent.futures
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        # 每个进程一次处理多个班级，减少进程间传递的次数
+        chunksize = max(1, len(jobs) // ((workers or os.cpu_count() or 1) * 4))
+        for directory, output_path, error in executor.map(_export_directory, jobs, chunksize=chunksize):
+            if error:
+                print(f"导出{directory}时出错: {error}")
+                failed += 1
+            else:
+                succeeded += 1
+    return succeeded, failed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="把课程表导出为iCalendar（ICS）文件")
+    parser.add_argument("source", help="课表目录；批量导出时为各班级目录的上级目录")
+    parser.add_argument("output", help="输出的ICS文件；批量导出时为输出目录")
+    parser.add_argument("--batch", action="store_true", help="批量导出source下的每个班级目录")
+    parser.add_argument("--calendar", help="学期日历文件，默认为source中的term_calendar.json")
+    parser.add_argument("--start", help="开始日期（YYYY-MM-DD），默认为学期开始或今天")
+    parser.add_argument("--end", help="结束日期（YYYY-MM-DD），默认为学期结束或开始后20周")
+    parser.add_argument("--workers", type=int, help="批量导出使用的进程数，默认为CPU核数")
+    args = parser.parse_args(argv)
+
+    try:
+        start_date = datetime.datetime.strptime(args.start, "%Y-%m-%d").date() if args.start else None
+        end_date = datetime.datetime.strptime(args.end, "%Y-%m-%d").date() if args.end else None
+    except ValueError:
+        parser.error("日期的格式应为YYYY-MM-DD")
+    calendar = load_calendar(args.calendar or os.path.join(args.source, "term_calendar.json"))
+
+    if args.batch:
+        directories = sorted(os.path.join(args.source, name) for name in os.listdir(args.source)
+                             if is_class_directory(os.path.join(args.source, name)))
+        succeeded, failed = export_directories(directories, args.output, calendar, start_date, end_date,
+                                               args.workers)
+        print(f"导出完成，成功{succeeded}个班级，失败{failed}个，输出到{args.output}")
+        return 1 if failed else 0
+
+    directory, output_path, error = _export_directory((args.source, args.output, calendar, start_date, end_date))
+    if error:
+        print(f"导出日历时出错: {error}")
+        return 1
+    print(f"已导出到{output_path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,920 @@
+# 此文件是课程表计算引擎，不依赖tkinter，可在无显示环境下导入、测试和做性能评估
+import bisect
+import datetime
+
+# NumPy为可选依赖，仅用于批量计算加速，未安装时使用纯Python实现
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    np = None
+    NUMPY_AVAILABLE = False
+
+WEEKDAYS_EN = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+WEEKDAYS_CN = ["周一", "周二", "周三", "周四", "周五", "周六", "周日"]
+
+MINUTES_PER_DAY = 24 * 60
+MINUTES_PER_WEEK = 7 * MINUTES_PER_DAY
+
+# 学期日历中日期的类型
+DAY_TYPE_HOLIDAY = "holiday"   # 放假
+DAY_TYPE_FOLLOW = "follow"     # 调休上课，按指定星期的课表上课
+DAY_TYPE_PROFILE = "profile"   # 按日历中定义的特殊课表上课（如考试日）
+
+# 特殊课表在编译结果中的键前缀，如"profile:exam"
+PROFILE_KEY_PREFIX = "profile:"
+
+# 批量计算返回的课程状态
+STATE_NO_CLASS = 0   # 不在上课，当天也没有后续课程
+STATE_BREAK = 1      # 不在上课，当天还有后续课程（课前或课间）
+STATE_IN_CLASS = 2   # 正在上课
+
+# 批量计算使用的本地秒数以1970-01-01 00:00为起点
+_EPOCH = datetime.datetime(1970, 1, 1)
+_EPOCH_ORDINAL = _EPOCH.toordinal()
+
+
+def to_local_seconds(moment):
+    """将datetime（按本地时间理解，忽略时区）转换为批量计算使用的本地秒数"""
+    return (moment.replace(tzinfo=None) - _EPOCH).total_seconds()
+
+
+def parse_minutes(time_str):
+    """将HH:MM格式的时间转换为当天的分钟数"""
+    hours, minutes = time_str.split(":")
+    return int(hours) * 60 + int(minutes)
+
+
+def parse_date(date_str):
+    """将YYYY-MM-DD格式的日期转换为date对象"""
+    return datetime.datetime.strptime(date_str, "%Y-%m-%d").date()
+
+
+def weekday_of_ordinal(ordinal):
+    """根据日期序号计算星期索引（0为周一）"""
+    # 公元1年1月1日（序号1）是星期一
+    return (ordinal - 1) % 7
+
+
+def cycle_anchor_of(date):
+    """轮换周期的起点：date所在周的周一的日期序号"""
+    ordinal = date.toordinal()
+    return ordinal - weekday_of_ordinal(ordinal)
+
+
+def rotation_day_key(weekday, cycle_week):
+    """(轮换周, 星期) 对应的课表键，第1周沿用星期键本身，其余如第2周的周一为monday@2"""
+    if cycle_week <= 1:
+        return weekday
+    return f"{weekday}@{cycle_week}"
+
+
+def normalize_timetable(timetable):
+    """将课表的星期键统一为英文（兼容"周一"等中文键），缺失的星期补为空列表"""
+    # 处理可能的嵌套结构
+    if "timetable" in timetable:
+        timetable = timetable["timetable"]
+
+    normalized = {}
+    for day_en, day_cn in zip(WEEKDAYS_EN, WEEKDAYS_CN):
+        if day_cn in timetable:
+            normalized[day_en] = timetable[day_cn]
+        elif day_en in timetable:
+            normalized[day_en] = timetable[day_en]
+        else:
+            normalized[day_en] = []
+    return normalized
+
+
+def normalize_rotation(rotation):
+    """整理轮换设置，返回 (轮换周数, 周期起点的日期序号, {轮换周: {星期: 课程列表}})
+
+    rotation的格式为：
+        {"start_date": "2026-08-31", "cycle_weeks": 2, "weeks": {"2": {"monday": [课程列表]}}}
+
+    start_date所在周为第1周；weeks中只需写出与基础课表不同的日期，没有写出的沿用基础课表。
+    """
+    if not rotation:
+        return 1, 1, {}
+    try:
+        cycle_weeks = max(1, int(rotation.get("cycle_weeks", 1)))
+        cycle_anchor = cycle_anchor_of(parse_date(rotation["start_date"])) if rotation.get("start_date") else 1
+    except (TypeError, ValueError) as e:
+        print(f"轮换设置无效，按每周相同的课表处理: {e}")
+        return 1, 1, {}
+
+    variants = {}
+    for week, days in rotation.get("weeks", {}).items():
+        try:
+            cycle_week = int(week)
+        except ValueError:
+            print(f"跳过格式无效的轮换周: {week}")
+            continue
+        if not 1 <= cycle_week <= cycle_weeks:
+            continue
+        variants[cycle_week] = {}
+        for day_en, day_cn in zip(WEEKDAYS_EN, WEEKDAYS_CN):
+            if day_cn in days:
+                variants[cycle_week][day_en] = days[day_cn]
+            elif day_en in days:
+                variants[cycle_week][day_en] = days[day_en]
+    return cycle_weeks, cycle_anchor, variants
+
+
+def compile_bell_profiles(bell_profiles):
+    """整理按日期范围选用的作息时间
+
+    bell_profiles的格式为（保存在classtableMeta.json的bell_profiles字段中）：
+        {
+            "profiles": {"summer": {"default": [{"start_time": "08:00", "end_time": "08:45"}],
+                                    "friday": [...]}},
+            "ranges": [{"profile": "summer", "start": "05-01", "end": "09-30"}]
+        }
+
+    每套作息时间与classtableMeta.json中的timetable格式相同，可用default作为没有单独列出的星期的作息。
+    日期范围按月-日表示，可以跨年（如"10-01"到"04-30"），后面的范围优先；不在任何范围内的日期使用课表本身的时间。
+    返回 (profiles, month_day_index)，month_day_index以 (月, 日) 为键，值为作息名称。
+    """
+    if not bell_profiles:
+        return {}, {}
+    profiles = {name: normalize_bell_slots(slots) for name, slots in bell_profiles.get("profiles", {}).items()}
+
+    # 预先解析一年中每一天（含2月29日）使用的作息，查询时只需查表
+    leap_year_days = [datetime.date(2000, 1, 1) + datetime.timedelta(days=i) for i in range(366)]
+    month_day_index = {}
+    for entry in bell_profiles.get("ranges", []):
+        name = entry.get("profile")
+        if name not in profiles:
+            print(f"跳过未定义的作息时间: {name}")
+            continue
+        try:
+            start = tuple(int(part) for part in entry["start"].split("-"))
+            end = tuple(int(part) for part in entry["end"].split("-"))
+        except (KeyError, ValueError) as e:
+            print(f"跳过格式无效的作息日期范围 {entry}: {e}")
+            continue
+        for day in leap_year_days:
+            month_day = (day.month, day.day)
+            if start <= end:
+                matched = start <= month_day <= end
+            else:
+                matched = month_day >= start or month_day <= end
+            if matched:
+                month_day_index[month_day] = name
+    return profiles, month_day_index
+
+
+def normalize_bell_slots(slots):
+    """将一套作息时间的星期键统一为英文，保留default"""
+    normalized = {}
+    if "default" in slots:
+        normalized["default"] = slots["default"]
+    for day_en, day_cn in zip(WEEKDAYS_EN, WEEKDAYS_CN):
+        if day_cn in slots:
+            normalized[day_en] = slots[day_cn]
+        elif day_en in slots:
+            normalized[day_en] = slots[day_en]
+    return normalized
+
+
+def apply_bell_times(day_classes, bell_slots):
+    """按一套作息时间替换课表中每节课的上下课时间，返回新的课表，不修改原课表
+
+    作息中的第i项对应当天课表中的第i节课，超出作息的课程保留原时间。日历中的特殊课表有自己的时间，不做替换。
+    """
+    applied = {}
+    for day_key, classes in day_classes.items():
+        slots = None
+        if not day_key.startswith(PROFILE_KEY_PREFIX):
+            weekday = day_key.partition("@")[0]
+            slots = bell_slots.get(weekday, bell_slots.get("default"))
+        if not slots:
+            applied[day_key] = classes
+            continue
+        applied[day_key] = [
+            dict(class_info, start_time=slots[i]["start_time"], end_time=slots[i]["end_time"])
+            if i < len(slots) else class_info
+            for i, class_info in enumerate(classes)
+        ]
+    return applied
+
+
+def compile_timetable(timetable):
+    """将课表编译为按开始时间排序的分钟数组
+
+    每天返回 (starts, ends, records)，三个列表一一对应：
+    starts/ends为开始/结束时间的分钟数，records为 (课表中的索引, 课程信息)。
+    空白课程（subject为空）不参与编译。
+    """
+    compiled = {}
+    for day, classes in timetable.items():
+        entries = []
+        for i, class_info in enumerate(classes):
+            # 跳过subject为空的课程（空白课程）
+            if not class_info.get("subject", "").strip():
+                continue
+            try:
+                start = parse_minutes(class_info["start_time"])
+                end = parse_minutes(class_info["end_time"])
+            except (KeyError, ValueError) as e:
+                print(f"跳过时间格式无效的课程 {day} 第{i+1}节: {e}")
+                continue
+            entries.append((start, end, i, class_info))
+
+        # 按开始时间排序（相同开始时间保持课表中的顺序）
+        entries.sort(key=lambda entry: (entry[0], entry[2]))
+        compiled[day] = (
+            [entry[0] for entry in entries],
+            [entry[1] for entry in entries],
+            [(entry[2], entry[3]) for entry in entries]
+        )
+    return compiled
+
+
+def compile_week_timeline(compiled_days, cycle_weeks=1):
+    """将轮换周期内每周周一到周日的编译结果拼接为一条时间线
+
+    返回 (starts, ends, records)：starts/ends为从周期第1周周一0点起算的分钟数（整体有序），
+    records为 (课表键, 课表中的索引, 课程信息)。查询时按cycle_weeks周为周期环绕，不轮换时即为一周。
+    """
+    starts, ends, records = [], [], []
+    for cycle_week in range(1, cycle_weeks + 1):
+        for day_index, weekday in enumerate(WEEKDAYS_EN):
+            day = rotation_day_key(weekday, cycle_week)
+            day_starts, day_ends, day_records = compiled_days.get(day, ([], [], []))
+            offset = ((cycle_week - 1) * 7 + day_index) * MINUTES_PER_DAY
+            starts.extend(start + offset for start in day_starts)
+            ends.extend(end + offset for end in day_ends)
+            records.extend((day, period_index, class_info) for period_index, class_info in day_records)
+    return starts, ends, records
+
+
+def compile_calendar(calendar, day_keys, day_key_for):
+    """将学期日历预先解析为日期索引
+
+    calendar的格式为：
+        {
+            "term_start": "2026-09-01", "term_end": "2027-01-20",
+            "days": {
+                "2026-10-01": {"type": "holiday", "name": "国庆节"},
+                "2026-10-11": {"type": "follow", "weekday": "tuesday"},
+                "2026-12-31": {"type": "profile", "profile": "exam"}
+            },
+            "profiles": {"exam": [课程列表，格式与timetable.json中的一天相同]}
+        }
+
+    返回 (date_index, first_ordinal, last_ordinal)：date_index以日期序号为键，值为
+    (课表键, 说明)，课表键为None表示放假。学期内（及days中出现的日期）每天都会被解析，
+    没有特殊安排的日期按当天星期的课表。day_key_for(日期序号, 星期)返回考虑轮换后的课表键，
+    调休日按所在轮换周中被跟随星期的课表。
+    """
+    if not calendar:
+        return {}, None, None
+
+    special_days = {}
+    for date_str, entry in calendar.get("days", {}).items():
+        try:
+            ordinal = parse_date(date_str).toordinal()
+        except ValueError as e:
+            print(f"跳过格式无效的日历日期 {date_str}: {e}")
+            continue
+
+        day_type = entry.get("type")
+        name = entry.get("name", "")
+        if day_type == DAY_TYPE_HOLIDAY:
+            special_days[ordinal] = (None, name)
+        elif day_type == DAY_TYPE_FOLLOW and entry.get("weekday") in WEEKDAYS_EN:
+            special_days[ordinal] = (day_key_for(ordinal, entry["weekday"]), name)
+        elif day_type == DAY_TYPE_PROFILE and PROFILE_KEY_PREFIX + entry.get("profile", "") in day_keys:
+            special_days[ordinal] = (PROFILE_KEY_PREFIX + entry["profile"], name)
+        else:
+            print(f"跳过无法识别的日历安排 {date_str}: {entry}")
+
+    ordinals = list(special_days)
+    for key in ("term_start", "term_end"):
+        if calendar.get(key):
+            try:
+                ordinals.append(parse_date(calendar[key]).toordinal())
+            except ValueError as e:
+                print(f"学期日期格式无效 {key}: {e}")
+    if not ordinals:
+        return {}, None, None
+
+    first_ordinal, last_ordinal = min(ordinals), max(ordinals)
+    date_index = {}
+    for ordinal in range(first_ordinal, last_ordinal + 1):
+        if ordinal in special_days:
+            date_index[ordinal] = special_days[ordinal]
+        else:
+            date_index[ordinal] = (day_key_for(ordinal, WEEKDAYS_EN[weekday_of_ordinal(ordinal)]), "")
+    return date_index, first_ordinal, last_ordinal
+
+
+def compile_date_timeline(date_index, first_ordinal, last_ordinal, compiled_for):
+    """按日期索引把学期内每天的课程拼接为一条时间线
+
+    compiled_for(日期序号)返回当天所用作息时间下的编译结果。
+    返回 (starts, ends, records)：starts/ends为以日期序号*1440为基准的绝对分钟数，
+    records为 (课表键, 课表中的索引, 课程信息)。
+    """
+    starts, ends, records = [], [], []
+    if first_ordinal is None:
+        return starts, ends, records
+    for ordinal in range(first_ordinal, last_ordinal + 1):
+        day_key = date_index[ordinal][0]
+        if day_key is None:
+            continue
+        day_starts, day_ends, day_records = compiled_for(ordinal).get(day_key, ([], [], []))
+        offset = ordinal * MINUTES_PER_DAY
+        starts.extend(start + offset for start in day_starts)
+        ends.extend(end + offset for end in day_ends)
+        records.extend((day_key, period_index, class_info) for period_index, class_info in day_records)
+    return starts, ends, records
+
+
+def single_change_key(date, period_index):
+    """临时调课记录的键：日期和当天课表中的索引，如"2026-10-19_3"（按日期排序即为过期顺序）"""
+    return f"{date.isoformat()}_{period_index}"
+
+
+def split_single_change_key(change_key):
+    """解析临时调课记录的键，返回 (日期序号, 课表中的索引)；旧的按课表键记录（如"monday_3"）返回None"""
+    day, _, period_index = change_key.rpartition("_")
+    try:
+        return parse_date(day).toordinal(), int(period_index)
+    except ValueError:
+        return None
+
+
+def compile_overlays(classtable_meta):
+    """将classtableMeta中的single_changes编译为以 (日期序号, 课表中的索引) 为键的字典
+
+    旧的按课表键记录的临时调课直接跳过，由ScheduleEngine.migrate_single_change_keys在加载时统一改为按日期记录。
+    """
+    overlays = {}
+    if not classtable_meta:
+        return overlays
+    for change_key, single_change in classtable_meta.get("single_changes", {}).items():
+        key = split_single_change_key(change_key)
+        if key is not None:
+            overlays[key] = single_change
+    return overlays
+
+
+def format_countdown(seconds):
+    """将剩余秒数格式化为倒计时文本，返回 (文本, 文本内容变化的周期秒数)"""
+    minutes = int(seconds // 60)
+    if minutes < 60:
+        return f"{minutes}分钟", 60
+    hours, minutes = divmod(minutes, 60)
+    if hours < 24:
+        return f"{hours}小时{minutes}分钟", 60
+    days, hours = divmod(hours, 24)
+    return f"{days}天{hours}小时", 3600
+
+
+def day_label(days_ahead, day_index):
+    """下一节课所在日期的显示名称，如“明天”、“周三”、“下周一”"""
+    if days_ahead == 1:
+        return "明天"
+    if days_ahead >= 7:
+        return "下" + WEEKDAYS_CN[day_index]
+    return WEEKDAYS_CN[day_index]
+
+
+class ScheduleState:
+    """某一时刻的课程状态，只包含计算结果，由界面负责显示"""
+
+    __slots__ = ("weekday", "day_key", "current_class", "current_period_index", "next_class",
+                 "next_class_date", "seconds_to_next_class",
+                 "class_info_text", "next_class_text", "seconds_to_next_transition")
+
+    def __init__(self, weekday, day_key, current_class, current_period_index, next_class,
+                 next_class_date, seconds_to_next_class,
+                 class_info_text, next_class_text, seconds_to_next_transition):
+        # 当天实际的英文星期键，如"monday"
+        self.weekday = weekday
+        # 当天使用的课表键（调休日为所跟随的星期，特殊课表为"profile:名称"），放假时为None
+        self.day_key = day_key
+        # 当前课程（已应用临时调课的课程信息字典），不在上课时为None
+        self.current_class = current_class
+        # 当前课程在当天课表中的索引
+        self.current_period_index = current_period_index
+        # 下一节课（可能在之后的某一天），没有任何课程时为None
+        self.next_class = next_class
+        # 下一节课所在的日期
+        self.next_class_date = next_class_date
+        # 距离下一节课开始的秒数
+        self.seconds_to_next_class = seconds_to_next_class
+        # 课程信息标签和下一节课标签的文本
+        self.class_info_text = class_info_text
+        self.next_class_text = next_class_text
+        # 距离下一次课程状态切换的秒数
+        self.seconds_to_next_transition = seconds_to_next_transition
+
+    def __repr__(self):
+        return (f"ScheduleState(weekday={self.weekday!r}, day_key={self.day_key!r}, "
+                f"class_info_text={self.class_info_text!r}, next_class_text={self.next_class_text!r}, "
+                f"seconds_to_next_transition={self.seconds_to_next_transition!r})")
+
+
+class ScheduleEngine:
+    """根据课表、临时调课、学期日历和给定时刻计算课程状态
+
+    学期日历覆盖的日期范围内按预先解析的日期索引和时间线查询，范围之外按轮换周期（默认一周）循环的时间线查询。
+    每套作息时间各自预编译一份，按日期选用时只需切换引用。
+    """
+
+    # load()预编译得到的全部属性，只含基本类型，可以整体保存到缓存文件
+    COMPILED_FIELDS = ("timetable", "classtable_meta", "cycle_weeks", "cycle_anchor", "day_classes",
+                       "bell_profiles", "bell_index", "compiled_profiles", "week_timelines", "week_offsets",
+                       "overlays", "date_index", "first_ordinal", "last_ordinal",
+                       "date_starts", "date_ends", "date_records")
+
+    def __init__(self, timetable=None, classtable_meta=None, calendar=None, rotation=None):
+        self.timetable = {}
+        self.classtable_meta = None
+        self.cycle_weeks = 1
+        self.cycle_anchor = 1
+        self.day_classes = {}
+        self.bell_profiles = {}
+        self.bell_index = {}
+        self.compiled_profiles = {}
+        self.week_timelines = {}
+        self.week_offsets = {}
+        self.overlays = {}
+        self.date_index = {}
+        self.first_ordinal = None
+        self.last_ordinal = None
+        self.date_starts, self.date_ends, self.date_records = [], [], []
+        self.load(timetable or {}, classtable_meta, calendar, rotation)
+
+    def load(self, timetable, classtable_meta=None, calendar=None, rotation=None):
+        """加载课表、classtableMeta数据（其中的single_changes为临时调课）、学期日历和轮换设置，并预编译索引"""
+        self.timetable = normalize_timetable(timetable)
+        self.classtable_meta = classtable_meta
+        self.cycle_weeks, self.cycle_anchor, variants = normalize_rotation(rotation)
+
+        # 星期课表、各轮换周的课表和日历中的特殊课表统一按课表键编译，
+        # 轮换周中没有单独设置的日期沿用基础课表
+        self.day_classes = dict(self.timetable)
+        for cycle_week in range(2, self.cycle_weeks + 1):
+            for weekday in WEEKDAYS_EN:
+                self.day_classes[rotation_day_key(weekday, cycle_week)] = self.timetable[weekday]
+        for cycle_week, days in variants.items():
+            for weekday, classes in days.items():
+                self.day_classes[rotation_day_key(weekday, cycle_week)] = classes
+        for name, classes in (calendar or {}).get("profiles", {}).items():
+            self.day_classes[PROFILE_KEY_PREFIX + name] = classes
+        self.overlays = compile_overlays(classtable_meta)
+
+        # 每套作息时间（None为课表本身的时间）分别编译课表和轮换周期时间线
+        self.bell_profiles, self.bell_index = compile_bell_profiles((classtable_meta or {}).get("bell_profiles"))
+        self.compiled_profiles = {None: compile_timetable(self.day_classes)}
+        for name, bell_slots in self.bell_profiles.items():
+            self.compiled_profiles[name] = compile_timetable(apply_bell_times(self.day_classes, bell_slots))
+        self.week_timelines = {}
+        self.week_offsets = {}
+        record_count = 0
+        for name, compiled_days in self.compiled_profiles.items():
+            self.week_timelines[name] = compile_week_timeline(compiled_days, self.cycle_weeks)
+            self.week_offsets[name] = record_count
+            record_count += len(self.week_timelines[name][2])
+
+        self.date_index, self.first_ordinal, self.last_ordinal = compile_calendar(calendar, self.day_classes,
+                                                                                  self.day_key_for)
+        self.date_starts, self.date_ends, self.date_records = compile_date_timeline(
+            self.date_index, self.first_ordinal, self.last_ordinal,
+            lambda ordinal: self.compiled_profiles[self.bell_profile_of(ordinal)])
+
+    def compiled_state(self):
+        """返回预编译结果，用于保存到缓存文件"""
+        return {name: getattr(self, name) for name in self.COMPILED_FIELDS}
+
+    def load_compiled(self, state):
+        """直接使用缓存中的预编译结果，跳过课表解析和编译"""
+        for name in self.COMPILED_FIELDS:
+            setattr(self, name, state[name])
+
+    @property
+    def timeline_records(self):
+        """批量计算返回的课程位置所对应的记录表：各作息的轮换周期时间线在前，学期时间线在后"""
+        records = []
+        for name in self.compiled_profiles:
+            records.extend(self.week_timelines[name][2])
+        return records + self.date_records
+
+    def bell_profile_of(self, ordinal):
+        """日期序号当天使用的作息名称，None表示使用课表本身的时间"""
+        if not self.bell_index:
+            return None
+        date = datetime.date.fromordinal(ordinal)
+        return self.bell_index.get((date.month, date.day))
+
+    def cycle_week_of(self, date):
+        """date所在的轮换周（从1开始），不轮换时总是1"""
+        return (date.toordinal() - self.cycle_anchor) // 7 % self.cycle_weeks + 1
+
+    def day_key_for(self, ordinal, weekday):
+        """日期序号所在轮换周中某个星期的课表键"""
+        return rotation_day_key(weekday, (ordinal - self.cycle_anchor) // 7 % self.cycle_weeks + 1)
+
+    def resolve_day(self, date):
+        """返回某天使用的 (课表键, 说明)，课表键为None表示放假"""
+        ordinal = date.toordinal()
+        resolved = self.date_index.get(ordinal)
+        if resolved is not None:
+            return resolved
+        return self.day_key_for(ordinal, WEEKDAYS_EN[date.weekday()]), ""
+
+    def next_date_of(self, day_key, start_date, max_days=366):
+        """返回start_date当天或之后第一个使用课表键day_key的日期，找不到时返回None"""
+        ordinal = start_date.toordinal()
+        for offset in range(max_days):
+            date = datetime.date.fromordinal(ordinal + offset)
+            if self.resolve_day(date)[0] == day_key:
+                return date
+        return None
+
+    def period_end_minutes(self, date, period_index):
+        """某天第period_index节课（按当天的作息时间）结束时间的分钟数，没有这节课或时间无效时返回None"""
+        day_key = self.resolve_day(date)[0]
+        compiled_days = self.compiled_profiles.get(self.bell_profile_of(date.toordinal()), {})
+        _, ends, records = compiled_days.get(day_key, ([], [], []))
+        for end, (index, _) in zip(ends, records):
+            if index == period_index:
+                return end
+        # 空白课程不参与编译，使用课表中的时间
+        classes = self.day_classes.get(day_key) or []
+        try:
+            return parse_minutes(classes[period_index]["end_time"])
+        except (IndexError, KeyError, ValueError):
+            return None
+
+    def next_change_date(self, day_key, period_index, now):
+        """临时调课生效的日期：now当天或之后第一个使用课表键day_key、且第period_index节课还没有结束的日期"""
+        date = self.next_date_of(day_key, now.date())
+        if date == now.date():
+            end = self.period_end_minutes(date, period_index)
+            if end is not None and end <= now.hour * 60 + now.minute:
+                date = self.next_date_of(day_key, date + datetime.timedelta(days=1))
+        return date
+
+    def apply_overlay(self, ordinal, period_index, class_info):
+        """返回应用某天临时调课后的课程信息，有调课时返回合并后的新字典，不修改原课表"""
+        single_change = self.overlays.get((ordinal, period_index))
+        if single_change is None:
+            return class_info
+        return dict(class_info, subject=single_change["new_class"])
+
+    def _week_lookup(self, abs_minutes):
+        """在当天作息的轮换周期时间线上查找，返回 (当前课程, 下一节课)，均为 (绝对开始分钟, 绝对结束分钟, 记录) 或None"""
+        ordinal = abs_minutes // MINUTES_PER_DAY
+        profile = self.bell_profile_of(ordinal)
+        current, following = self._ring_lookup(self.week_timelines[profile], abs_minutes)
+
+        # 下一节课若已进入另一套作息时间的日期，从切换当天起按新的作息时间重新查找
+        while following is not None and self.bell_index:
+            switch_ordinal = None
+            for day in range(ordinal + 1, following[0] // MINUTES_PER_DAY + 1):
+                if self.bell_profile_of(day) != profile:
+                    switch_ordinal = day
+                    break
+            if switch_ordinal is None:
+                break
+            ordinal = switch_ordinal
+            profile = self.bell_profile_of(ordinal)
+            following = self._ring_lookup(self.week_timelines[profile], ordinal * MINUTES_PER_DAY - 1)[1]
+        return current, following
+
+    def _ring_lookup(self, timeline, abs_minutes):
+        """在一条轮换周期时间线上查找，返回值同_week_lookup"""
+        week_starts, week_ends, week_records = timeline
+        if not week_starts:
+            return None, None
+        ordinal = abs_minutes // MINUTES_PER_DAY
+        week_base = (ordinal - (ordinal - self.cycle_anchor) % (7 * self.cycle_weeks)) * MINUTES_PER_DAY
+        week_minutes = abs_minutes - week_base
+        pos = bisect.bisect_right(week_starts, week_minutes)
+
+        current = None
+        if pos > 0 and week_minutes < week_ends[pos - 1]:
+            current = (week_base + week_starts[pos - 1], week_base + week_ends[pos - 1], week_records[pos - 1])
+
+        # 超出本周期末尾时环绕到下一周期的第一节课
+        if pos == len(week_starts):
+            pos = 0
+            week_base += MINUTES_PER_WEEK * self.cycle_weeks
+        following = (week_base + week_starts[pos], week_base + week_ends[pos], week_records[pos])
+        return current, following
+
+    def _date_lookup(self, abs_minutes):
+        """在学期时间线上查找，返回值同_week_lookup，下一节课超出学期时为None"""
+        pos = bisect.bisect_right(self.date_starts, abs_minutes)
+        current = None
+        if pos > 0 and abs_minutes < self.date_ends[pos - 1]:
+            current = (self.date_starts[pos - 1], self.date_ends[pos - 1], self.date_records[pos - 1])
+        following = None
+        if pos < len(self.date_starts):
+            following = (self.date_starts[pos], self.date_ends[pos], self.date_records[pos])
+        return current, following
+
+    def _locate(self, abs_minutes):
+        """查找绝对分钟数abs_minutes时的当前课程和下一节课（可跨天、跨周末、跨学期边界）"""
+        if self.first_ordinal is None:
+            return self._week_lookup(abs_minutes)
+
+        term_begin = self.first_ordinal * MINUTES_PER_DAY
+        term_end = (self.last_ordinal + 1) * MINUTES_PER_DAY
+        if abs_minutes >= term_end:
+            return self._week_lookup(abs_minutes)
+
+        if abs_minutes >= term_begin:
+            current, following = self._date_lookup(abs_minutes)
+            if following is None:
+                # 学期内已没有课程，继续查找学期结束后的第一节课
+                following = self._week_lookup(term_end - 1)[1]
+            return current, following
+
+        # 学期开始前：下一节课若落在学期内，应以学期时间线为准
+        current, following = self._week_lookup(abs_minutes)
+        if following is None or following[0] >= term_begin:
+            following = self._date_lookup(term_begin - 1)[1] or self._week_lookup(term_end - 1)[1]
+        return current, following
+
+    def next_class_after(self, now):
+        """查找now之后开始的下一节课（可跨天、跨周末）
+
+        返回 (日期, 课表键, 课表中的索引, 课程信息, 距离开始的秒数)，没有任何课程时返回None。
+        """
+        abs_minutes = now.toordinal() * MINUTES_PER_DAY + now.hour * 60 + now.minute
+        following = self._locate(abs_minutes)[1]
+        if following is None:
+            return None
+        abs_start, _, (day_key, period_index, class_info) = following
+        abs_seconds = abs_minutes * 60 + now.second + now.microsecond / 1000000
+        ordinal = abs_start // MINUTES_PER_DAY
+        return (datetime.date.fromordinal(ordinal), day_key, period_index,
+                self.apply_overlay(ordinal, period_index, class_info), abs_start * 60 - abs_seconds)
+
+    def evaluate(self, now):
+        """计算now时刻的课程状态，返回ScheduleState"""
+        ordinal = now.toordinal()
+        day_index = now.weekday()
+        current_weekday_en = WEEKDAYS_EN[day_index]
+        now_seconds = (now.hour * 60 + now.minute) * 60 + now.second + now.microsecond / 1000000
+        abs_minutes = ordinal * MINUTES_PER_DAY + now.hour * 60 + now.minute
+        abs_seconds = ordinal * MINUTES_PER_DAY * 60 + now_seconds
+
+        # 当天使用的课表（按学期日历解析，O(1)查表）
+        day_key, day_note = self.resolve_day(now)
+        classes = self.day_classes.get(day_key, []) if day_key else []
+
+        # 获取当前时间和下一节课信息
+        current_class = None
+        current_period_index = None
+        current_class_end = None
+        next_class = None
+        next_class_date = None
+        seconds_to_next_class = None
+        days_ahead = None
+
+        current, following = self._locate(abs_minutes)
+        if current is not None:
+            current_start, current_class_end, (_, current_period_index, current_class) = current
+            # 应用当天的单次课程更改（如果有），得到的是合并后的视图，不会修改原课表
+            current_class = self.apply_overlay(current_start // MINUTES_PER_DAY, current_period_index, current_class)
+        if following is not None:
+            next_start, _, (_, next_period_index, next_class) = following
+            next_ordinal = next_start // MINUTES_PER_DAY
+            next_class = self.apply_overlay(next_ordinal, next_period_index, next_class)
+            next_class_date = datetime.date.fromordinal(next_ordinal)
+            seconds_to_next_class = next_start * 60 - abs_seconds
+            days_ahead = next_ordinal - ordinal
+
+        # 今天的下一节课
+        today_next_class = next_class if days_ahead == 0 else None
+
+        # 当前课程信息
+        if current_class:
+            class_info_text = f"现在是:{current_class['subject']}({current_class['start_time']}-{current_class['end_time']})"
+        elif day_key is None:
+            # 学期日历中的放假日
+            class_info_text = f"今天{day_note}放假，无课程安排" if day_note else "今天放假，无课程安排"
+        elif current_weekday_en in ['saturday', 'sunday'] and not classes:
+            # 特殊处理周末
+            class_info_text = "今天休息，无课程安排"
+        elif today_next_class:
+            class_info_text = "课间休息中"
+        elif classes:
+            # 当天有课程但不在课间休息时间（第一节课前或放学后）
+            class_info_text = "今天没有课程进行中"
+        else:
+            # 当天无课程安排
+            class_info_text = "今天没有课程安排"
+
+        # 下一节课信息
+        countdown_period = None
+        if today_next_class and current_class:  # 只有在有当前课程时才显示下一节课信息
+            next_class_text = f"下节课: {next_class['subject']}({next_class['start_time']})"
+        elif today_next_class and not current_class:
+            # 在非课间时间显示下一节课信息（第一节课前）
+            minutes_diff = int(seconds_to_next_class / 60)
+            next_class_text = f"下一节课: {next_class['subject']} ({next_class['start_time']}) 还有{minutes_diff}分钟"
+            countdown_period = 60
+        elif current_class:
+            # 有当前课程但今天没有下一节课（这天的最后一节课）
+            next_class_text = "这是今天的最后一节课"
+        elif next_class:
+            # 今天已放学、放假或无课，显示之后某一天的第一节课
+            countdown, countdown_period = format_countdown(seconds_to_next_class)
+            next_class_text = (f"下一节课: {day_label(days_ahead, next_class_date.weekday())} {next_class['subject']} "
+                               f"({next_class['start_time']}) 还有{countdown}")
+        else:
+            # 没有任何课程
+            next_class_text = "今天没有更多课程"
+
+        # 计算下一次课程状态切换的时刻
+        # 包括：下一节课开始、当前课程结束（最后一节课结束时也会清理临时调课）、
+        # 午夜换日（日历安排也在此时切换），以及显示倒计时时倒计时文本变化的时刻
+        candidates = [86400 - now_seconds]
+        if current_class:
+            candidates.append(current_class_end * 60 - abs_seconds)
+        if next_class:
+            candidates.append(seconds_to_next_class)
+        if countdown_period:
+            candidates.append(seconds_to_next_class % countdown_period or countdown_period)
+
+        return ScheduleState(
+            weekday=current_weekday_en,
+            day_key=day_key,
+            current_class=current_class,
+            current_period_index=current_period_index,
+            next_class=next_class,
+            next_class_date=next_class_date,
+            seconds_to_next_class=seconds_to_next_class,
+            class_info_text=class_info_text,
+            next_class_text=next_class_text,
+            seconds_to_next_transition=min(candidates)
+        )
+
+    def evaluate_batch(self, timestamps):
+        """批量计算多个时刻的课程状态，用于整学期按分钟扫描等场景
+
+        timestamps为本地时间秒数的序列（从1970-01-01 00:00本地时间起算，可用to_local_seconds转换）。
+        返回 (period_indices, states)：period_indices为当时所在课程在timeline_records中的位置，
+        不在上课时为-1；states为STATE_*常量。安装NumPy时返回ndarray，否则返回列表。
+        """
+        if NUMPY_AVAILABLE:
+            return self._evaluate_batch_numpy(timestamps)
+        return self._evaluate_batch_python(timestamps)
+
+    def _evaluate_batch_numpy(self, timestamps):
+        """使用NumPy searchsorted的批量计算"""
+        seconds = np.asarray(timestamps, dtype=np.float64)
+        abs_minutes = np.floor_divide(seconds, 60).astype(np.int64) + _EPOCH_ORDINAL * MINUTES_PER_DAY
+        ordinals = abs_minutes // MINUTES_PER_DAY
+
+        period_indices = np.full(abs_minutes.shape, -1, dtype=np.int64)
+        states = np.full(abs_minutes.shape, STATE_NO_CLASS, dtype=np.int8)
+
+        # 学期日历范围内的时刻查学期时间线，其余时刻查一周时间线
+        if self.first_ordinal is None:
+            in_term = np.zeros(abs_minutes.shape, dtype=bool)
+        else:
+            in_term = (ordinals >= self.first_ordinal) & (ordinals <= self.last_ordinal)
+
+        week_mask = ~in_term
+        if week_mask.any():
+            # 按日期选用作息：批量中的日期通常很少，对去重后的日期逐个查表
+            if self.bell_index:
+                unique_ordinals, inverse = np.unique(ordinals, return_inverse=True)
+                names = list(self.compiled_profiles)
+                profile_ids = np.array([names.index(self.bell_profile_of(int(ordinal)))
+                                        for ordinal in unique_ordinals])[inverse.reshape(ordinals.shape)]
+            else:
+                names = [None]
+                profile_ids = np.zeros(ordinals.shape, dtype=np.int64)
+
+            for profile_id, name in enumerate(names):
+                week_starts, week_ends, _ = self.week_timelines[name]
+                profile_mask = week_mask & (profile_ids == profile_id)
+                if not week_starts or not profile_mask.any():
+                    continue
+                week_ordinals = ordinals[profile_mask]
+                week_days = (week_ordinals - self.cycle_anchor) % (7 * self.cycle_weeks)
+                week_minutes = abs_minutes[profile_mask] - (week_ordinals - week_days) * MINUTES_PER_DAY
+                self._searchsorted_into(week_minutes, week_days, week_starts, week_ends, self.week_offsets[name],
+                                        profile_mask, period_indices, states)
+        if self.date_starts and in_term.any():
+            self._searchsorted_into(abs_minutes[in_term], ordinals[in_term], self.date_starts, self.date_ends,
+                                    len(self.timeline_records) - len(self.date_records), in_term,
+                                    period_indices, states)
+        return period_indices, states
+
+    @staticmethod
+    def _searchsorted_into(minutes, days, starts, ends, index_offset, mask, period_indices, states):
+        """在一条有序时间线上批量查找，结果写入mask选中的位置
+
+        minutes与starts/ends使用相同基准，days为每个时刻所在的天（与starts // 1440可比较）。
+        """
+        starts = np.asarray(starts, dtype=np.int64)
+        ends = np.asarray(ends, dtype=np.int64)
+        pos = np.searchsorted(starts, minutes, side="right")
+
+        # 开始时间不晚于当前时间的最后一节课尚未结束即为正在上课
+        previous = np.maximum(pos - 1, 0)
+        in_class = (pos > 0) & (minutes < ends[previous])
+
+        # 下一节课在同一天即为课前或课间
+        following = np.minimum(pos, len(starts) - 1)
+        has_next_today = (pos < len(starts)) & (starts[following] // MINUTES_PER_DAY == days)
+
+        sub_indices = np.where(in_class, previous + index_offset, -1)
+        sub_states = np.where(in_class, STATE_IN_CLASS,
+                              np.where(has_next_today, STATE_BREAK, STATE_NO_CLASS)).astype(np.int8)
+        period_indices[mask] = sub_indices
+        states[mask] = sub_states
+
+    def _evaluate_batch_python(self, timestamps):
+        """未安装NumPy时逐个二分查找的批量计算"""
+        date_offset = len(self.timeline_records) - len(self.date_records)
+        period_indices = []
+        states = []
+        for timestamp in timestamps:
+            abs_minutes = int(timestamp // 60) + _EPOCH_ORDINAL * MINUTES_PER_DAY
+            ordinal = abs_minutes // MINUTES_PER_DAY
+            if self.first_ordinal is not None and self.first_ordinal <= ordinal <= self.last_ordinal:
+                starts, ends, index_offset = self.date_starts, self.date_ends, date_offset
+                minutes, day = abs_minutes, ordinal
+            else:
+                profile = self.bell_profile_of(ordinal)
+                starts, ends, _ = self.week_timelines[profile]
+                index_offset = self.week_offsets[profile]
+                day = (ordinal - self.cycle_anchor) % (7 * self.cycle_weeks)
+                minutes = day * MINUTES_PER_DAY + abs_minutes % MINUTES_PER_DAY
+
+            pos = bisect.bisect_right(starts, minutes)
+            if pos > 0 and minutes < ends[pos - 1]:
+                period_indices.append(pos - 1 + index_offset)
+                states.append(STATE_IN_CLASS)
+            elif pos < len(starts) and starts[pos] // MINUTES_PER_DAY == day:
+                period_indices.append(-1)
+                states.append(STATE_BREAK)
+            else:
+                period_indices.append(-1)
+                states.append(STATE_NO_CLASS)
+        return period_indices, states
+
+    def purge_single_changes_before(self, date):
+        """删除date之前各天的临时调课记录，返回被删除的键（由调用方负责从数据库中删除）"""
+        single_changes = (self.classtable_meta or {}).get("single_changes")
+        if not single_changes:
+            return []
+
+        # 日期格式的键按字符串比较即按日期先后，当天的键（如"2026-10-19_0"）大于"2026-10-19"
+        cutoff = date.isoformat()
+        expired = [key for key, parsed in ((key, split_single_change_key(key)) for key in single_changes)
+                   if parsed is not None and key < cutoff]
+        if expired:
+            expired_keys = set(expired)
+            self._replace_single_changes({key: single_change for key, single_change in single_changes.items()
+                                          if key not in expired_keys})
+        return expired
+
+    def _replace_single_changes(self, single_changes):
+        """换用新的临时调课记录并重新编译；classtable_meta也换为新的字典，不修改原字典
+        （load_compiled得到的状态可能与课表仓库中缓存的引擎共用）"""
+        classtable_meta = {key: value for key, value in self.classtable_meta.items() if key != "single_changes"}
+        # 如果single_changes为空，则不保留该字段
+        if single_changes:
+            classtable_meta["single_changes"] = single_changes
+        self.classtable_meta = classtable_meta
+        self.overlays = compile_overlays(classtable_meta)
+
+    def migrate_single_change_keys(self, today):
+        """把旧的按课表键记录的临时调课（如"monday_3"）改为今天或之后第一个使用该课表的日期
+
+        返回 {旧键: 新键}，找不到对应日期的记录新键为None（应删除）。
+        """
+        single_changes = (self.classtable_meta or {}).get("single_changes")
+        if not single_changes:
+            return {}
+        renamed = {}
+        # 与已有记录的日期相同时以改过来的旧记录为准（与数据库中UPDATE OR REPLACE的结果一致）
+        migrated = {key: single_change for key, single_change in single_changes.items()
+                    if split_single_change_key(key) is not None}
+        for change_key, single_change in single_changes.items():
+            if change_key in migrated:
+                continue
+            day_key, _, period_index = change_key.rpartition("_")
+            date = self.next_date_of(day_key, today)
+            if date is None or not period_index.isdigit():
+                renamed[change_key] = None
+                continue
+            new_key = single_change_key(date, int(period_index))
+            migrated[new_key] = single_change
+            renamed[change_key] = new_key
+        if renamed:
+            self._replace_single_changes(migrated)
+        return renamed
@@ -0,0 +1,101 @@
+# 此文件是界面设置的存储，不依赖tkinter
+# 设置文件只在启动时解析一次，之后在内存中读写；修改后延迟一段时间合并写入，
+# 写入时先写临时文件并fsync，再用os.replace替换原文件，断电时不会留下写了一半的JSON文件
+import json
+import os
+import threading
+
+
+class SettingsStore:
+    """内存中的设置字典，修改后在delay秒内没有新的修改时才写入文件"""
+
+    def __init__(self, file_path, delay=1.0):
+        self.file_path = file_path
+        self.delay = delay
+        self.data = {}
+        self.dirty = False
+        self.timer = None
+        # 写入在定时器线程中进行，读写data和dirty时加锁
+        self.lock = threading.Lock()
+        # 保证同一时间只有一个线程在写文件
+        self.write_lock = threading.Lock()
+        # 统计信息：修改次数和实际写入文件的次数
+        self.updates = 0
+        self.writes = 0
+        self.load()
+
+    def load(self):
+        """从文件读取设置，文件不存在或内容损坏时使用空设置"""
+        try:
+            if os.path.exists(self.file_path):
+                with open(self.file_path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                with self.lock:
+                    self.data = data if isinstance(data, dict) else {}
+        except Exception as e:
+            print(f"读取设置文件时出错: {e}")
+        return self.exists()
+
+    def exists(self):
+        """设置文件中是否有内容"""
+        return bool(self.data)
+
+    def get(self, key, default=None):
+        with self.lock:
+            return self.data.get(key, default)
+
+    def snapshot(self):
+        """返回当前全部设置的副本"""
+        with self.lock:
+            return dict(self.data)
+
+    def update(self, values=None, **kwargs):
+        """修改设置并安排延迟写入，值没有变化时不写入"""
+        values = dict(values or {}, **kwargs)
+        with self.lock:
+            changed = {key: value for key, value in values.items() if self.data.get(key, self) != value}
+            if not changed:
+                return False
+            self.data.update(changed)
+            self.dirty = True
+            self.updates += 1
+            # 重新计时，连续的修改合并为一次写入
+            if self.timer:
+                self.timer.cancel()
+            self.timer = threading.Timer(self.delay, self.flush)
+            self.timer.daemon = True
+            self.timer.start()
+        return True
+
+    def flush(self):
+        """立即写入尚未保存的修改（退出程序时调用）"""
+        with self.write_lock:
+            with self.lock:
+                if self.timer:
+                    self.timer.cancel()
+                    self.timer = None
+                if not self.dirty:
+                    return
+                content = json.dumps(self.data, ensure_ascii=False, indent=2)
+                self.dirty = False
+            try:
+                self._write_atomic(content)
+            except Exception as e:
+                # 写入失败时保留修改标记，下次修改或退出时重试
+                with self.lock:
+                    self.dirty = True
+                print(f"保存设置文件时出错: {e}")
+
+    def _write_atomic(self, content):
+        """先写入同目录下的临时文件并落盘，再替换原文件"""
+        temp_path = self.file_path + ".tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            f.write(content)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self.file_path)
+        self.writes += 1
+
+    def stats(self):
+        """返回写入统计"""
+        return {"updates": self.updates, "writes": self.writes}
@@ -0,0 +1,89 @@
+# 此文件是每次刷新的耗时统计工具，不依赖tkinter
+# 只有开启统计时才会创建和使用，关闭时主窗口不做任何计时
+import json
+import time
+
+# 耗时直方图的分桶上界（毫秒）
+HISTOGRAM_BOUNDS_MS = (0.05, 0.1, 0.2, 0.5, 1, 2, 5, 10, 20, 50, 100)
+
+
+class TickProfiler:
+    """按阶段记录耗时，每个阶段保存最近capacity次的样本（环形缓冲区），同时累计全部样本的直方图"""
+
+    def __init__(self, capacity=3600):
+        self.capacity = capacity
+        # 阶段名 -> 固定长度的样本列表（秒）
+        self.samples = {}
+        # 阶段名 -> 累计记录次数（也用于计算环形缓冲区的写入位置）
+        self.counts = {}
+        # 阶段名 -> 各分桶的累计次数（最后一个桶为超过最大上界的样本）
+        self.histograms = {}
+        # 阶段名 -> 最大耗时（秒）
+        self.maximums = {}
+
+    def record(self, stage, seconds):
+        """记录某个阶段的一次耗时"""
+        samples = self.samples.get(stage)
+        if samples is None:
+            samples = self.samples[stage] = [0.0] * self.capacity
+            self.counts[stage] = 0
+            self.histograms[stage] = [0] * (len(HISTOGRAM_BOUNDS_MS) + 1)
+            self.maximums[stage] = 0.0
+        count = self.counts[stage]
+        samples[count % self.capacity] = seconds
+        self.counts[stage] = count + 1
+
+        milliseconds = seconds * 1000
+        bucket = 0
+        while bucket < len(HISTOGRAM_BOUNDS_MS) and milliseconds >= HISTOGRAM_BOUNDS_MS[bucket]:
+            bucket += 1
+        self.histograms[stage][bucket] += 1
+        if seconds > self.maximums[stage]:
+            self.maximums[stage] = seconds
+
+    def wrap(self, stage, func):
+        """返回记录func每次调用耗时的包装函数"""
+        def timed(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.record(stage, time.perf_counter() - started)
+        return timed
+
+    def percentile(self, stage, percent):
+        """返回某个阶段最近样本的百分位耗时（秒），没有样本时返回None"""
+        count = self.counts.get(stage, 0)
+        if not count:
+            return None
+        recent = sorted(self.samples[stage][:min(count, self.capacity)])
+        index = min(len(recent) - 1, int(len(recent) * percent / 100))
+        return recent[index]
+
+    def summary_text(self):
+        """每个阶段一行的p50/p99文本，用于界面上的统计浮层"""
+        lines = []
+        for stage in self.samples:
+            p50 = self.percentile(stage, 50) * 1000
+            p99 = self.percentile(stage, 99) * 1000
+            lines.append(f"{stage}: p50 {p50:.2f}ms p99 {p99:.2f}ms")
+        return "\n".join(lines)
+
+    def histogram(self):
+        """返回所有阶段的统计和直方图"""
+        labels = [f"<{bound}ms" for bound in HISTOGRAM_BOUNDS_MS] + [f">={HISTOGRAM_BOUNDS_MS[-1]}ms"]
+        result = {}
+        for stage in self.samples:
+            result[stage] = {
+                "count": self.counts[stage],
+                "p50_ms": round(self.percentile(stage, 50) * 1000, 4),
+                "p99_ms": round(self.percentile(stage, 99) * 1000, 4),
+                "max_ms": round(self.maximums[stage] * 1000, 4),
+                "histogram": dict(zip(labels, self.histograms[stage]))
+            }
+        return result
+
+    def dump(self, file_path):
+        """将统计和直方图保存为JSON文件"""
+        with open(file_path, 'w', encoding='utf-8') as f:
+            json.dump(self.histogram(), f, ensure_ascii=False, indent=2)
@@ -0,0 +1,510 @@
+# 此文件是课程表的唯一数据源，用标准库sqlite3保存节次、课程名、临时调课和轮换、作息设置，不依赖tkinter
+# timetable.json和classtableMeta.json只作为导入导出的格式：文件在上次导入或导出后被修改过时导入，
+# 程序中的保存只更新改动的行，退出时再把有改动的数据导出为两个JSON文件；导出前文件被修改时，重新导入会保留程序中的改动
+# 每个表都带有班级ID（class_id），同一个数据库文件可以保存多个班级的课表；程序目录中的课表的班级ID为空字符串
+import json
+import os
+import sqlite3
+
+from core.schedule_engine import WEEKDAYS_EN, normalize_timetable
+
+# 数据库结构的各个版本，PRAGMA user_version记录已执行到第几个
+MIGRATIONS = [
+    """
+    CREATE TABLE days (
+        week INTEGER NOT NULL,
+        day TEXT NOT NULL,
+        PRIMARY KEY (week, day)
+    );
+    CREATE TABLE periods (
+        week INTEGER NOT NULL,
+        day TEXT NOT NULL,
+        idx INTEGER NOT NULL,
+        start_time TEXT,
+        end_time TEXT,
+        subject TEXT,
+        teacher TEXT,
+        classroom TEXT,
+        PRIMARY KEY (week, day, idx)
+    );
+    CREATE TABLE subjects (
+        name TEXT PRIMARY KEY
+    );
+    CREATE TABLE single_changes (
+        change_key TEXT PRIMARY KEY,
+        original_class TEXT,
+        new_class TEXT
+    );
+    CREATE TABLE settings (
+        key TEXT PRIMARY KEY,
+        value TEXT NOT NULL
+    );
+    """,
+    # 第2版：各表加入班级ID，原有数据的班级ID为空字符串
+    """
+    CREATE TABLE days_v2 (
+        class_id TEXT NOT NULL DEFAULT '',
+        week INTEGER NOT NULL,
+        day TEXT NOT NULL,
+        PRIMARY KEY (class_id, week, day)
+    );
+    INSERT INTO days_v2 (week, day) SELECT week, day FROM days;
+    DROP TABLE days;
+    ALTER TABLE days_v2 RENAME TO days;
+    CREATE TABLE periods_v2 (
+        class_id TEXT NOT NULL DEFAULT '',
+        week INTEGER NOT NULL,
+        day TEXT NOT NULL,
+        idx INTEGER NOT NULL,
+        start_time TEXT,
+        end_time TEXT,
+        subject TEXT,
+        teacher TEXT,
+        classroom TEXT,
+        PRIMARY KEY (class_id, week, day, idx)
+    );
+    INSERT INTO periods_v2 (week, day, idx, start_time, end_time, subject, teacher, classroom)
+        SELECT week, day, idx, start_time, end_time, subject, teacher, classroom FROM periods;
+    DROP TABLE periods;
+    ALTER TABLE periods_v2 RENAME TO periods;
+    CREATE TABLE subjects_v2 (
+        class_id TEXT NOT NULL DEFAULT '',
+        name TEXT NOT NULL,
+        PRIMARY KEY (class_id, name)
+    );
+    INSERT INTO subjects_v2 (name) SELECT name FROM subjects ORDER BY rowid;
+    DROP TABLE subjects;
+    ALTER TABLE subjects_v2 RENAME TO subjects;
+    CREATE TABLE single_changes_v2 (
+        class_id TEXT NOT NULL DEFAULT '',
+        change_key TEXT NOT NULL,
+        original_class TEXT,
+        new_class TEXT,
+        PRIMARY KEY (class_id, change_key)
+    );
+    INSERT INTO single_changes_v2 (change_key, original_class, new_class)
+        SELECT change_key, original_class, new_class FROM single_changes ORDER BY rowid;
+    DROP TABLE single_changes;
+    ALTER TABLE single_changes_v2 RENAME TO single_changes;
+    CREATE TABLE settings_v2 (
+        class_id TEXT NOT NULL DEFAULT '',
+        key TEXT NOT NULL,
+        value TEXT NOT NULL,
+        PRIMARY KEY (class_id, key)
+    );
+    INSERT INTO settings_v2 (key, value) SELECT key, value FROM settings;
+    DROP TABLE settings;
+    ALTER TABLE settings_v2 RENAME TO settings;
+    """
+]
+
+# 每节课保存的字段，JSON中没有的字段保存为NULL，导出时省略
+PERIOD_FIELDS = ("start_time", "end_time", "subject", "teacher", "classroom")
+
+
+def file_signature(paths):
+    """文件的(大小, 修改时间)列表，文件不存在时为None"""
+    signature = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+            signature.append([stat.st_size, stat.st_mtime_ns])
+        except OSError:
+            signature.append(None)
+    return signature
+
+
+def list_class_ids(connection):
+    """数据库中有课表或设置的班级ID（不含程序目录中的课表）"""
+    return [row[0] for row in connection.execute(
+        "SELECT class_id FROM days UNION SELECT class_id FROM settings ORDER BY class_id") if row[0]]
+
+
+def merge_time_slots_and_classes(time_slots, classtable):
+    """将classtableMeta格式的时间信息和课程信息合并为timetable格式的每日课程列表"""
+    merged = {}
+    for day in list(time_slots) + [day for day in classtable if day not in time_slots]:
+        if day in time_slots and day in classtable:
+            # 节次数以较少的一方为准
+            merged[day] = [dict(slot, subject=subject) for slot, subject in zip(time_slots[day], classtable[day])]
+        elif day in time_slots:
+            # 只有时间信息，没有课程信息
+            merged[day] = [dict(slot) for slot in time_slots[day]]
+        else:
+            # 只有课程信息，没有时间信息
+            merged[day] = [{"subject": subject} for subject in classtable[day]]
+    return merged
+
+
+def _write_json_atomic(path, data):
+    """先写入临时文件并落盘，再替换原文件"""
+    temp_path = path + ".tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, path)
+
+
+class TimetableStore:
+    """SQLite课程表存储，第1周为基础课表，第2周起为轮换周中与基础课表不同的日期
+
+    class_id为要读写的班级；connection不为None时使用（多个班级共用的）已打开的连接，close()不关闭它。
+    """
+
+    def __init__(self, db_path, class_id="", connection=None):
+        self.db_path = db_path
+        self.class_id = class_id
+        self.owns_connection = connection is None
+        self.connection = sqlite3.connect(db_path) if connection is None else connection
+        # 导入或上次导出之后是否有改动（退出时据此决定是否导出JSON文件）
+        self.dirty = False
+        # 上次导出之后在程序中改动过的日期 (周, 星期)、临时调课的键和设置项（"rotation"、"subjects"），
+        # 导出前JSON文件被修改而重新导入时保留这些改动，不用文件中的内容覆盖
+        self.local_days = set()
+        self.local_changes = set()
+        self.local_settings = set()
+        # 每次修改数据时加1，供缓存编译结果的调用方判断是否需要重新编译
+        self.revision = 0
+        self._migrate()
+
+    def _migrate(self):
+        """按user_version执行尚未执行的结构升级"""
+        version = self.connection.execute("PRAGMA user_version").fetchone()[0]
+        for target, script in enumerate(MIGRATIONS[version:], start=version + 1):
+            with self.connection:
+                self.connection.executescript(script)
+                self.connection.execute(f"PRAGMA user_version = {target}")
+
+    def close(self):
+        if self.owns_connection:
+            self.connection.close()
+
+    def _mark_changed(self):
+        self.dirty = True
+        self.revision += 1
+
+    def is_empty(self):
+        """数据库中是否还没有课表"""
+        return self.connection.execute("SELECT 1 FROM days WHERE class_id = ? LIMIT 1",
+                                       (self.class_id,)).fetchone() is None
+
+    # ---- 设置项 ----
+
+    def _get_setting(self, key, default=None):
+        row = self.connection.execute("SELECT value FROM settings WHERE class_id = ? AND key = ?",
+                                      (self.class_id, key)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def _set_setting(self, key, value):
+        if value is None:
+            self.connection.execute("DELETE FROM settings WHERE class_id = ? AND key = ?", (self.class_id, key))
+        else:
+            self.connection.execute("INSERT OR REPLACE INTO settings (class_id, key, value) VALUES (?, ?, ?)",
+                                    (self.class_id, key, json.dumps(value, ensure_ascii=False)))
+
+    # ---- 节次 ----
+
+    def _read_days(self):
+        """读取全部课表：{周: {星期: [课程信息]}}，按星期和节次排序"""
+        weeks = {}
+        for week, day in self.connection.execute("SELECT week, day FROM days WHERE class_id = ?", (self.class_id,)):
+            weeks.setdefault(week, {})[day] = []
+        rows = self.connection.execute(
+            f"SELECT week, day, {', '.join(PERIOD_FIELDS)} FROM periods WHERE class_id = ? ORDER BY week, day, idx",
+            (self.class_id,))
+        for row in rows:
+            classes = weeks.setdefault(row[0], {}).setdefault(row[1], [])
+            classes.append({field: value for field, value in zip(PERIOD_FIELDS, row[2:]) if value is not None})
+        # 按周一到周日的顺序排列，其他键（如有）排在后面
+        order = {day: index for index, day in enumerate(WEEKDAYS_EN)}
+        return {
+            week: {day: days[day] for day in sorted(days, key=lambda day: (order.get(day, len(order)), day))}
+            for week, days in weeks.items()
+        }
+
+    def _write_day(self, week, day, classes):
+        """替换某周某天的全部节次"""
+        self.connection.execute("INSERT OR IGNORE INTO days (class_id, week, day) VALUES (?, ?, ?)",
+                                (self.class_id, week, day))
+        self.connection.execute("DELETE FROM periods WHERE class_id = ? AND week = ? AND day = ?",
+                                (self.class_id, week, day))
+        self.connection.executemany(
+            f"INSERT INTO periods (class_id, week, day, idx, {', '.join(PERIOD_FIELDS)}) "
+            f"VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            [(self.class_id, week, day, idx) + tuple(class_info.get(field) for field in PERIOD_FIELDS)
+             for idx, class_info in enumerate(classes)])
+
+    def _apply_weeks(self, weeks, keep=frozenset()):
+        """把{周: {星期: [课程信息]}}写入数据库，只改写内容有变化的日期，返回改写的 (周, 星期) 列表
+
+        keep中的日期保持数据库中的内容不变。
+        """
+        current = self._read_days()
+        changed = []
+        for week, days in current.items():
+            for day in days:
+                if (week, day) not in keep and day not in weeks.get(week, {}):
+                    self.connection.execute("DELETE FROM days WHERE class_id = ? AND week = ? AND day = ?",
+                                            (self.class_id, week, day))
+                    self.connection.execute("DELETE FROM periods WHERE class_id = ? AND week = ? AND day = ?",
+                                            (self.class_id, week, day))
+                    changed.append((week, day))
+        for week, days in weeks.items():
+            for day, classes in days.items():
+                if (week, day) in keep:
+                    continue
+                # 统一为只含已知字段且去掉空值的形式再比较
+                classes = [{field: class_info[field] for field in PERIOD_FIELDS if class_info.get(field) is not None}
+                           for class_info in classes]
+                if current.get(week, {}).get(day) != classes:
+                    self._write_day(week, day, classes)
+                    changed.append((week, day))
+        return changed
+
+    def _sync_subjects(self, names):
+        """使课程名列表与names一致（保留已有课程的顺序）"""
+        names = [name for name in dict.fromkeys(names) if name]
+        existing = self._subjects()
+        self.connection.executemany("DELETE FROM subjects WHERE class_id = ? AND name = ?",
+                                    [(self.class_id, name) for name in existing if name not in names])
+        self.connection.executemany("INSERT OR IGNORE INTO subjects (class_id, name) VALUES (?, ?)",
+                                    [(self.class_id, name) for name in names])
+
+    def _subjects(self):
+        return [row[0] for row in self.connection.execute(
+            "SELECT name FROM subjects WHERE class_id = ? ORDER BY rowid", (self.class_id,))]
+
+    @staticmethod
+    def _weeks_from_timetable(data):
+        """从timetable.json格式的数据得到{周: {星期: [课程信息]}}和轮换设置"""
+        # 基础课表的星期键统一为英文（兼容"周一"等中文键）
+        weeks = {1: normalize_timetable(data)}
+        rotation = data.get("rotation")
+        if rotation:
+            for week, days in rotation.get("weeks", {}).items():
+                if days:
+                    weeks[int(week)] = days
+            rotation = {"start_date": rotation.get("start_date", ""), "cycle_weeks": rotation.get("cycle_weeks", 1)}
+        return weeks, rotation
+
+    @staticmethod
+    def _used_subjects(weeks):
+        return [class_info.get("subject", "") for days in weeks.values()
+                for classes in days.values() for class_info in classes]
+
+    def replace_timetable(self, data):
+        """保存timetable.json格式的完整课表（课程表设置向导），只改写有变化的日期，课程名列表改为课表中用到的课程"""
+        weeks, rotation = self._weeks_from_timetable(data)
+        with self.connection:
+            changed = self._apply_weeks(weeks)
+            self._set_setting("rotation", rotation)
+            self._sync_subjects(self._used_subjects(weeks))
+        self.local_days.update(changed)
+        self.local_settings.update(("rotation", "subjects"))
+        self._mark_changed()
+        return len(changed)
+
+    def set_period_subject(self, week, day, idx, subject):
+        """修改某周某天第idx节的课程（永久调课），轮换周这天没有单独设置时先从基础课表复制"""
+        with self.connection:
+            if week > 1 and self.connection.execute(
+                    "SELECT 1 FROM days WHERE class_id = ? AND week = ? AND day = ?",
+                    (self.class_id, week, day)).fetchone() is None:
+                base = self._read_days().get(1, {}).get(day, [])
+                self._write_day(week, day, base)
+            self.connection.execute(
+                "UPDATE periods SET subject = ? WHERE class_id = ? AND week = ? AND day = ? AND idx = ?",
+                (subject, self.class_id, week, day, idx))
+            self.connection.execute("INSERT OR IGNORE INTO subjects (class_id, name) VALUES (?, ?)",
+                                    (self.class_id, subject))
+        self.local_days.add((week, day))
+        self.local_settings.add("subjects")
+        self._mark_changed()
+
+    # ---- 临时调课 ----
+
+    def set_single_change(self, change_key, original_class, new_class):
+        """添加或修改一条临时调课记录"""
+        with self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO single_changes (class_id, change_key, original_class, new_class) "
+                "VALUES (?, ?, ?, ?)",
+                (self.class_id, change_key, original_class, new_class))
+        self.local_changes.add(change_key)
+        self._mark_changed()
+
+    def delete_single_changes(self, change_keys):
+        """删除临时调课记录"""
+        if not change_keys:
+            return
+        with self.connection:
+            self.connection.executemany("DELETE FROM single_changes WHERE class_id = ? AND change_key = ?",
+                                        [(self.class_id, key) for key in change_keys])
+        self.local_changes.update(change_keys)
+        self._mark_changed()
+
+    def rename_single_changes(self, renamed):
+        """按 {旧键: 新键} 修改临时调课记录的键，新键为None时删除该记录"""
+        if not renamed:
+            return
+        with self.connection:
+            for old_key, new_key in renamed.items():
+                if new_key is None:
+                    self.connection.execute("DELETE FROM single_changes WHERE class_id = ? AND change_key = ?",
+                                            (self.class_id, old_key))
+                else:
+                    self.connection.execute(
+                        "UPDATE OR REPLACE single_changes SET change_key = ? WHERE class_id = ? AND change_key = ?",
+                        (new_key, self.class_id, old_key))
+        self.local_changes.update(renamed)
+        self.local_changes.update(new_key for new_key in renamed.values() if new_key is not None)
+        self._mark_changed()
+
+    def purge_single_changes_before(self, date):
+        """删除date之前各天的临时调课记录，返回删除的条数
+
+        按日期记录的键（如"2026-10-19_3"）在主键索引中按日期排序，过期记录是本班级索引开头的一段，
+        用一次范围删除即可完成。
+        """
+        with self.connection:
+            expired = [row[0] for row in self.connection.execute(
+                "SELECT change_key FROM single_changes WHERE class_id = ? AND change_key >= '0' AND change_key < ?",
+                (self.class_id, date.isoformat()))]
+            if expired:
+                self.connection.execute(
+                    "DELETE FROM single_changes WHERE class_id = ? AND change_key >= '0' AND change_key < ?",
+                    (self.class_id, date.isoformat()))
+        if expired:
+            self.local_changes.update(expired)
+            self._mark_changed()
+        return len(expired)
+
+    def _single_change_keys(self):
+        return [row[0] for row in self.connection.execute(
+            "SELECT change_key FROM single_changes WHERE class_id = ?", (self.class_id,))]
+
+    # ---- 导入 ----
+
+    def import_files(self, timetable_path, meta_path):
+        """从timetable.json和classtableMeta.json导入（任一可以不存在）
+
+        节次优先取自timetable.json（含教师和教室），只有classtableMeta.json时由其时间和课程合并得到；
+        课程名列表、临时调课和作息设置取自classtableMeta.json。
+        上次导出之后在程序中改动过、还没有导出的日期、临时调课和设置保留数据库中的内容，与文件中的其他改动合并。
+        """
+        timetable_data = None
+        meta_data = None
+        if os.path.exists(timetable_path):
+            with open(timetable_path, 'r', encoding='utf-8') as f:
+                timetable_data = json.load(f)
+        if os.path.exists(meta_path):
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                meta_data = json.load(f)
+
+        if timetable_data is None and meta_data is not None:
+            timetable_data = {"timetable": merge_time_slots_and_classes(meta_data.get("timetable", {}),
+                                                                        meta_data.get("classtable", {}))}
+            if "rotation" in meta_data:
+                rotation = meta_data["rotation"]
+                timetable_data["rotation"] = dict(rotation, weeks={
+                    week: merge_time_slots_and_classes(week_data.get("timetable", {}),
+                                                       week_data.get("classtable", {}))
+                    for week, week_data in rotation.get("weeks", {}).items()
+                })
+
+        weeks, rotation = self._weeks_from_timetable(timetable_data or {})
+        with self.connection:
+            changed = self._apply_weeks(weeks, self.local_days)
+            if "rotation" not in self.local_settings:
+                self._set_setting("rotation", rotation)
+            subjects = self._used_subjects(weeks)
+            if meta_data is not None:
+                subjects = list(meta_data.get("allclass", [])) + subjects
+                self.connection.executemany(
+                    "DELETE FROM single_changes WHERE class_id = ? AND change_key = ?",
+                    [(self.class_id, key) for key in self._single_change_keys() if key not in self.local_changes])
+                self.connection.executemany(
+                    "INSERT OR REPLACE INTO single_changes (class_id, change_key, original_class, new_class) "
+                    "VALUES (?, ?, ?, ?)",
+                    [(self.class_id, key, change.get("original_class"), change.get("new_class"))
+                     for key, change in meta_data.get("single_changes", {}).items()
+                     if key not in self.local_changes])
+                self._set_setting("bell_profiles", meta_data.get("bell_profiles"))
+            if "subjects" in self.local_settings:
+                subjects = self._subjects() + subjects
+            self._sync_subjects(subjects)
+            self._set_setting("source_signature", file_signature((timetable_path, meta_path)))
+        self.revision += 1
+        return len(changed)
+
+    def source_changed(self, timetable_path, meta_path):
+        """JSON文件在上次导入或导出之后是否被修改过"""
+        return self._get_setting("source_signature") != file_signature((timetable_path, meta_path))
+
+    # ---- 导出 ----
+
+    def export_timetable(self):
+        """导出为timetable.json格式"""
+        weeks = self._read_days()
+        data = {"timetable": {day: [] for day in WEEKDAYS_EN}}
+        data["timetable"].update(weeks.get(1, {}))
+        rotation = self._get_setting("rotation")
+        if rotation:
+            data["rotation"] = dict(rotation, weeks={
+                str(week): days for week, days in sorted(weeks.items()) if week > 1
+            })
+        return data
+
+    def export_classtable_meta(self):
+        """导出为classtableMeta.json格式"""
+        weeks = self._read_days()
+
+        def split(days):
+            return {
+                "timetable": {
+                    day: [{"start_time": class_info.get("start_time", ""), "end_time": class_info.get("end_time", "")}
+                          for class_info in classes]
+                    for day, classes in days.items()
+                },
+                "classtable": {
+                    day: [class_info.get("subject", "") for class_info in classes]
+                    for day, classes in days.items()
+                }
+            }
+
+        base_days = {day: [] for day in WEEKDAYS_EN}
+        base_days.update(weeks.get(1, {}))
+        meta_data = split(base_days)
+        meta_data["allclass"] = self._subjects()
+
+        rotation = self._get_setting("rotation")
+        if rotation:
+            meta_data["rotation"] = dict(rotation, weeks={
+                str(week): split(days) for week, days in sorted(weeks.items()) if week > 1
+            })
+
+        single_changes = {
+            key: {"original_class": original_class, "new_class": new_class}
+            for key, original_class, new_class in self.connection.execute(
+                "SELECT change_key, original_class, new_class FROM single_changes WHERE class_id = ? ORDER BY rowid",
+                (self.class_id,))
+        }
+        if single_changes:
+            meta_data["single_changes"] = single_changes
+
+        bell_profiles = self._get_setting("bell_profiles")
+        if bell_profiles:
+            meta_data["bell_profiles"] = bell_profiles
+        return meta_data
+
+    def export_files(self, timetable_path, meta_path):
+        """导出为timetable.json和classtableMeta.json，并记录文件状态以免下次启动时被重新导入"""
+        _write_json_atomic(timetable_path, self.export_timetable())
+        _write_json_atomic(meta_path, self.export_classtable_meta())
+        with self.connection:
+            self._set_setting("source_signature", file_signature((timetable_path, meta_path)))
+        self.dirty = False
+        self.local_days.clear()
+        self.local_changes.clear()
+        self.local_settings.clear()
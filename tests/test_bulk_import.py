@@ -0,0 +1,111 @@
+# 批量导入工具的测试
+import json
+import os
+import tracemalloc
+import zipfile
+
+from core import bulk_import
+
+SPREADSHEET_NS = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+
+
+def write_xlsx(path, rows):
+    """写出只有一个工作表、单元格全部为内联字符串的XLSX文件"""
+    def cell(column, row_number, value):
+        return f'<c r="{column}{row_number}" t="inlineStr"><is><t>{value}</t></is></c>'
+
+    sheet = [f'<worksheet xmlns="{SPREADSHEET_NS}"><sheetData>']
+    for row_number, row in enumerate(rows, start=1):
+        cells = "".join(cell(chr(ord("A") + i), row_number, value) for i, value in enumerate(row))
+        sheet.append(f'<row r="{row_number}">{cells}</row>')
+    sheet.append("</sheetData></worksheet>")
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr("xl/workbook.xml",
+                         f'<workbook xmlns="{SPREADSHEET_NS}" '
+                         'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+                         '<sheets><sheet name="课表" sheetId="1" r:id="rId1"/></sheets></workbook>')
+        archive.writestr("xl/_rels/workbook.xml.rels",
+                         '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+                         '<Relationship Id="rId1" Target="worksheets/sheet1.xml"/></Relationships>')
+        archive.writestr("xl/worksheets/sheet1.xml", "".join(sheet))
+
+
+def peak_memory_reading(path):
+    tracemalloc.start()
+    try:
+        count = sum(1 for _ in bulk_import.iter_xlsx_rows(path))
+        return count, tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def test_xlsx_reading_memory_does_not_grow_with_rows(tmp_path):
+    header = ["班级", "星期", "节次", "课程"]
+    peaks = {}
+    for row_count in (5000, 25000):
+        path = tmp_path / f"{row_count}.xlsx"
+        write_xlsx(path, [header] + [[f"班级{i % 50}", "周一", str(i % 8 + 1), "语文"] for i in range(row_count)])
+        count, peaks[row_count] = peak_memory_reading(str(path))
+        assert count == row_count + 1
+    # 行数增加到5倍时峰值内存基本不变（未移除行元素时约增加3倍）
+    assert peaks[25000] < peaks[5000] * 1.5
+
+
+class RecordingWriter:
+    """只记录每次输出的班级和课程记录"""
+
+    def __init__(self):
+        self.calls = []
+        self.written = set()
+
+    def write(self, class_id, records):
+        self.calls.append((class_id, list(records)))
+        self.written.add(class_id)
+
+
+def day_sorted_records():
+    """按星期和节次排序的全校课表：同一班级的行不连续"""
+    rows = [["班级", "星期", "节次", "课程"]]
+    for day in ("周一", "周二", "周三"):
+        for period in range(1, 5):
+            for i in range(10):
+                rows.append([f"高一({i})班", day, str(period), f"课程{period}"])
+    return list(bulk_import.iter_records(rows))
+
+
+def test_non_contiguous_classes_are_written_once():
+    records = day_sorted_records()
+    for spool_limit in (bulk_import.SPOOL_LIMIT, 7):
+        writer = RecordingWriter()
+        assert bulk_import.import_records(iter(records), writer, spool_limit) == 10
+        assert [class_id for class_id, _ in writer.calls] == [f"高一({i})班" for i in range(10)]
+        for class_id, class_records in writer.calls:
+            assert class_records == [record for record in records if record["class"] == class_id]
+
+
+def test_non_contiguous_output_matches_class_sorted_input(tmp_path):
+    records = day_sorted_records()
+    bulk_import.import_records(iter(records), bulk_import.ClassWriter(str(tmp_path / "day")), 7)
+    sorted_records = sorted(records, key=lambda record: record["class"])
+    bulk_import.import_records(iter(sorted_records), bulk_import.ClassWriter(str(tmp_path / "class")))
+    for i in range(10):
+        for name in ("timetable.json", "classtableMeta.json"):
+            day_file = tmp_path / "day" / f"高一({i})班" / name
+            class_file = tmp_path / "class" / f"高一({i})班" / name
+            assert day_file.read_text(encoding="utf-8") == class_file.read_text(encoding="utf-8")
+
+
+def test_class_ids_with_same_directory_name_do_not_overwrite(tmp_path, capsys):
+    rows = [["班级", "星期", "节次", "课程"], ["2024/1", "周一", "1", "语文"], ["2024:1", "周一", "1", "数学"]]
+    writer = bulk_import.ClassWriter(str(tmp_path))
+    assert bulk_import.import_records(bulk_import.iter_records(rows), writer) == 2
+
+    directories = sorted(os.listdir(tmp_path))
+    assert len(directories) == 2 and directories[0] == "2024_1"
+    subjects = set()
+    for name in directories:
+        with open(tmp_path / name / "timetable.json", "r", encoding="utf-8") as f:
+            subjects.add(json.load(f)["timetable"]["monday"][0]["subject"])
+    assert subjects == {"语文", "数学"}
+    # 改用的目录名会提示用户
+    assert directories[1] in capsys.readouterr().out
@@ -0,0 +1,33 @@
+# 多班级课表仓库的测试
+import os
+
+import pytest
+
+from core import bulk_import
+from core.class_repository import ClassRepository, STORAGE_DATABASE
+
+
+@pytest.mark.parametrize("class_id", ["../outside", "..", "高一/1班", "a\\b", "C:班级"])
+def test_directory_storage_rejects_class_ids_outside_root(tmp_path, class_id):
+    root = tmp_path / "classes"
+    repository = ClassRepository(str(root))
+    with pytest.raises(ValueError):
+        repository.store(class_id)
+    repository.close()
+    # 根目录之外没有创建任何文件
+    assert sorted(os.listdir(tmp_path)) == []
+
+
+def test_database_storage_accepts_any_class_id(tmp_path):
+    repository = ClassRepository(str(tmp_path / "classes.db"), STORAGE_DATABASE)
+    repository.store("../高一/1班").replace_timetable({"timetable": {}})
+    assert repository.class_ids() == ["../高一/1班"]
+    repository.close()
+    assert sorted(os.listdir(tmp_path)) == ["classes.db"]
+
+
+def test_bulk_import_class_directory_stays_inside_output(tmp_path):
+    for class_id in ("..", ".", "../outside", "高一/1班"):
+        directory = bulk_import.class_directory(str(tmp_path), class_id)
+        assert os.path.dirname(directory) == str(tmp_path)
+        assert os.path.basename(directory) not in ("", ".", "..")
@@ -0,0 +1,58 @@
+# 悬浮窗拖动的测试，不需要图形界面：在模拟的窗口对象上调用DragWindow的方法
+import types
+
+from ui.mainwindow import DragWindow
+
+
+class FakeWindow:
+    """只实现拖动用到的窗口方法"""
+    DRAG_FRAME_MS = DragWindow.DRAG_FRAME_MS
+    start_move = DragWindow.start_move
+    on_motion = DragWindow.on_motion
+    _apply_drag = DragWindow._apply_drag
+
+    def __init__(self, x, y):
+        self.position = (x, y)
+        self.is_draggable = True
+        self.drag_target = None
+        self.drag_job = None
+        self.screen_size = None
+        self.drag_window_size = None
+
+    def winfo_x(self):
+        return self.position[0]
+
+    def winfo_y(self):
+        return self.position[1]
+
+    def winfo_width(self):
+        return 280
+
+    def winfo_height(self):
+        return 80
+
+    def after(self, delay, callback):
+        return "job"
+
+    def set_display_postion(self, x, y):
+        self.position = (x, y)
+
+
+def event(x, y, x_root, y_root):
+    return types.SimpleNamespace(x=x, y=y, x_root=x_root, y_root=y_root)
+
+
+def test_drag_from_child_label_does_not_jump():
+    window = FakeWindow(500, 300)
+    # 点击位于窗口内(150, 40)处的子标签，标签内坐标为(10, 5)
+    window.start_move(event(10, 5, 650, 340))
+
+    # 指针不动时窗口保持原位
+    window.on_motion(event(10, 5, 650, 340))
+    window._apply_drag()
+    assert window.position == (500, 300)
+
+    # 指针移动多少，窗口就移动多少
+    window.on_motion(event(30, 17, 670, 352))
+    window._apply_drag()
+    assert window.position == (520, 312)
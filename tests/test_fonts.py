@@ -0,0 +1,51 @@
+# 主窗口字体设置的测试，不需要图形界面：在模拟的窗口对象上调用DragWindow的方法
+from ui.label_renderer import LabelRenderer
+from ui.mainwindow import DragWindow
+
+
+class FakeLabel:
+    def config(self, **options):
+        pass
+
+
+class FakeFontFitCache:
+    def prepare_glyph_tables(self, font_family, max_size):
+        pass
+
+
+class FakeWindow:
+    """只实现应用字体用到的属性，记录调整字体大小的调用"""
+    _apply_fonts = DragWindow._apply_fonts
+
+    def __init__(self):
+        self.label_renderer = LabelRenderer()
+        self.font_fit_cache = FakeFontFitCache()
+        self.time_label = FakeLabel()
+        self.date_label = FakeLabel()
+        self.class_info_label = FakeLabel()
+        self.next_class_label = FakeLabel()
+        self.time_font_size = 40
+        self.date_font_size = 20
+        self.class_info_font_size = 16
+        self.next_class_font_size = 14
+        self.adjusted = []
+
+    def _adjust_font_size(self, label, text, use_glyph_table=False):
+        self.adjusted.append((label, text, use_glyph_table))
+
+
+def test_apply_fonts_refits_displayed_text():
+    window = FakeWindow()
+    texts = {window.time_label: "08:00:00", window.date_label: "2026年10月16日 星期五",
+             window.class_info_label: "当前课程：很长很长的课程名称", window.next_class_label: ""}
+    for label, text in texts.items():
+        window.label_renderer.render(label, text=text)
+
+    window._apply_fonts()
+
+    # 重设字号后，所有有文字的标签都按当前文字重新调整，即使文字没有改变
+    assert window.adjusted == [
+        (window.time_label, "08:00:00", True),
+        (window.date_label, "2026年10月16日 星期五", True),
+        (window.class_info_label, "当前课程：很长很长的课程名称", False),
+    ]
@@ -0,0 +1,51 @@
+# 课程表引擎的测试
+import datetime
+
+from core.schedule_engine import ScheduleEngine, normalize_timetable
+
+
+def make_engine(single_changes):
+    data = {"timetable": {"monday": [{"start_time": "08:00", "end_time": "08:45", "subject": "语文"},
+                                     {"start_time": "09:00", "end_time": "09:45", "subject": "数学"}]}}
+    return ScheduleEngine(normalize_timetable(data), {"single_changes": dict(single_changes)})
+
+
+def test_legacy_single_changes_are_not_reported_on_every_compile(capsys):
+    single_changes = {"monday_1": {"subject": "英语"}, "2026-10-19_0": {"subject": "物理"}}
+    for _ in range(3):
+        engine = make_engine(single_changes)
+    # 旧的按课表键记录的临时调课在编译时直接跳过，不在每次加载时输出
+    assert capsys.readouterr().out == ""
+    assert list(engine.overlays) == [(datetime.date(2026, 10, 19).toordinal(), 0)]
+
+    # 加载后统一改为按日期记录
+    renamed = engine.migrate_single_change_keys(datetime.date(2026, 10, 16))
+    assert renamed == {"monday_1": "2026-10-19_1"}
+    assert sorted(engine.overlays) == [(datetime.date(2026, 10, 19).toordinal(), 0),
+                                       (datetime.date(2026, 10, 19).toordinal(), 1)]
+
+
+def test_single_change_for_a_finished_period_applies_next_week():
+    engine = make_engine({})
+    now = datetime.datetime(2026, 10, 19, 8, 50)
+    # 周一第1节已经结束，改为下周一；第2节还没有结束，仍为今天
+    assert engine.next_change_date("monday", 0, now) == datetime.date(2026, 10, 26)
+    assert engine.next_change_date("monday", 1, now) == datetime.date(2026, 10, 19)
+    # 其他日期不受当前时间影响
+    assert engine.next_change_date("monday", 0, datetime.datetime(2026, 10, 16, 23, 0)) == datetime.date(2026, 10, 19)
+
+
+def test_migrate_and_purge_do_not_change_shared_compiled_state():
+    # 课表仓库缓存的引擎和悬浮窗的引擎共用load_compiled得到的状态
+    cached = make_engine({"monday_1": {"subject": "英语"}, "2026-10-12_0": {"subject": "物理"}})
+    engine = ScheduleEngine()
+    engine.load_compiled(cached.compiled_state())
+
+    engine.migrate_single_change_keys(datetime.date(2026, 10, 16))
+    engine.purge_single_changes_before(datetime.date(2026, 10, 16))
+    assert engine.classtable_meta["single_changes"] == {"2026-10-19_1": {"subject": "英语"}}
+
+    # 缓存的引擎的记录与其编译结果仍然一致
+    assert cached.classtable_meta["single_changes"] == {"monday_1": {"subject": "英语"},
+                                                        "2026-10-12_0": {"subject": "物理"}}
+    assert list(cached.overlays) == [(datetime.date(2026, 10, 12).toordinal(), 0)]
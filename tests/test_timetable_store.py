@@ -0,0 +1,65 @@
+# 课程表数据库的测试
+import json
+
+from core.timetable_store import TimetableStore
+
+
+def write_files(directory, classroom):
+    timetable = {"timetable": {
+        "monday": [{"start_time": "08:00", "end_time": "08:45", "subject": "语文", "classroom": classroom},
+                   {"start_time": "09:00", "end_time": "09:45", "subject": "数学", "classroom": classroom}],
+        "tuesday": [{"start_time": "08:00", "end_time": "08:45", "subject": "英语", "classroom": classroom}]}}
+    meta = {"allclass": ["语文", "数学", "英语"],
+            "single_changes": {"2026-10-20_0": {"original_class": "英语", "new_class": "物理"}}}
+    paths = str(directory / "timetable.json"), str(directory / "classtableMeta.json")
+    for path, data in zip(paths, (timetable, meta)):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+    return paths
+
+
+def test_reimport_keeps_edits_not_yet_exported(tmp_path):
+    paths = write_files(tmp_path, "101")
+    store = TimetableStore(":memory:")
+    store.import_files(*paths)
+    store.export_files(*paths)
+
+    # 程序中的修改只保存在数据库中，还没有导出
+    store.set_single_change("2026-10-19_0", "语文", "化学")
+    store.delete_single_changes(["2026-10-20_0"])
+    store.set_period_subject(1, "monday", 1, "生物")
+    assert store.dirty
+
+    # 部署脚本只修改了教室，文件被重新导入
+    write_files(tmp_path, "202")
+    assert store.source_changed(*paths)
+    store.import_files(*paths)
+
+    meta = store.export_classtable_meta()
+    assert meta["single_changes"] == {"2026-10-19_0": {"original_class": "语文", "new_class": "化学"}}
+    assert "生物" in meta["allclass"]
+    timetable = store.export_timetable()["timetable"]
+    assert [class_info["subject"] for class_info in timetable["monday"]] == ["语文", "生物"]
+    # 程序中没有改动过的日期使用文件中的新内容
+    assert timetable["tuesday"][0]["classroom"] == "202"
+    # 合并后的结果在退出时导出
+    assert store.dirty
+    store.close()
+
+
+def test_reimport_after_export_uses_file_contents(tmp_path):
+    paths = write_files(tmp_path, "101")
+    store = TimetableStore(":memory:")
+    store.import_files(*paths)
+    store.set_single_change("2026-10-19_0", "语文", "化学")
+    store.export_files(*paths)
+
+    # 导出后文件中删除的临时调课在重新导入时删除
+    with open(paths[1], "r", encoding="utf-8") as f:
+        meta = json.load(f)
+    del meta["single_changes"]["2026-10-19_0"]
+    with open(paths[1], "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False)
+    store.import_files(*paths)
+    assert list(store.export_classtable_meta()["single_changes"]) == ["2026-10-20_0"]
+    store.close()
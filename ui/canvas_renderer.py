@@ -0,0 +1,122 @@
+# 此文件是悬浮窗的单画布渲染方式：四个文本都画在同一个Canvas上，用itemconfig更新已有的文本项，
+# 位置由画布尺寸直接计算，不经过Frame+Label的grid布局和几何传播
+import tkinter as tk
+
+
+class CanvasTextItem:
+    """画布上的一个文本项，提供与Label相同的config/cget/winfo_width/grid接口，
+    使标签渲染层、字体适配和显示设置可以不加区分地使用"""
+
+    def __init__(self, renderer, row, column, font, fg, wraplength=0):
+        self.renderer = renderer
+        self.row = row
+        self.column = column
+        self.visible = True
+        self.options = {"text": "", "font": font, "fg": fg, "wraplength": wraplength}
+        self.item = renderer.canvas.create_text(0, 0, text="", font=font, fill=fg, width=wraplength,
+                                                anchor="center", justify="center")
+
+    def config(self, **options):
+        """设置文本项选项，Label的fg对应画布文本的fill，bg对应整个画布的背景"""
+        item_options = {}
+        for key, value in options.items():
+            if key == "fg":
+                item_options["fill"] = value
+            elif key == "bg":
+                self.renderer.set_background(value)
+            elif key == "wraplength":
+                item_options["width"] = value
+            else:
+                item_options[key] = value
+        self.options.update(options)
+        if item_options:
+            self.renderer.itemconfig(self.item, **item_options)
+
+    configure = config
+
+    def cget(self, key):
+        return self.options.get(key, "")
+
+    def __getitem__(self, key):
+        return self.cget(key)
+
+    def winfo_width(self):
+        """文本项可用的宽度（所在单元格的宽度），由画布尺寸计算，不查询Tk"""
+        return self.renderer.cell_width()
+
+    def grid(self, **kwargs):
+        """显示文本项（位置由所在的行列决定，忽略grid参数）"""
+        if not self.visible:
+            self.visible = True
+            self.renderer.itemconfig(self.item, state="normal")
+            self.renderer.layout()
+
+    def grid_forget(self):
+        """隐藏文本项"""
+        if self.visible:
+            self.visible = False
+            self.renderer.itemconfig(self.item, state="hidden")
+            self.renderer.layout()
+
+
+class CanvasRenderer:
+    # 单元格左右的留白，与Label布局的padx一致
+    PADDING = 2
+
+    def __init__(self, master, background_color, width, height):
+        self.canvas = tk.Canvas(master, bg=background_color, width=width, height=height,
+                                highlightthickness=0, bd=0)
+        self.canvas.pack(fill=tk.BOTH, expand=True)
+        self.background_color = background_color
+        self.width = width
+        self.height = height
+        self.items = []
+        self.column_count = 1
+        # 统计信息：实际发出的itemconfig调用次数和重新布局次数
+        self.itemconfig_calls = 0
+        self.layout_passes = 0
+
+        # 画布尺寸变化时（窗口大小设置改变）重新布局
+        self.canvas.bind("<Configure>", self._on_configure)
+
+    def add_text(self, row, column, font, fg, wraplength=0):
+        """在第row行第column列添加文本项"""
+        item = CanvasTextItem(self, row, column, font, fg, wraplength)
+        self.items.append(item)
+        self.layout()
+        return item
+
+    def itemconfig(self, item, **options):
+        self.itemconfig_calls += 1
+        self.canvas.itemconfig(item, **options)
+
+    def set_background(self, color):
+        """设置画布背景色，与当前相同时不调用Tk"""
+        if color != self.background_color:
+            self.background_color = color
+            self.canvas.configure(bg=color)
+
+    def cell_width(self):
+        """每个单元格可用的文本宽度"""
+        return max(1, self.width // self.column_count - 2 * self.PADDING)
+
+    def layout(self):
+        """按两行、一到两列的网格把可见文本项放到单元格中央；第1列没有可见文本时第0列占满宽度"""
+        self.layout_passes += 1
+        self.column_count = 2 if any(item.visible and item.column == 1 for item in self.items) else 1
+        column_width = self.width / self.column_count
+        row_height = self.height / 2
+        for item in self.items:
+            self.canvas.coords(item.item, column_width * (item.column + 0.5), row_height * (item.row + 0.5))
+
+    def _on_configure(self, event):
+        if (event.width, event.height) != (self.width, self.height):
+            self.width, self.height = event.width, event.height
+            self.layout()
+
+    def stats(self):
+        """返回渲染统计"""
+        return {
+            "itemconfig_calls": self.itemconfig_calls,
+            "layout_passes": self.layout_passes
+        }
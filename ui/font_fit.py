@@ -0,0 +1,154 @@
+# 此文件是字体适配缓存，为标签选择能放下文本的最大字号，并缓存选择结果和字体对象
+# 字号选择先按"文本宽度与字号近似成正比"的模型预测，再用二分查找校正，通常只需一两次测量
+# 时钟和日期只由少量固定字符组成，可以用预先测量的字符宽度表求和，不再调用Tk测量
+import tkinter.font as tkFont
+from collections import OrderedDict
+
+
+class FontFitCache:
+    # 最小字号
+    MIN_SIZE = 8
+    # 宽度模型的默认相对误差，用于判断预测结果的相邻字号是否还需要测量
+    DEFAULT_MODEL_ERROR = 0.05
+    # 时钟（%H:%M:%S）和日期星期（%m-%d 周X）文本用到的字符
+    CLOCK_GLYPHS = "0123456789:- 周一二三四五六日"
+
+    def __init__(self, maxsize=256):
+        # 选择结果的LRU缓存：(字体, 起始字号, 文本, 可用宽度) -> 字号
+        self.maxsize = maxsize
+        self.cache = OrderedDict()
+        # 共享的字体对象池：(字体, 字号) -> tkFont.Font，避免重复创建Tcl字体对象
+        self.font_pool = {}
+        # 每种字体的宽度模型：宽度按字号等比缩放时的最大相对误差（由实际测量不断修正）
+        self.width_models = {}
+        # 字符宽度表：(字体, 字号) -> {字符: 宽度}
+        self.glyph_tables = {}
+        # 统计信息
+        self.hits = 0
+        self.misses = 0
+        self.measurements = 0
+
+    def get_font(self, family, size):
+        """从字体池获取字体对象，不存在时创建"""
+        key = (family, size)
+        font = self.font_pool.get(key)
+        if font is None:
+            font = tkFont.Font(family=family, size=size)
+            self.font_pool[key] = font
+        return font
+
+    def measure(self, family, size, text):
+        """测量文本在指定字体下的宽度"""
+        self.measurements += 1
+        return self.get_font(family, size).measure(text)
+
+    def prepare_glyph_tables(self, family, max_size, glyphs=CLOCK_GLYPHS):
+        """为字号MIN_SIZE到max_size预先测量字符宽度表（启动或更换字体时调用，已有的表不重复测量）"""
+        for size in range(self.MIN_SIZE, max_size + 1):
+            table = self.glyph_tables.setdefault((family, size), {})
+            for glyph in glyphs:
+                if glyph not in table:
+                    table[glyph] = self.measure(family, size, glyph)
+
+    def measure_glyphs(self, family, size, text):
+        """用字符宽度表求和得到文本宽度，只有表中没有的字符才调用Tk测量"""
+        table = self.glyph_tables.setdefault((family, size), {})
+        text_width = 0
+        for glyph in text:
+            glyph_width = table.get(glyph)
+            if glyph_width is None:
+                glyph_width = table[glyph] = self.measure(family, size, glyph)
+            text_width += glyph_width
+        return text_width
+
+    def fit(self, family, size, text, width, use_glyph_table=False):
+        """从size开始向下查找文本宽度小于width的最大字号，都放不下时返回最小字号
+
+        use_glyph_table为True时用字符宽度表求和代替测量，适用于时钟、日期等由固定字符组成的文本。
+        """
+        # 字符宽度表求和不调用Tk，时钟文本每秒都不同，不放入缓存以免挤掉其他结果
+        if use_glyph_table:
+            return self.search(family, size, text, width, use_glyph_table)
+
+        key = (family, size, text, width)
+        fitted = self.cache.get(key)
+        if fitted is not None:
+            self.cache.move_to_end(key)
+            self.hits += 1
+            return fitted
+
+        self.misses += 1
+        fitted = self.search(family, size, text, width)
+
+        self.cache[key] = fitted
+        # 超出容量时淘汰最久未使用的结果
+        if len(self.cache) > self.maxsize:
+            self.cache.popitem(last=False)
+        return fitted
+
+    def search(self, family, size, text, width, use_glyph_table=False):
+        """不使用缓存地查找字号：先测量起始字号，放不下时按宽度模型预测，再二分查找校正"""
+        if size < self.MIN_SIZE:
+            return self.MIN_SIZE
+        measure = self.measure_glyphs if use_glyph_table else self.measure
+
+        # 起始字号能放下时直接使用（文本不变或变短时的常见情况）
+        seed_width = measure(family, size, text)
+        if seed_width < width:
+            return size
+        if size == self.MIN_SIZE or seed_width <= 0:
+            return self.MIN_SIZE
+
+        # 按宽度与字号成正比预测能放下的最大字号
+        width_per_size = seed_width / size
+        predicted = max(self.MIN_SIZE, min(size - 1, int((width - 1) / width_per_size)))
+        predicted_width = measure(family, predicted, text)
+        self._update_model(family, predicted_width / (width_per_size * predicted))
+
+        # fits为已知能放下的最大字号（MIN_SIZE - 1表示尚未找到），too_big为已知放不下的最小字号
+        # 预测通常只差一号，先检查预测结果的相邻字号，仍不确定时再二分查找
+        if predicted_width < width:
+            # 相邻的大一号按模型估计仍明显放不下时，无需再测量
+            model_error = self.width_models.get(family, self.DEFAULT_MODEL_ERROR)
+            if predicted + 1 >= size or predicted_width * (predicted + 1) / predicted >= width * (1 + model_error):
+                return predicted
+            if measure(family, predicted + 1, text) >= width:
+                return predicted
+            fits, too_big = predicted + 1, size
+        else:
+            if predicted == self.MIN_SIZE:
+                return self.MIN_SIZE
+            if measure(family, predicted - 1, text) < width:
+                return predicted - 1
+            fits, too_big = self.MIN_SIZE - 1, predicted - 1
+
+        # 宽度随字号单调增加，在 (fits, too_big) 之间二分查找
+        while too_big - fits > 1:
+            middle = (fits + too_big) // 2
+            if measure(family, middle, text) < width:
+                fits = middle
+            else:
+                too_big = middle
+        return max(fits, self.MIN_SIZE)
+
+    def _update_model(self, family, ratio):
+        """用一次实际测量与等比预测的比值修正宽度模型的误差估计"""
+        error = abs(ratio - 1)
+        previous = self.width_models.get(family, self.DEFAULT_MODEL_ERROR)
+        # 误差估计偏保守：新误差更大时立即采用，更小时缓慢收敛
+        self.width_models[family] = error if error > previous else previous * 0.9 + error * 0.1
+
+    def clear(self):
+        """清空选择结果缓存（字体对象保留在池中）"""
+        self.cache.clear()
+
+    def stats(self):
+        """返回缓存统计"""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "measurements": self.measurements,
+            "cached": len(self.cache),
+            "glyph_tables": len(self.glyph_tables),
+            "fonts": len(self.font_pool)
+        }
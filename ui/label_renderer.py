@@ -0,0 +1,52 @@
+# 此文件是标签渲染层，记录每个标签最后一次设置的文字、字体和颜色，只在内容变化时才调用Tk
+class LabelRenderer:
+    # 渲染层管理的标签选项
+    OPTIONS = ("text", "font", "fg", "bg")
+
+    def __init__(self):
+        # 每个标签最后一次设置的选项值，以标签对象为键
+        self.applied = {}
+        # 实际发出的Tk配置调用次数和因内容未变化而跳过的次数
+        self.issued_calls = 0
+        self.skipped_calls = 0
+
+    def render(self, label, **options):
+        """设置标签选项（text/font/fg/bg），只把与上次不同的选项合并为一次config调用
+
+        返回是否发出了Tk调用。
+        """
+        applied = self.applied.setdefault(label, {})
+        changed = {key: value for key, value in options.items() if applied.get(key, self) != value}
+        if not changed:
+            self.skipped_calls += 1
+            return False
+
+        label.config(**changed)
+        applied.update(changed)
+        self.issued_calls += 1
+        return True
+
+    def get(self, label, option, default=None):
+        """获取标签最后一次通过渲染层设置的选项值"""
+        return self.applied.get(label, {}).get(option, default)
+
+    def invalidate(self, label=None):
+        """清除标签（不指定时为全部标签）的记录，下次渲染时重新设置所有选项"""
+        if label is None:
+            self.applied.clear()
+        else:
+            self.applied.pop(label, None)
+
+    def stats(self):
+        """返回Tk调用统计"""
+        total = self.issued_calls + self.skipped_calls
+        return {
+            "issued": self.issued_calls,
+            "skipped": self.skipped_calls,
+            "skipped_ratio": self.skipped_calls / total if total else 0.0
+        }
+
+    def reset_stats(self):
+        """清零Tk调用统计"""
+        self.issued_calls = 0
+        self.skipped_calls = 0
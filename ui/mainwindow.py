@@ -3,9 +3,32 @@ import tkinter.font as tkFont
 import json
 import os
 import datetime
+import time
+from core.schedule_engine import ScheduleEngine, normalize_timetable, WEEKDAYS_EN, WEEKDAYS_CN
+from core.tick_profiler import TickProfiler
+from core.settings_store import SettingsStore
+from core.timetable_store import TimetableStore
+from core.file_watcher import FileWatcher
+from core.compiled_cache import CompiledCache
+from core.ics_export import default_export_range, export_calendar, write_calendar
+from core.class_repository import ClassRepository, STORAGE_DATABASE, STORAGE_DIRECTORY, DEFAULT_CAPACITY
+from ui.label_renderer import LabelRenderer
+from ui.font_fit import FontFitCache
+from ui.canvas_renderer import CanvasRenderer
 
 
 class DragWindow(tk.Tk):
+    # 时钟刷新安排在整秒之后多少毫秒，避免计时器略早触发时仍显示上一秒
+    TICK_ALIGN_MARGIN_MS = 5
+    # 两次时钟刷新之间系统时间的变化与实际经过时间相差超过该秒数时，视为系统时间跳变（睡眠唤醒、对时）
+    CLOCK_JUMP_THRESHOLD = 2.0
+    # 拖动时两次移动窗口的最短间隔（毫秒），约为一帧
+    DRAG_FRAME_MS = 16
+    # 检查课程表文件是否被修改的间隔（毫秒）
+    FILE_WATCH_INTERVAL_MS = 500
+    # 班级选择框中表示程序目录中的课表（班级ID为空）的名称
+    LOCAL_CLASS_LABEL = "本机课表"
+    
     def __init__(self):
         super().__init__()
         self.title("课程表悬浮窗")
@@ -35,15 +58,77 @@ class DragWindow(tk.Tk):
         # 初始化可拖动状态，默认为不可拖动
         self.is_draggable = False
         
+        # 拖动状态：最近一次的目标位置、尚未执行的移动任务ID、拖动期间缓存的窗口尺寸
+        self.drag_target = None
+        self.drag_job = None
+        self.drag_window_size = None
+        
+        # 缓存的屏幕分辨率，开始拖动或加载窗口位置时重新读取
+        self.screen_size = None
+        
         # 初始化after任务ID列表
         self.after_ids = []
         
         # 初始化更新任务ID
         self.update_job = None
         
+        # 上一次时钟刷新时的(系统时间戳, 单调时钟)，用于检测系统时间跳变
+        self.last_tick = None
+        
+        # 初始化置顶检查任务ID
+        self._ensure_topmost_job = None
+        
+        # 初始化课程状态切换任务ID（上下课、午夜等时刻才刷新课程信息）
+        self.info_job = None
+        
+        # 初始化每天清除过期临时调课记录的任务ID
+        self.expiry_job = None
+        
+        # 课程表引擎（不依赖界面，负责计算课程状态）
+        self.timetable = {}
+        self.classtable_meta = None
+        self.term_calendar = None
+        self.schedule_engine = ScheduleEngine()
+        
+        # 标签渲染层（内容未变化时跳过Tk调用）
+        self.label_renderer = LabelRenderer()
+        
+        # 字体适配缓存（缓存字号选择结果，共享字体对象）
+        self.font_fit_cache = FontFitCache()
+        
+        # 界面设置存储（启动时只解析一次设置文件，修改后延迟合并写入）
+        project_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        self.settings_store = SettingsStore(os.path.join(project_path, "timetable_ui_settings.json"))
+        
         # 加载UI设置
         self.load_ui_settings()
         
+        # 多个班级的课表仓库（班级目录classes/或数据库classes.db，第一次使用时才创建），所有班级共用学期日历
+        if self.class_storage == STORAGE_DATABASE:
+            self.class_repository = ClassRepository(os.path.join(project_path, "classes.db"), STORAGE_DATABASE,
+                                                    self.class_cache_size,
+                                                    os.path.join(project_path, "term_calendar.json"))
+        else:
+            self.class_repository = ClassRepository(os.path.join(project_path, "classes"), STORAGE_DIRECTORY,
+                                                    self.class_cache_size,
+                                                    os.path.join(project_path, "term_calendar.json"))
+        
+        # 打开悬浮窗显示的班级的课程表数据库（唯一数据源），timetable.json和classtableMeta.json只用于导入导出
+        self.timetable_store = None
+        self.compiled_cache = None
+        try:
+            self._open_class(self.class_id)
+        except Exception as e:
+            print(f"打开班级{self.class_id}的课表时出错，改为显示本机课表: {e}")
+            self._open_class("")
+        
+        # 刷新耗时统计（环境变量TIMENEST_PROFILE=1或设置项profile_ticks开启），关闭时不做任何计时
+        self.tick_profiler = None
+        self.profile_overlay = None
+        self.profile_overlay_job = None
+        if os.environ.get("TIMENEST_PROFILE") == "1" or self.profile_ticks:
+            self._enable_tick_profiler()
+        
         # 使用after方法确保窗口完全初始化后再加载窗口位置
         self.after(100, self.load_window_position)
         
@@ -52,7 +137,12 @@ class DragWindow(tk.Tk):
         
         # 创建主框架
         self.main_frame = tk.Frame(self, bg=self.background_color)
-        self.main_frame.grid(sticky='nsew')
+        # 单画布渲染方式：四个文本画在同一个Canvas上，不使用主框架的grid布局
+        self.canvas_renderer = None
+        if self.renderer_mode == "canvas":
+            self.canvas_renderer = CanvasRenderer(self, self.background_color, self.window_width, self.window_height)
+        else:
+            self.main_frame.grid(sticky='nsew')
         # 第0列（时间列）和第1列（课程列）都可扩展，权重1:1
         self.main_frame.columnconfigure(0, weight=1)
         self.main_frame.columnconfigure(1, weight=1)
@@ -62,9 +152,7 @@ class DragWindow(tk.Tk):
         
         # 创建时间标签
         time_font = tkFont.Font(family="Arial", size=self.time_font_size)
-        self.time_label = tk.Label(self.main_frame, font=time_font, fg=self.text_color, bg=self.background_color)
-        # sticky='nsew'：让时间标签填充整个单元格（水平+垂直）
-        self.time_label.grid(row=0, column=0, sticky='nsew', padx=2, pady=2)
+        self.time_label = self._create_text_label(0, 0, time_font)
         
         # 设置初始鼠标穿透状态
         # 使用after方法确保窗口完全初始化后再设置
@@ -74,25 +162,34 @@ class DragWindow(tk.Tk):
         """初始化透明度设置"""
         # 创建日期和星期标签
         date_font = tkFont.Font(family="Arial", size=self.date_font_size)
-        self.date_label = tk.Label(self.main_frame, font=date_font, bg=self.background_color, fg=self.text_color)
-        self.date_label.grid(row=1, column=0, sticky='nsew', padx=2, pady=2)
+        self.date_label = self._create_text_label(1, 0, date_font)
         
         # 创建右键菜单
         self.context_menu = None
         
         # 创建课程信息标签
         class_info_font = tkFont.Font(family="Arial", size=self.class_info_font_size)
-        self.class_info_label = tk.Label(self.main_frame, font=class_info_font, bg=self.background_color, fg=self.text_color,wraplength=150)
-        if self.show_next_class:
-            self.class_info_label.grid(row=0, column=1, sticky='nsew', padx=2, pady=2)
+        self.class_info_label = self._create_text_label(0, 1, class_info_font, wraplength=150,
+                                                        visible=self.show_next_class)
         # 创建下一节课信息标签
         next_class_font = tkFont.Font(family="Arial", size=self.next_class_font_size)
-        self.next_class_label = tk.Label(self.main_frame, font=next_class_font, bg=self.background_color, fg=self.text_color,wraplength=150)
-        if self.show_countdown:
-            self.next_class_label.grid(row=1, column=1, sticky='nsew', padx=2, pady=2)  
+        self.next_class_label = self._create_text_label(1, 1, next_class_font, wraplength=150,
+                                                        visible=self.show_countdown)
         
         # 加载课程表
-        self.timetable = self.load_timetable()   
+        self.timetable = self.load_timetable() or {}
+        
+        # 课表加载失败或不存在时load_timetable不会刷新课程信息，这里补一次并安排后续切换
+        if self.info_job is None:
+            self.update_info(datetime.datetime.now())
+        
+        # 清除之前各天的临时调课记录，之后每天午夜执行一次
+        self._purge_expired_single_changes()
+        
+        # 监听课程表文件，内容改变时（手动编辑、部署脚本推送）自动重新加载，不需要重启程序
+        self.file_watcher = None
+        self.file_watch_job = None
+        self._start_file_watcher()
         
         # 绑定鼠标事件
         self.bind("<ButtonPress-1>", self.start_move)# type: ignore
@@ -116,8 +213,64 @@ class DragWindow(tk.Tk):
         # 应用字体设置
         self._apply_fonts()
     
-    def _adjust_font_size(self, label, text):
-        """根据文本长度调整标签的字体大小"""
+    def _enable_tick_profiler(self):
+        """开启刷新耗时统计：用计时包装替换各阶段方法，未开启时这些方法保持原样"""
+        self.tick_profiler = TickProfiler()
+        self.update_time = self.tick_profiler.wrap("update_time", self.update_time)
+        self.update_info = self.tick_profiler.wrap("update_info", self.update_info)
+        self._adjust_font_size = self.tick_profiler.wrap("adjust_font_size", self._adjust_font_size)
+        self.schedule_engine.evaluate = self.tick_profiler.wrap("evaluate", self.schedule_engine.evaluate)
+        print("已开启刷新耗时统计")
+    
+    def toggle_profile_overlay(self):
+        """显示或隐藏悬浮窗上的耗时统计浮层"""
+        if not self.tick_profiler:
+            return
+        try:
+            if self.profile_overlay:
+                if self.profile_overlay_job:
+                    self.after_cancel(self.profile_overlay_job)
+                    self.profile_overlay_job = None
+                self.profile_overlay.destroy()
+                self.profile_overlay = None
+                return
+            
+            self.profile_overlay = tk.Label(self, font=("Arial", 7), justify=tk.LEFT, anchor='nw',
+                                            bg="black", fg="#00ff00")
+            self.profile_overlay.place(x=0, y=0, relwidth=1)
+            self._refresh_profile_overlay()
+        except Exception as e:
+            print(f"切换耗时统计浮层时出错: {e}")
+    
+    def _refresh_profile_overlay(self):
+        """每秒刷新耗时统计浮层"""
+        try:
+            self.profile_overlay.config(text=self.tick_profiler.summary_text() or "暂无数据")
+            self.profile_overlay.lift()
+            self.profile_overlay_job = self.after(1000, self._refresh_profile_overlay)
+        except Exception as e:
+            print(f"刷新耗时统计浮层时出错: {e}")
+    
+    def _create_text_label(self, row, column, font, wraplength=0, visible=True):
+        """创建显示在第row行第column列的文本标签，单画布渲染方式下为画布上的文本项"""
+        if self.canvas_renderer:
+            label = self.canvas_renderer.add_text(row, column, font, self.text_color, wraplength)
+            if not visible:
+                label.grid_forget()
+            return label
+        
+        label = tk.Label(self.main_frame, font=font, bg=self.background_color, fg=self.text_color,
+                         wraplength=wraplength)
+        if visible:
+            # sticky='nsew'：让标签填充整个单元格（水平+垂直）
+            label.grid(row=row, column=column, sticky='nsew', padx=2, pady=2)
+        return label
+    
+    def _adjust_font_size(self, label, text, use_glyph_table=False):
+        """根据文本长度调整标签的字体大小
+
+        use_glyph_table为True时用预先测量的字符宽度表计算文本宽度（用于时钟和日期标签）。
+        """
         # 获取标签的宽度
         label_width = label.winfo_width()
         
@@ -126,23 +279,22 @@ class DragWindow(tk.Tk):
             label_width = self.winfo_width() - 20  # 减去一些边距
         
         # 获取当前字体
-        current_font = tkFont.Font(font=label['font'])
-        font_family = current_font['family']
-        current_size = current_font['size']
-        
-        # 从当前字体大小开始，向下调整到最小字体大小8
-        for size in range(current_size, 7, -1):
-            # 创建临时字体对象来测量文本宽度
-            temp_font = tkFont.Font(family=font_family, size=size)
-            text_width = temp_font.measure(text)
-            
-            # 如果文本宽度小于标签宽度，则使用该字体大小
-            if text_width < label_width:
-                label.config(font=(font_family, size))
-                break
-        else:
-            # 如果所有字体都太大，使用最小字体大小
-            label.config(font=(font_family, 8))
+        font_family, current_size = self._get_label_font(label)
+        
+        # 从当前字体大小开始，向下调整到最小字体大小8（相同文本和宽度直接使用缓存结果）
+        size = self.font_fit_cache.fit(font_family, current_size, text, label_width, use_glyph_table)
+        self.label_renderer.render(label, font=(font_family, size))
+    
+    def _get_label_font(self, label):
+        """获取标签当前的 (字体, 字号)，优先使用渲染层记录的值，避免创建新的字体对象"""
+        font = self.label_renderer.get(label, "font")
+        if isinstance(font, tuple):
+            return font
+        try:
+            current_font = tkFont.nametofont(str(label['font']))
+        except tk.TclError:
+            current_font = tkFont.Font(font=label['font'])
+        return current_font['family'], current_font['size']
         
     
         
@@ -150,40 +302,36 @@ class DragWindow(tk.Tk):
     def _apply_fonts(self):
         """应用字体设置"""
         # 应用时间标签字体
-        time_font = tkFont.Font(family="Arial", size=self.time_font_size)
-        self.time_label.config(font=time_font)
+        self.label_renderer.render(self.time_label, font=("Arial", self.time_font_size))
         
         # 应用日期标签字体
-        date_font = tkFont.Font(family="Arial", size=self.date_font_size)
-        self.date_label.config(font=date_font)
+        self.label_renderer.render(self.date_label, font=("Arial", self.date_font_size))
+        
+        # 为时间和日期标签可能用到的字号预先测量字符宽度表
+        self.font_fit_cache.prepare_glyph_tables("Arial", max(self.time_font_size, self.date_font_size))
         
         # 应用课程信息标签字体
-        class_info_font = tkFont.Font(family="Arial", size=self.class_info_font_size)
-        self.class_info_label.config(font=class_info_font)
+        self.label_renderer.render(self.class_info_label, font=("Arial", self.class_info_font_size))
         
         # 应用下节课标签字体
-        next_class_font = tkFont.Font(family="Arial", size=self.next_class_font_size)
-        self.next_class_label.config(font=next_class_font)
+        self.label_renderer.render(self.next_class_label, font=("Arial", self.next_class_font_size))
         
-        # 调整字体大小以适应窗口
-        # 注意：_adjust_font_size需要参数，不能直接调用
-        # 在_apply_background_and_transparency中会处理字体调整
+        # 按新的字号重新调整已显示文字的字体大小，否则标签在文字改变前会一直按设置的字号显示（可能被截断）
+        for label, use_glyph_table in ((self.time_label, True), (self.date_label, True),
+                                       (self.class_info_label, False), (self.next_class_label, False)):
+            text = self.label_renderer.get(label, "text")
+            if text:
+                self._adjust_font_size(label, text, use_glyph_table)
         
     def _apply_background_and_transparency(self):
         """应用背景色、透明度和文字颜色"""
         # 重新设置背景色
         self.configure(bg=self.background_color)
         self.main_frame.configure(bg=self.background_color)
-        self.time_label.configure(bg=self.background_color)
-        self.date_label.configure(bg=self.background_color)
-        self.class_info_label.configure(bg=self.background_color)
-        self.next_class_label.configure(bg=self.background_color)
         
-        # 应用文字颜色
-        self.time_label.configure(fg=self.text_color)
-        self.date_label.configure(fg=self.text_color)
-        self.class_info_label.configure(fg=self.text_color)
-        self.next_class_label.configure(fg=self.text_color)
+        # 应用标签的背景色和文字颜色（与当前相同的标签不会重复设置）
+        for label in (self.time_label, self.date_label, self.class_info_label, self.next_class_label):
+            self.label_renderer.render(label, bg=self.background_color, fg=self.text_color)
         
         # 应用透明度
         alpha = self.transparency / 100.0
@@ -193,22 +341,10 @@ class DragWindow(tk.Tk):
             print(f"应用透明度时出错: {e}")
         
         # 重新调整课程信息标签的字体大小
-        if hasattr(self, 'class_info_label') and self.class_info_label.cget("text"):
-            self._adjust_font_size(self.class_info_label, self.class_info_label.cget("text"))
-        if hasattr(self, 'next_class_label') and self.next_class_label.cget("text"):
-            self._adjust_font_size(self.next_class_label, self.next_class_label.cget("text"))
-    
-    def _get_screen_resolution(self):
-        """获取屏幕分辨率"""
-        try:
-            # 使用winfo_screenwidth和winfo_screenheight获取屏幕分辨率
-            screen_width = self.winfo_screenwidth()
-            screen_height = self.winfo_screenheight()
-            return screen_width, screen_height
-        except Exception as e:
-            print(f"获取屏幕分辨率时出错: {e}")
-            # 返回默认分辨率
-            return 1920, 1080
+        for label in (self.class_info_label, self.next_class_label):
+            text = self.label_renderer.get(label, "text")
+            if text:
+                self._adjust_font_size(label, text)
     
     def _calculate_window_position(self, screen_width, screen_height, base_x=878, base_y=0, base_screen_width=1920, base_screen_height=1080):
         """根据屏幕分辨率计算窗口位置，使窗口在不同分辨率下出现在同一相对位置"""
@@ -251,6 +387,10 @@ class DragWindow(tk.Tk):
             self.context_menu.add_command(label="UI设置", command=self._open_ui_settings_from_menu)
             self.context_menu.add_command(label='临时调课', command=self._open_temp_class_change_from_menu)
             self.context_menu.add_command(label='编辑课表和时间表', command=self._open_timetable_wizard)
+            self.context_menu.add_command(label='导出日历文件', command=self.export_calendar_file)
+            self.context_menu.add_command(label='切换班级', command=self.open_class_selector)
+            if self.tick_profiler:
+                self.context_menu.add_command(label='显示/隐藏耗时统计', command=self.toggle_profile_overlay)
 
             self.context_menu.add_separator()
             self.context_menu.add_command(label="退出", command=self._quit_from_menu)
@@ -300,6 +440,23 @@ class DragWindow(tk.Tk):
             import tkinter.messagebox as messagebox
             messagebox.showerror("错误", f"打开时间表设置向导时出错: {e}")
     
+    def export_calendar_file(self):
+        """把课表导出为ICS日历文件（有学期日历时为整个学期，否则为今天起20周），供日历应用导入"""
+        from tkinter import filedialog, messagebox
+        try:
+            path = filedialog.asksaveasfilename(title="导出日历文件", defaultextension=".ics",
+                                                initialfile=f"{self.class_id or '课程表'}.ics",
+                                                filetypes=[("iCalendar文件", "*.ics")])
+            if not path:
+                return
+            start_date, end_date = default_export_range(self.schedule_engine, datetime.date.today())
+            write_calendar(path, export_calendar(self.schedule_engine, start_date, end_date,
+                                                 self.class_id or "课程表"))
+            messagebox.showinfo("导出日历文件", f"已导出{start_date}至{end_date}的课程")
+        except Exception as e:
+            print(f"导出日历文件时出错: {e}")
+            messagebox.showerror("错误", f"导出日历文件时出错: {e}")
+    
     def _quit_from_menu(self):
         """从菜单退出程序"""
         if hasattr(self, 'tray_manager'):
@@ -315,10 +472,9 @@ class DragWindow(tk.Tk):
         except Exception as e:
             print(f"设置窗口置顶时出错: {e}")
         
-        # 每5秒检查一次窗口置顶状态
+        # 每5秒检查一次窗口置顶状态（只保存最新的任务ID，不累积到after_ids中）
         try:
-            after_id = self.after(5000, self._ensure_topmost)
-            self.after_ids.append(after_id)
+            self._ensure_topmost_job = self.after(5000, self._ensure_topmost)
         except Exception as e:
             print(f"安排下次检查窗口置顶时出错: {e}")
     
@@ -339,10 +495,6 @@ class DragWindow(tk.Tk):
     def load_ui_settings(self):
         """加载UI设置"""
         try:
-            # 获取程序主目录
-            project_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-            settings_file = os.path.join(project_path, "timetable_ui_settings.json")
-            
             # 默认设置
             self.background_color = "white"
             self.text_color = "black"
@@ -355,10 +507,14 @@ class DragWindow(tk.Tk):
             self.next_class_font_size = 12
             self.window_width = 175
             self.window_height = 50
-            
-            if os.path.exists(settings_file):
-                with open(settings_file, 'r', encoding='utf-8') as f:
-                    settings = json.load(f)
+            self.renderer_mode = "label"
+            self.profile_ticks = False
+            self.class_id = ""
+            self.class_storage = "directory"
+            self.class_cache_size = DEFAULT_CAPACITY
+            
+            if self.settings_store.exists():
+                settings = self.settings_store.snapshot()
                 
                 # 应用设置
                 self.background_color = settings.get("background_color", "white")
@@ -372,6 +528,15 @@ class DragWindow(tk.Tk):
                 self.next_class_font_size = settings.get("next_class_font_size", 12)
                 self.window_width = settings.get("window_width", 280)
                 self.window_height = settings.get("window_height", 65)
+                # 渲染方式："label"为Frame+Label布局，"canvas"为单画布绘制（修改后重启生效）
+                self.renderer_mode = settings.get("renderer", "label")
+                # 是否开启刷新耗时统计
+                self.profile_ticks = settings.get("profile_ticks", False)
+                # 悬浮窗显示的班级（空为程序目录中的课表）、班级课表的保存方式（"directory"或"database"）
+                # 和最多保留编译结果的班级数
+                self.class_id = settings.get("class_id", "")
+                self.class_storage = settings.get("class_storage", "directory")
+                self.class_cache_size = settings.get("class_cache_size", DEFAULT_CAPACITY)
             
             # 设置窗口大小
             self.geometry(f"{self.window_width}x{self.window_height}")
@@ -396,6 +561,11 @@ class DragWindow(tk.Tk):
             self.next_class_font_size = 12
             self.window_width = 175
             self.window_height = 50
+            self.renderer_mode = "label"
+            self.profile_ticks = False
+            self.class_id = ""
+            self.class_storage = "directory"
+            self.class_cache_size = DEFAULT_CAPACITY
     
     def set_draggable(self, draggable):
         """设置窗口是否可拖动"""
@@ -408,44 +578,63 @@ class DragWindow(tk.Tk):
     def start_move(self, event):
         """开始移动窗口"""
         if self.is_draggable:
-            self.x = event.x
-            self.y = event.y
+            # 记录指针相对窗口左上角的偏移；拖动事件绑定在窗口上，event.x/event.y是相对被点击的子标签的坐标，不能直接使用
+            self.x = event.x_root - self.winfo_x()
+            self.y = event.y_root - self.winfo_y()
+            # 开始拖动时重新读取屏幕分辨率（屏幕设置可能已改变）和窗口尺寸，拖动过程中使用缓存
+            self.screen_size = None
+            self.drag_window_size = (self.winfo_width(), self.winfo_height())
     
     def stop_move(self, event):
         """停止移动窗口"""
         if self.is_draggable:
+            # 先完成尚未执行的移动，再保存窗口位置
+            if self.drag_job is not None:
+                self.after_cancel(self.drag_job)
+                self._apply_drag()
+            self.drag_window_size = None
             # 保存窗口位置
             self.save_window_position()
     
     def on_motion(self, event):
-        """移动窗口"""
+        """记录拖动目标位置，每帧最多移动一次窗口"""
         if self.is_draggable:
-            deltax = event.x - self.x
-            deltay = event.y - self.y
-            x = self.winfo_x() + deltax
-            y = self.winfo_y() + deltay
+            # 用指针的屏幕坐标计算目标位置，不需要查询窗口当前位置
+            self.drag_target = (event.x_root - self.x, event.y_root - self.y)
+            if self.drag_job is None:
+                self.drag_job = self.after(self.DRAG_FRAME_MS, self._apply_drag)
+    
+    def _apply_drag(self):
+        """把窗口移动到最近一次记录的拖动目标位置，期间的其他移动事件被合并"""
+        self.drag_job = None
+        if self.drag_target is not None:
+            x, y = self.drag_target
+            self.drag_target = None
             self.set_display_postion(x, y)
     
     def _get_screen_resolution(self):
-        """获取屏幕分辨率"""
-        try:
-            # 获取屏幕宽度和高度
-            screen_width = self.winfo_screenwidth()
-            screen_height = self.winfo_screenheight()
-            return screen_width, screen_height
-        except Exception as e:
-            print(f"获取屏幕分辨率时出错: {e}")
-            # 返回默认值
-            return 1920, 1080
+        """获取屏幕分辨率（使用缓存，screen_size被清空后重新读取）"""
+        if self.screen_size is None:
+            try:
+                # 获取屏幕宽度和高度
+                self.screen_size = (self.winfo_screenwidth(), self.winfo_screenheight())
+            except Exception as e:
+                print(f"获取屏幕分辨率时出错: {e}")
+                # 返回默认值
+                return 1920, 1080
+        return self.screen_size
 
     def set_display_postion(self, x, y):
         """设置窗口显示位置，确保窗口不会被拖离屏幕"""
         # 获取屏幕分辨率
         screen_width, screen_height = self._get_screen_resolution()
         
-        # 获取窗口尺寸
-        window_width = self.winfo_width()
-        window_height = self.winfo_height()
+        # 获取窗口尺寸（拖动期间使用开始拖动时的尺寸）
+        if self.drag_window_size:
+            window_width, window_height = self.drag_window_size
+        else:
+            window_width = self.winfo_width()
+            window_height = self.winfo_height()
         
         # 确保窗口不会超出屏幕边界
         # 左边界检查
@@ -465,9 +654,13 @@ class DragWindow(tk.Tk):
         self.geometry(f"+{x}+{y}")
     
     def update_time(self):
-        """更新时间显示"""
+        """更新时间显示，并安排在下一个整秒时刻再次更新"""
         try:
             now = datetime.datetime.now()
+            
+            # 睡眠唤醒或系统对时后课程信息可能已经过时，立即重新计算一次
+            self._check_clock_jump(now)
+            
             current_time = now.strftime("%H:%M:%S")
             current_date = now.strftime("%m-%d")
             
@@ -475,31 +668,57 @@ class DragWindow(tk.Tk):
             weekdays = ["周一", "周二", "周三", "周四", "周五", "周六", "周日"]
             weekday = weekdays[now.weekday()]
             
-            # 更新时间标签
-            self.time_label.config(text=current_time)
-            self._adjust_font_size(self.time_label, current_time)
-            self.date_label.config(text=f"{current_date} {weekday}")
-            self._adjust_font_size(self.date_label, f"{current_date} {weekday}")
-            
-            # 更新课程信息
-            self.update_info(now)
+            # 更新时间标签，文字变化时才重新调整字体大小
+            # 课程信息只在状态切换时刻由_schedule_next_transition安排刷新
+            # 时钟和日期只由固定字符组成，按字符宽度表计算宽度，不再每秒调用Tk测量
+            if self.label_renderer.render(self.time_label, text=current_time):
+                self._adjust_font_size(self.time_label, current_time, use_glyph_table=True)
+            date_text = f"{current_date} {weekday}"
+            if self.label_renderer.render(self.date_label, text=date_text):
+                self._adjust_font_size(self.date_label, date_text, use_glyph_table=True)
         except Exception as e:
             # 窗口可能已被销毁，停止更新
             print(f"更新时间时出错: {e}")
             return
         
-        # 每秒更新一次
+        # 按完成刷新后的当前时间计算到下一个整秒的间隔，扣除本次刷新的耗时，避免误差累积
+        # 更新任务ID只保存最新的一个，不累积到after_ids中
         try:
-            after_id = self.after(1000, self.update_time)
-            self.after_ids.append(after_id)
-            # 保存更新任务ID
-            self.update_job = after_id
+            self.update_job = self.after(self._ms_to_next_second(), self.update_time)
         except Exception as e:
             # 窗口可能已被销毁，停止更新
             print(f"安排下次更新时出错: {e}")
     
+    def _ms_to_next_second(self):
+        """返回从现在到下一个整秒（加上少量余量）的毫秒数"""
+        return 1000 - datetime.datetime.now().microsecond // 1000 + self.TICK_ALIGN_MARGIN_MS
+    
+    def _check_clock_jump(self, now):
+        """比较系统时间与单调时钟的变化，检测到跳变时立即刷新一次课程信息
+        
+        睡眠期间错过的刷新不会逐次补上，只按当前时间重新计算一次。
+        """
+        wall = now.timestamp()
+        monotonic = time.monotonic()
+        last_tick = self.last_tick
+        self.last_tick = (wall, monotonic)
+        if last_tick is None:
+            return
+        
+        wall_elapsed = wall - last_tick[0]
+        monotonic_elapsed = monotonic - last_tick[1]
+        # 系统时间被调整（两种时钟变化不一致），或距上次刷新远超1秒（睡眠唤醒，部分系统的单调时钟在睡眠时也会计时）
+        if (abs(wall_elapsed - monotonic_elapsed) > self.CLOCK_JUMP_THRESHOLD
+                or wall_elapsed > 1 + self.CLOCK_JUMP_THRESHOLD):
+            print(f"检测到系统时间跳变（{wall_elapsed:.1f}秒），重新计算课程信息")
+            self.update_info(now)
+            # 可能已经跨过午夜，清除过期的临时调课记录并重新安排每天的清除任务
+            self._purge_expired_single_changes()
+    
     def load_timetable(self):
-        """从项目目录加载课程表JSON文件"""
+        """从课程表数据库加载课程表（项目目录中的JSON文件有更新时先导入数据库）"""
+        if self.class_id:
+            return self._load_class_timetable()
         try:
             # 获取项目目录
             project_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -508,66 +727,69 @@ class DragWindow(tk.Tk):
             timetable_file_path = os.path.join(project_path, "timetable.json")
             classtable_meta_file_path = os.path.join(project_path, "classtableMeta.json")
             
+            store = self.timetable_store
+            
             # 检查文件存在性
             timetable_exists = os.path.exists(timetable_file_path)
             classtable_meta_exists = os.path.exists(classtable_meta_file_path)
             
-            # 如果两个文件都不存在，弹窗提示
-            if not timetable_exists and not classtable_meta_exists:
+            # 数据库和两个文件中都没有课表时，弹窗提示
+            if store.is_empty() and not timetable_exists and not classtable_meta_exists:
                 print("未找到课程表文件，请您自定义课表之后重启程序")
                 # 创建提示窗口
                 self._show_no_timetable_dialog()
                 return {}
             
-            # 如果只有classtableMeta.json存在，转换为timetable.json
-            if classtable_meta_exists and not timetable_exists:
-                print("发现classtableMeta.json，正在转换为timetable.json...")
-                self._convert_classtable_meta_to_timetable(classtable_meta_file_path, timetable_file_path)
-            
-            # 如果只有timetable.json存在，转换为classtableMeta.json
-            elif timetable_exists and not classtable_meta_exists:
-                print("发现timetable.json，正在转换为classtableMeta.json...")
-                self._convert_timetable_to_classtable_meta(timetable_file_path, classtable_meta_file_path)
-            
-            # 加载classtableMeta.json（如果存在）
-            if classtable_meta_exists:
-                with open(classtable_meta_file_path, 'r', encoding='utf-8') as f:
-                    self.classtable_meta = json.load(f)
-            else:
-                self.classtable_meta = None
-            
-            # 加载课程表
-            with open(timetable_file_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            
-            # 处理可能的嵌套结构
-            if "timetable" in data:
-                timetable = data["timetable"]
+            # JSON文件在上次导入或导出之后被修改过（首次启动、手动编辑或部署脚本推送）时导入数据库
+            if (timetable_exists or classtable_meta_exists) and \
+                    store.source_changed(timetable_file_path, classtable_meta_file_path):
+                print("发现更新的课程表文件，正在导入课程表数据库...")
+                store.import_files(timetable_file_path, classtable_meta_file_path)
+            
+            # 数据库和学期日历都没有改变时直接使用缓存的预编译结果
+            compiled_state = self.compiled_cache.load()
+            if compiled_state is not None:
+                self.schedule_engine.load_compiled(compiled_state)
+                self.classtable_meta = self.schedule_engine.classtable_meta
+                converted_timetable = self.schedule_engine.timetable
+                print("课表已从缓存加载")
             else:
-                timetable = data
-            
-            # 转换星期名称为英文
-            converted_timetable = {}
-            weekdays_en = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
-            weekdays_cn = ["周一", "周二", "周三", "周四", "周五", "周六", "周日"]
-            
-            for i, day_cn in enumerate(weekdays_cn):
-                if day_cn in timetable:
-                    converted_timetable[weekdays_en[i]] = timetable[day_cn]
-                elif weekdays_en[i] in timetable:
-                    converted_timetable[weekdays_en[i]] = timetable[weekdays_en[i]]
+                # 从数据库读取课表和classtableMeta数据
+                self.classtable_meta = store.export_classtable_meta()
+                data = store.export_timetable()
+                
+                # 加载学期日历term_calendar.json（可选，包含放假、调休和特殊课表安排）
+                term_calendar_file_path = os.path.join(project_path, "term_calendar.json")
+                if os.path.exists(term_calendar_file_path):
+                    with open(term_calendar_file_path, 'r', encoding='utf-8') as f:
+                        self.term_calendar = json.load(f)
                 else:
-                    converted_timetable[weekdays_en[i]] = []
+                    self.term_calendar = None
+                
+                # 转换星期名称为英文，并交给课程表引擎预编译索引
+                converted_timetable = normalize_timetable(data)
+                self.schedule_engine.load(converted_timetable, self.classtable_meta, self.term_calendar,
+                                          data.get("rotation"))
+                
+                # 输出课程信息
+                print("课表加载完成:")
+                for day_en, day_cn in zip(WEEKDAYS_EN, WEEKDAYS_CN):
+                    if converted_timetable[day_en]:
+                        print(f"{day_cn}: {converted_timetable[day_en]}")
+                    else:
+                        print(f"{day_cn}: 无课程")
+                
+                # 保存预编译结果供下次启动使用
+                self.compiled_cache.save(self.schedule_engine.compiled_state())
             
-            # 输出课程信息
-            print("课表加载完成:")
-            for i, day_cn in enumerate(weekdays_cn):
-                if converted_timetable[weekdays_en[i]]:
-                    print(f"{day_cn}: {converted_timetable[weekdays_en[i]]}")
-                else:
-                    print(f"{day_cn}: 无课程")
+            # 旧版本按星期记录的临时调课（如"monday_3"）改为按今天或之后第一个对应日期记录
+            renamed = self.schedule_engine.migrate_single_change_keys(datetime.date.today())
+            if renamed:
+                store.rename_single_changes(renamed)
+                print(f"已将{len(renamed)}条临时调课记录改为按日期记录")
             
-            # 更新实例变量
+            # 更新实例变量（改键后引擎换用了新的classtable_meta）
+            self.classtable_meta = self.schedule_engine.classtable_meta
             self.timetable = converted_timetable
             
             # 刷新界面显示
@@ -577,99 +799,163 @@ class DragWindow(tk.Tk):
         except Exception as e:
             print(f"加载课程表时出错: {e}")
     
-    def _convert_classtable_meta_to_timetable(self, meta_file_path, timetable_file_path):
-        """将classtableMeta.json转换为timetable.json"""
+    def _load_class_timetable(self):
+        """从课表仓库加载所选班级的课程表，最近使用过且没有修改时直接使用仓库中的编译结果"""
         try:
-            # 读取classtableMeta.json
-            with open(meta_file_path, 'r', encoding='utf-8') as f:
-                meta_data = json.load(f)
-            
-            # 构建timetable.json数据结构
-            timetable_data = {"timetable": {}}
-            
-            # 获取classtable和timetable数据
-            classtable = meta_data.get("classtable", {})
-            time_slots = meta_data.get("timetable", {})
-            
-            # 合并时间信息和课程信息
-            weekdays = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
-            weekdays_cn = ["周一", "周二", "周三", "周四", "周五", "周六", "周日"]
-            
-            for i, day in enumerate(weekdays):
-                if day in time_slots and day in classtable:
-                    # 合并时间信息和课程信息
-                    timetable_data["timetable"][day] = []
-                    for j, time_slot in enumerate(time_slots[day]):
-                        if j < len(classtable[day]):
-                            # 添加课程信息
-                            slot = time_slot.copy()
-                            slot["subject"] = classtable[day][j]
-                            # 添加默认的教师和教室信息
-                            slot["teacher"] = "教师"
-                            slot["classroom"] = "教室"
-                            timetable_data["timetable"][day].append(slot)
-                elif day in time_slots:
-                    # 只有时间信息，没有课程信息
-                    timetable_data["timetable"][day] = time_slots[day]
-                elif day in classtable:
-                    # 只有课程信息，没有时间信息
-                    timetable_data["timetable"][day] = [{"subject": subject} for subject in classtable[day]]
-            
-            # 写入timetable.json
-            with open(timetable_file_path, 'w', encoding='utf-8') as f:
-                json.dump(timetable_data, f, ensure_ascii=False, indent=2)
-            
-            print("转换完成: classtableMeta.json -> timetable.json")
+            engine = self.class_repository.engine(self.class_id)
+            self.schedule_engine.load_compiled(engine.compiled_state())
+            self.classtable_meta = self.schedule_engine.classtable_meta
+            print(f"已加载班级{self.class_id}的课表")
+            
+            # 旧版本按星期记录的临时调课改为按日期记录
+            renamed = self.schedule_engine.migrate_single_change_keys(datetime.date.today())
+            if renamed:
+                self.timetable_store.rename_single_changes(renamed)
+                print(f"已将{len(renamed)}条临时调课记录改为按日期记录")
+            
+            self.classtable_meta = self.schedule_engine.classtable_meta
+            self.timetable = self.schedule_engine.timetable
+            self.update_info(datetime.datetime.now())
+            return self.timetable
         except Exception as e:
-            print(f"转换classtableMeta.json时出错: {e}")
+            print(f"加载班级{self.class_id}的课程表时出错: {e}")
     
-    def _convert_timetable_to_classtable_meta(self, timetable_file_path, meta_file_path):
-        """将timetable.json转换为classtableMeta.json"""
+    def _open_class(self, class_id):
+        """打开班级的课程表数据库，class_id为空时为程序目录中的课表"""
+        project_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        self.class_id = class_id
+        if class_id:
+            # 仓库中的班级由仓库缓存编译结果
+            self.timetable_store = self.class_repository.store(class_id)
+            self.compiled_cache = None
+            return
+        self.timetable_store = TimetableStore(os.path.join(project_path, "timetable.db"))
+        # 预编译课表的缓存，数据库和学期日历都没有改变时启动不再解析和编译课表
+        self.compiled_cache = CompiledCache(os.path.join(project_path, "timetable.cache"),
+                                            [os.path.join(project_path, "timetable.db"),
+                                             os.path.join(project_path, "term_calendar.json")])
+    
+    def _close_timetable_store(self):
+        """关闭程序目录中的课程表数据库，有改动时导出timetable.json和classtableMeta.json（仓库中的班级由仓库负责）"""
+        if self.class_id or not self.timetable_store:
+            return
         try:
-            # 读取timetable.json
-            with open(timetable_file_path, 'r', encoding='utf-8') as f:
-                timetable_data = json.load(f)
-            
-            # 处理可能的嵌套结构
-            if "timetable" in timetable_data:
-                timetable = timetable_data["timetable"]
-            else:
-                timetable = timetable_data
-            
-            # 构建classtableMeta.json数据结构
-            meta_data = {
-                "timetable": {},
-                "classtable": {},
-                "allclass": []
-            }
-            
-            # 提取时间信息和课程信息
-            weekdays = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
-            all_classes = set()
-            
-            for day in weekdays:
-                if day in timetable:
-                    # 提取时间信息
-                    meta_data["timetable"][day] = [
-                        {"start_time": slot.get("start_time", ""), "end_time": slot.get("end_time", "")}
-                        for slot in timetable[day]
-                    ]
-                    
-                    # 提取课程信息
-                    meta_data["classtable"][day] = [slot.get("subject", "") for slot in timetable[day]]
-                    
-                    # 收集所有课程
-                    all_classes.update(meta_data["classtable"][day])    
-            # 设置allclass
-            meta_data["allclass"] = list(all_classes)
-            
-            # 写入classtableMeta.json
-            with open(meta_file_path, 'w', encoding='utf-8') as f:
-                json.dump(meta_data, f, ensure_ascii=False, indent=2)
-            
-            print("转换完成: timetable.json -> classtableMeta.json")
+            if self.timetable_store.dirty:
+                project_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+                self.timetable_store.export_files(os.path.join(project_path, "timetable.json"),
+                                                  os.path.join(project_path, "classtableMeta.json"))
+                print("课程表已导出为timetable.json和classtableMeta.json")
+            self.timetable_store.close()
         except Exception as e:
-            print(f"转换timetable.json时出错: {e}")
+            print(f"导出课程表时出错: {e}")
+    
+    def class_choices(self):
+        """班级选择框中的选项：程序目录中的课表和仓库中的所有班级"""
+        return [self.LOCAL_CLASS_LABEL] + self.class_repository.class_ids()
+    
+    def class_id_of(self, label):
+        """班级选择框中的选项对应的班级ID"""
+        return "" if label == self.LOCAL_CLASS_LABEL else label.strip()
+    
+    def class_label_of(self, class_id):
+        return class_id or self.LOCAL_CLASS_LABEL
+    
+    def store_for_class(self, class_id):
+        """班级的课程表数据库（供课表设置向导和临时调课使用），悬浮窗显示的班级返回同一个对象"""
+        if class_id == self.class_id:
+            return self.timetable_store
+        return self.class_repository.store(class_id)
+    
+    def engine_for_class(self, class_id):
+        """班级的课程表引擎，悬浮窗显示的班级返回悬浮窗使用的引擎"""
+        if class_id == self.class_id:
+            return self.schedule_engine
+        return self.class_repository.engine(class_id)
+    
+    def reload_class(self, class_id):
+        """班级的课表保存后调用，悬浮窗显示的班级立即重新加载"""
+        if class_id == self.class_id:
+            self.load_timetable()
+    
+    def select_class(self, class_id):
+        """切换悬浮窗显示的班级，并记住选择"""
+        if class_id == self.class_id:
+            return
+        try:
+            self._close_timetable_store()
+            self._open_class(class_id)
+            self.settings_store.update({"class_id": class_id})
+            # 监听新班级的课程表文件
+            if self.file_watch_job:
+                self.after_cancel(self.file_watch_job)
+                self.file_watch_job = None
+            if self.file_watcher:
+                self.file_watcher.close()
+            self._start_file_watcher()
+            self.load_timetable()
+            self._purge_expired_single_changes()
+        except Exception as e:
+            print(f"切换班级时出错: {e}")
+    
+    def open_class_selector(self):
+        """打开选择悬浮窗显示班级的窗口"""
+        from tkinter import ttk
+        try:
+            if getattr(self, 'class_selector', None) and self.class_selector.winfo_exists():
+                self.class_selector.lift()
+                return
+            self.class_selector = tk.Toplevel(self)
+            self.class_selector.title("切换班级")
+            self.class_selector.resizable(False, False)
+            frame = ttk.Frame(self.class_selector, padding="10")
+            frame.pack()
+            ttk.Label(frame, text="班级:").grid(row=0, column=0, padx=5, pady=5)
+            class_var = tk.StringVar(value=self.class_label_of(self.class_id))
+            ttk.Combobox(frame, textvariable=class_var, values=self.class_choices(), state="readonly",
+                         width=20).grid(row=0, column=1, padx=5, pady=5)
+            
+            def confirm():
+                self.class_selector.destroy()
+                self.select_class(self.class_id_of(class_var.get()))
+            
+            ttk.Button(frame, text="确定", command=confirm).grid(row=1, column=0, columnspan=2, pady=(10, 0))
+            self._center_window(self.class_selector)
+        except Exception as e:
+            print(f"打开班级选择窗口时出错: {e}")
+    
+    def _watched_paths(self):
+        """需要监听的课程表文件：悬浮窗显示的班级的timetable.json和classtableMeta.json，以及学期日历"""
+        project_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        if self.class_id:
+            paths = self.class_repository.source_paths(self.class_id)
+        else:
+            paths = [os.path.join(project_path, name) for name in ("timetable.json", "classtableMeta.json")]
+        return paths + [os.path.join(project_path, "term_calendar.json")]
+    
+    def _start_file_watcher(self):
+        """开始监听timetable.json、classtableMeta.json和term_calendar.json"""
+        try:
+            self.file_watcher = FileWatcher(self._watched_paths())
+            print(f"课程表文件监听方式: {self.file_watcher.mode}")
+            self.file_watch_job = self.after(self.FILE_WATCH_INTERVAL_MS, self._poll_timetable_files)
+        except Exception as e:
+            print(f"启动课程表文件监听时出错: {e}")
+    
+    def _poll_timetable_files(self):
+        """检查课程表文件，内容变化时重新加载课表（只修改时间等元数据时不重新加载）"""
+        try:
+            changed = self.file_watcher.poll()
+            if changed:
+                print(f"课程表文件已更新: {', '.join(os.path.basename(path) for path in changed)}，正在重新加载")
+                self.load_timetable()
+        except Exception as e:
+            print(f"检查课程表文件时出错: {e}")
+        
+        try:
+            self.file_watch_job = self.after(self.FILE_WATCH_INTERVAL_MS, self._poll_timetable_files)
+        except Exception as e:
+            # 窗口可能已被销毁，停止检查
+            print(f"安排课程表文件检查时出错: {e}")
     
     def _show_no_timetable_dialog(self):
         """显示无课表文件对话框"""
@@ -733,183 +1019,50 @@ class DragWindow(tk.Tk):
     
     def update_info(self, now):
         """更新课程信息显示"""
-        # 获取当前星期
-        weekdays_en = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
-        weekdays_cn = ["周一", "周二", "周三", "周四", "周五", "周六", "周日"]
-        current_weekday_en = weekdays_en[now.weekday()]
-        current_weekday_cn = weekdays_cn[now.weekday()]
-        
-        # print(f"当前时间: {now}")  # 调试信息
-        # print(f"当前星期: {current_weekday_cn} ({current_weekday_en})")  # 调试信息
-        
-        # 获取当前时间和下一节课信息
-        current_class = None
-        next_class = None
-        
-        # 使用英文键访问课表
-        if current_weekday_en in self.timetable:
-            classes = self.timetable[current_weekday_en]
-            # print(f"当天课程: {classes}")  # 调试信息
-            
-            # 遍历课程查找当前和下一节课
-            for i, class_info in enumerate(classes):
-                # 跳过subject为空的课程（空白课程）
-                if not class_info["subject"].strip():
-                    continue
-                    
-                start_time = datetime.datetime.strptime(class_info["start_time"], "%H:%M").time()
-                end_time = datetime.datetime.strptime(class_info["end_time"], "%H:%M").time()
-                
-                # print(f"检查课程: {class_info['subject']} ({start_time}-{end_time})")  # 调试信息
-                # print(f"当前时间是否在课程时间段内: {start_time <= now.time() <= end_time}")  # 调试信息
-                
-                # 检查当前时间是否在课程时间段内
-                if start_time <= now.time() <= end_time:
-                    current_class = class_info
-                
-                # 查找下一节课
-                if start_time > now.time() and (next_class is None or start_time < datetime.datetime.strptime(next_class["start_time"], "%H:%M").time()):
-                    next_class = class_info
-        
-        # 应用单次课程更改（如果有）
-        if current_class:
-            # 检查是否有单次课程更改
-            if hasattr(self, 'classtable_meta') and self.classtable_meta and "single_changes" in self.classtable_meta:
-                # 星期中文到英文的映射
-                day_map = {
-                    "周一": "monday",
-                    "周二": "tuesday",
-                    "周三": "wednesday",
-                    "周四": "thursday",
-                    "周五": "friday"
-                }
-                
-                # 获取当前课程的索引
-                current_day_en = current_weekday_en
-                current_period_index = None
-                
-                # 查找当前课程在课表中的索引
-                for i, class_info in enumerate(self.timetable[current_day_en]):
-                    if class_info["start_time"] == current_class["start_time"] and class_info["end_time"] == current_class["end_time"]:
-                        current_period_index = i
-                        break
-                
-                # 如果找到了索引，检查是否有单次更改
-                if current_period_index is not None:
-                    change_key = f"{current_day_en}_{current_period_index}"
-                    if change_key in self.classtable_meta["single_changes"]:
-                        # 应用单次更改
-                        single_change = self.classtable_meta["single_changes"][change_key]
-                        current_class["subject"] = single_change["new_class"]
-        
-        # 更新当前课程信息
-        if current_class:
-            text = f"现在是:{current_class['subject']}({current_class['start_time']}-{current_class['end_time']})"
-            self.class_info_label.config(text=text)
-            self._adjust_font_size(self.class_info_label, text)
-            # print(f"当前课程: {current_class['subject']} ({current_class['start_time']}-{current_class['end_time']})")  # 调试信息
-        else:
-            # 特殊处理周末和课间休息
-            if current_weekday_en in ['saturday', 'sunday'] and not self.timetable.get(current_weekday_en):
-                text = "今天休息，无课程安排"
-                self.class_info_label.config(text=text)
-                self._adjust_font_size(self.class_info_label, text)
-            elif next_class:
-                # 计算距离下一节课的时间
-                next_class_time = datetime.datetime.strptime(next_class["start_time"], "%H:%M").time()
-                next_class_datetime = datetime.datetime.combine(now.date(), next_class_time)
-                
-                # 如果下一节课是明天的，需要调整日期
-                if next_class_datetime < now:
-                    next_class_datetime += datetime.timedelta(days=1)
-                text = "课间休息中"
-                self.class_info_label.config(text=text)
-                self._adjust_font_size(self.class_info_label, text)
-            elif self.timetable.get(current_weekday_en):
-                # 当天有课程但不在课间休息时间（第一节课前或放学后）
-                if classes:  # 确保当天有课程安排
-                    text = "今天没有课程进行中"
-                    self.class_info_label.config(text=text)
-                    self._adjust_font_size(self.class_info_label, text)
-                else:
-                    text = "今天没有课程安排"
-                    self.class_info_label.config(text=text)
-                    self._adjust_font_size(self.class_info_label, text)
-            else:
-                # 当天无课程安排
-                text = "今天没有课程安排"
-                self.class_info_label.config(text=text)
-                self._adjust_font_size(self.class_info_label, text)
-            # print("今天没有课程")  # 调试信息
+        # 由课程表引擎计算当前状态，这里只负责显示
+        state = self.schedule_engine.evaluate(now)
+        
+        # 更新当前课程信息（文字未变化时跳过）
+        if self.label_renderer.render(self.class_info_label, text=state.class_info_text):
+            self._adjust_font_size(self.class_info_label, state.class_info_text)
         
         # 更新下一节课信息
-        if next_class and current_class:  # 只有在有当前课程时才显示下一节课信息
-            # 计算距离下一节课的时间
-            next_class_time = datetime.datetime.strptime(next_class["start_time"], "%H:%M").time()
-            next_class_datetime = datetime.datetime.combine(now.date(), next_class_time)
-            
-            # 如果下一节课是明天的，需要调整日期
-            if next_class_datetime < now:
-                next_class_datetime += datetime.timedelta(days=1)
-            
-            time_diff = next_class_datetime - now
-            
-            text = f"下节课: {next_class['subject']}({next_class['start_time']})"
-            self.next_class_label.config(text=text)
-            self._adjust_font_size(self.next_class_label, text)
-            # print(f"下一节课: {next_class['subject']} ({next_class['start_time']})")  # 调试信息
-        elif next_class and not current_class:
-            # 在非课间时间显示下一节课信息（第一节课前）
-            # 计算距离下一节课的时间
-            next_class_time = datetime.datetime.strptime(next_class["start_time"], "%H:%M").time()
-            next_class_datetime = datetime.datetime.combine(now.date(), next_class_time)
-            
-            # 如果下一节课是明天的，需要调整日期
-            if next_class_datetime < now:
-                next_class_datetime += datetime.timedelta(days=1)
-            
-            time_diff = next_class_datetime - now
-            minutes_diff = int(time_diff.total_seconds() / 60)
-            
-            text = f"下一节课: {next_class['subject']} ({next_class['start_time']}) 还有{minutes_diff}分钟"
-            self.next_class_label.config(text=text)
-            self._adjust_font_size(self.next_class_label, text)
-        elif current_class and not next_class:
-            # 有当前课程但没有下一节课（这天的最后一节课）
-            text = "这是今天的最后一节课"
-            self.next_class_label.config(text=text)
-            self._adjust_font_size(self.next_class_label, text)
-            
-            # 检查是否需要清除已完成的临时调课记录
-            self._clear_completed_single_changes(current_weekday_en, now)
-        elif self.timetable.get(current_weekday_en):
-            # 当天有课程但没有当前课程也没有下一节课（已放学）
-            text = "今天课程已结束"
-            self.next_class_label.config(text=text)
-            self._adjust_font_size(self.next_class_label, text)
-            
-            # 检查是否需要清除已完成的临时调课记录
-            self._clear_completed_single_changes(current_weekday_en, now)
-        else:
-            # 即使当天没有更多课程也保持程序正常运行
-            text = "今天没有更多课程"
-            self.next_class_label.config(text=text)
-            self._adjust_font_size(self.next_class_label, text)
-            # print("今天没有更多课程")  # 调试信息
+        if self.label_renderer.render(self.next_class_label, text=state.next_class_text):
+            self._adjust_font_size(self.next_class_label, state.next_class_text)
+        
+        # 安排下一次课程状态切换时的刷新
+        self._schedule_next_transition(state.seconds_to_next_transition)
+    
+    def _schedule_next_transition(self, seconds):
+        """取消旧的刷新任务，并在seconds秒后（下一次课程状态切换时刻）刷新课程信息"""
+        try:
+            if self.info_job:
+                self.after_cancel(self.info_job)
+            # 多等待50毫秒，确保回调执行时已经越过切换时刻
+            delay_ms = int(seconds * 1000) + 50
+            self.info_job = self.after(delay_ms, self._on_transition)
+        except Exception as e:
+            # 窗口可能已被销毁，停止更新
+            print(f"安排课程信息刷新时出错: {e}")
+    
+    def _on_transition(self):
+        """课程状态切换时刷新课程信息"""
+        self.info_job = None
+        try:
+            self.update_info(datetime.datetime.now())
+        except Exception as e:
+            # 窗口可能已被销毁，停止更新
+            print(f"更新课程信息时出错: {e}")
     
     def load_window_position(self):
         """加载窗口位置"""
         try:
-            # 获取程序主目录
-            project_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-            settings_file = os.path.join(project_path, "timetable_ui_settings.json")
-            
-            # 获取屏幕分辨率
+            # 重新读取屏幕分辨率
+            self.screen_size = None
             screen_width, screen_height = self._get_screen_resolution()
             
-            if os.path.exists(settings_file):
-                with open(settings_file, 'r', encoding='utf-8') as f:
-                    settings = json.load(f)
+            if self.settings_store.exists():
+                settings = self.settings_store.snapshot()
                 
                 # 根据屏幕分辨率计算窗口位置
                 x, y = self._calculate_window_position(screen_width, screen_height, 
@@ -925,33 +1078,17 @@ class DragWindow(tk.Tk):
             print(f"加载窗口位置时出错: {e}")
     
     def save_window_position(self):
-        """保存窗口位置"""
+        """保存窗口位置（只修改内存中的设置，由设置存储延迟写入文件）"""
         try:
-            # 获取程序主目录
-            project_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-            settings_file = os.path.join(project_path, "timetable_ui_settings.json")
-            
             # 检查窗口是否仍然存在
             if self.winfo_exists():
                 # 获取当前窗口位置
                 x = self.winfo_x()
                 y = self.winfo_y()
                 
-                # 读取现有设置
-                if os.path.exists(settings_file):
-                    with open(settings_file, 'r', encoding='utf-8') as f:
-                        settings = json.load(f)
-                else:
-                    settings = {}
-                
-                # 更新位置信息
-                settings["position_x"] = x
-                settings["position_y"] = y
-                
-                # 保存设置到文件
-                with open(settings_file, 'w', encoding='utf-8') as f:
-                    json.dump(settings, f, ensure_ascii=False, indent=2)
-                print(f"窗口位置已保存: x={x}, y={y}")
+                # 更新位置信息，位置未变化时不写入
+                if self.settings_store.update(position_x=x, position_y=y):
+                    print(f"窗口位置已保存: x={x}, y={y}")
         except Exception as e:
             print(f"保存窗口位置时出错: {e}")
     
@@ -977,6 +1114,45 @@ class DragWindow(tk.Tk):
                     self.after_cancel(self.update_job)
                 except:
                     pass  # 忽略可能的异常
+            if hasattr(self, 'info_job') and self.info_job:
+                try:
+                    self.after_cancel(self.info_job)
+                except:
+                    pass  # 忽略可能的异常
+            if getattr(self, 'expiry_job', None):
+                try:
+                    self.after_cancel(self.expiry_job)
+                except:
+                    pass  # 忽略可能的异常
+            if getattr(self, 'drag_job', None):
+                try:
+                    self.after_cancel(self.drag_job)
+                except:
+                    pass  # 忽略可能的异常
+            if getattr(self, 'profile_overlay_job', None):
+                try:
+                    self.after_cancel(self.profile_overlay_job)
+                except:
+                    pass  # 忽略可能的异常
+            
+            # 停止监听课程表文件（退出时导出的文件不再触发重新加载）
+            if getattr(self, 'file_watch_job', None):
+                try:
+                    self.after_cancel(self.file_watch_job)
+                except:
+                    pass  # 忽略可能的异常
+            if getattr(self, 'file_watcher', None):
+                self.file_watcher.close()
+            
+            # 保存刷新耗时统计的直方图（路径可用环境变量TIMENEST_PROFILE_DUMP指定）
+            if getattr(self, 'tick_profiler', None):
+                try:
+                    project_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+                    dump_path = os.environ.get("TIMENEST_PROFILE_DUMP") or os.path.join(project_path, "tick_profile.json")
+                    self.tick_profiler.dump(dump_path)
+                    print(f"刷新耗时统计已保存: {dump_path}")
+                except Exception as e:
+                    print(f"保存刷新耗时统计时出错: {e}")
             
             # 取消所有可能的定时任务
             try:
@@ -986,6 +1162,20 @@ class DragWindow(tk.Tk):
             except:
                 pass
             
+            # 输出标签渲染的Tk调用统计
+            if hasattr(self, 'label_renderer'):
+                stats = self.label_renderer.stats()
+                print(f"标签刷新统计: 发出Tk调用{stats['issued']}次，跳过{stats['skipped']}次"
+                      f"（跳过比例{stats['skipped_ratio']:.1%}）")
+            if getattr(self, 'canvas_renderer', None):
+                stats = self.canvas_renderer.stats()
+                print(f"画布渲染统计: itemconfig调用{stats['itemconfig_calls']}次，"
+                      f"重新布局{stats['layout_passes']}次")
+            if hasattr(self, 'font_fit_cache'):
+                stats = self.font_fit_cache.stats()
+                print(f"字体适配统计: 缓存命中{stats['hits']}次，未命中{stats['misses']}次，"
+                      f"测量{stats['measurements']}次，字体对象{stats['fonts']}个")
+            
             # 保存窗口位置
             # 在解除事件绑定和销毁窗口之前保存位置
             try:
@@ -995,6 +1185,19 @@ class DragWindow(tk.Tk):
             except:
                 pass  # 忽略可能的异常
             
+            # 立即写入尚未保存的设置
+            if hasattr(self, 'settings_store'):
+                self.settings_store.flush()
+            
+            # 课程表数据库有改动时导出timetable.json和classtableMeta.json
+            if getattr(self, 'timetable_store', None):
+                self._close_timetable_store()
+            if getattr(self, 'class_repository', None):
+                try:
+                    self.class_repository.close()
+                except Exception as e:
+                    print(f"关闭班级课表仓库时出错: {e}")
+            
             # 解除所有事件绑定
             try:
                 # 在窗口销毁前解除所有事件绑定，不检查窗口是否存在
@@ -1055,45 +1258,27 @@ class DragWindow(tk.Tk):
                 # 忽略销毁时的异常
                 pass
 
-    def _clear_completed_single_changes(self, current_weekday_en, now):
-        """清除已完成的临时调课记录"""
-        # 检查是否有单次课程更改需要清理
-        if hasattr(self, 'classtable_meta') and self.classtable_meta and "single_changes" in self.classtable_meta:
-            # 获取当天的所有课程
-            day_classes = self.timetable.get(current_weekday_en, [])
-            
-            # 如果当天没有课程，则直接返回
-            if not day_classes:
-                return
-            
-            # 检查当天的最后一节课是否已经结束
-            last_class = day_classes[-1]
-            last_class_end_time = datetime.datetime.strptime(last_class["end_time"], "%H:%M").time()
-            
-            # 如果当前时间已经超过了最后一节课的结束时间，则清理当天的临时调课记录
-            if now.time() > last_class_end_time:
-                # 收集需要删除的键
-                keys_to_remove = []
-                for key in self.classtable_meta["single_changes"]:
-                    # 检查键是否以当前星期开头
-                    if key.startswith(current_weekday_en + "_"):
-                        keys_to_remove.append(key)
-                
-                # 删除收集到的键
-                for key in keys_to_remove:
-                    del self.classtable_meta["single_changes"][key]
-                
-                # 如果single_changes为空，则删除该字段
-                if not self.classtable_meta["single_changes"]:
-                    del self.classtable_meta["single_changes"]
-                
-                # 保存更新后的classtable_meta到文件
-                try:
-                    # 获取程序主目录
-                    project_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-                    classtable_meta_file = os.path.join(project_path, "classtableMeta.json")
-                    
-                    with open(classtable_meta_file, 'w', encoding='utf-8') as f:
-                        json.dump(self.classtable_meta, f, ensure_ascii=False, indent=2)
-                except Exception as e:
-                    print(f"保存classtableMeta.json时出错: {e}")
+    def _purge_expired_single_changes(self):
+        """删除今天之前的临时调课记录，并安排在下一个午夜后再次执行（启动时执行一次，补上错过的日期）"""
+        try:
+            if self.expiry_job:
+                self.after_cancel(self.expiry_job)
+                self.expiry_job = None
+            today = datetime.date.today()
+            expired = self.schedule_engine.purge_single_changes_before(today)
+            self.classtable_meta = self.schedule_engine.classtable_meta
+            purged = self.timetable_store.purge_single_changes_before(today)
+            if expired or purged:
+                print(f"已清除{max(len(expired), purged)}条过期的临时调课记录")
+        except Exception as e:
+            print(f"清除过期的临时调课记录时出错: {e}")
+        
+        try:
+            now = datetime.datetime.now()
+            next_midnight = datetime.datetime.combine(now.date() + datetime.timedelta(days=1), datetime.time())
+            # 多等待1秒，确保执行时已经是新的一天
+            delay_ms = int((next_midnight - now).total_seconds() * 1000) + 1000
+            self.expiry_job = self.after(delay_ms, self._purge_expired_single_changes)
+        except Exception as e:
+            # 窗口可能已被销毁，停止清除
+            print(f"安排清除过期的临时调课记录时出错: {e}")
@@ -1,7 +1,6 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
-import json
-import os
+import datetime
 
 
 class NewTimetableWizard:
@@ -35,27 +34,44 @@ class NewTimetableWizard:
         # 当前选中的星期
         self.current_day = "monday"
         
+        # 单双周等轮换设置：轮换周数、第1周的起始日期，以及第2周起与基础课表不同的日期
+        self.cycle_weeks = 1
+        self.rotation_start = ""
+        self.rotation_weeks = {}
+        
+        # 当前编辑的轮换周（第1周即基础课表）
+        self.current_week = 1
+        
         # 课程框架列表
         self.class_frames = []
+        
+        # 编辑的班级，默认为悬浮窗显示的班级
+        self.class_id = getattr(main_window, 'class_id', "")
     
     def load_existing_data(self):
         """加载现有数据到UI"""
         try:
-            # 获取项目目录
-            project_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-            data_file_path = os.path.join(project_path, "timetable.json")
-            
-            # 如果文件不存在，直接返回
-            if not os.path.exists(data_file_path):
+            # 从所选班级的课程表数据库读取，还没有课表时直接返回
+            store = self.main_window.store_for_class(self.class_id)
+            if store.is_empty():
                 return
             
-            # 读取现有数据
-            with open(data_file_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
+            # 读取现有数据（timetable.json格式）
+            data = store.export_timetable()
             
             # 加载时间表数据
             if "timetable" in data:
                 self.timetable_data = data["timetable"]
+            
+            # 加载轮换设置
+            if "rotation" in data:
+                rotation = data["rotation"]
+                self.cycle_weeks = int(rotation.get("cycle_weeks", 1))
+                self.rotation_start = rotation.get("start_date", "")
+                self.rotation_weeks = rotation.get("weeks", {})
+                self.cycle_weeks_var.set(str(self.cycle_weeks))
+                self.rotation_start_var.set(self.rotation_start)
+                self.update_week_combo()
         except Exception as e:
             print(f"加载现有数据时出错: {e}")
             messagebox.showerror("错误", f"加载现有数据时出错: {e}")
@@ -71,58 +87,38 @@ class NewTimetableWizard:
                 messagebox.showerror("错误", "存在无效的时间格式，请检查所有开始时间和结束时间")
                 return
             
-            # 获取项目目录
-            project_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-            data_file_path = os.path.join(project_path, "timetable.json")
+            # 验证轮换设置
+            if not self.read_rotation_settings():
+                return
             
-            # 保存数据为timetable.json格式
+            # 按timetable.json格式整理数据
             data = {
                 "timetable": self.timetable_data
             }
             
-            # 确保使用UTF-8编码保存
-            with open(data_file_path, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
-            
-            # 同时保存classtableMeta.json以保持兼容性
-            meta_file_path = os.path.join(project_path, "classtableMeta.json")
-            meta_data = {
-                "timetable": {},
-                "classtable": {},
-                "allclass": []
-            }
-            
-            # 提取时间信息和课程信息
-            weekdays = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
-            all_classes = set()
+            # 轮换周数大于1时保存轮换设置，只保存不超过轮换周数的周
+            if self.cycle_weeks > 1:
+                data["rotation"] = {
+                    "start_date": self.rotation_start,
+                    "cycle_weeks": self.cycle_weeks,
+                    "weeks": {
+                        week: days for week, days in self.rotation_weeks.items()
+                        if days and int(week) <= self.cycle_weeks
+                    }
+                }
             
-            for day in weekdays:
-                if day in self.timetable_data:
-                    # 提取时间信息
-                    meta_data["timetable"][day] = [
-                        {"start_time": slot.get("start_time", ""), "end_time": slot.get("end_time", "")}
-                        for slot in self.timetable_data[day]
-                    ]
-                    
-                    # 提取课程信息
-                    meta_data["classtable"][day] = [slot.get("subject", "") for slot in self.timetable_data[day]]
-                    
-                    # 收集所有课程
-                    all_classes.update(meta_data["classtable"][day])
-            
-            # 设置allclass
-            meta_data["allclass"] = list(all_classes)
-            
-            # 确保使用UTF-8编码保存
-            with open(meta_file_path, 'w', encoding='utf-8') as f:
-                json.dump(meta_data, f, ensure_ascii=False, indent=2)
+            # 保存到所选班级的课程表数据库，只改写有变化的日期（作息时间和临时调课记录保持不变）；
+            # 输入了新的班级名时创建该班级
+            class_id = self.main_window.class_id_of(self.class_id_var.get())
+            self.main_window.store_for_class(class_id).replace_timetable(data)
+            self.class_id = class_id
             
             # 显示成功消息
             messagebox.showinfo("成功", "时间表已保存成功！")
             
-            # 更新主窗口的时间表
-            if self.main_window and hasattr(self.main_window, 'load_timetable'):
-                self.main_window.load_timetable()
+            # 保存的是悬浮窗显示的班级时更新主窗口的时间表
+            if self.main_window and hasattr(self.main_window, 'reload_class'):
+                self.main_window.reload_class(class_id)
         except Exception as e:
             print(f"保存数据时出错: {e}")
             messagebox.showerror("错误", f"保存数据时出错: {e}")
@@ -132,8 +128,11 @@ class NewTimetableWizard:
         # 验证当前编辑的日期数据
         self.save_current_day_data()
         
-        # 验证所有日期的时间格式
-        for day, classes in self.timetable_data.items():
+        # 验证所有日期（包括各轮换周）的时间格式
+        all_days = list(self.timetable_data.values())
+        for days in self.rotation_weeks.values():
+            all_days.extend(days.values())
+        for classes in all_days:
             for class_info in classes:
                 start_time = class_info.get("start_time", "")
                 end_time = class_info.get("end_time", "")
@@ -148,6 +147,28 @@ class NewTimetableWizard:
         
         return True
     
+    def read_rotation_settings(self):
+        """读取并验证轮换周数和起始日期"""
+        try:
+            cycle_weeks = int(self.cycle_weeks_var.get())
+        except ValueError:
+            cycle_weeks = 0
+        if not 1 <= cycle_weeks <= 4:
+            messagebox.showerror("错误", "轮换周数应为1到4之间的整数")
+            return False
+        
+        rotation_start = self.rotation_start_var.get().strip()
+        if cycle_weeks > 1:
+            try:
+                datetime.datetime.strptime(rotation_start, "%Y-%m-%d")
+            except ValueError:
+                messagebox.showerror("错误", "请按YYYY-MM-DD格式填写第1周中的任意一天")
+                return False
+        
+        self.cycle_weeks = cycle_weeks
+        self.rotation_start = rotation_start
+        return True
+    
     def is_valid_time_format(self, time_str):
         """验证时间格式是否为HH:MM"""
         if not time_str or not isinstance(time_str, str):
@@ -185,7 +206,7 @@ class NewTimetableWizard:
         # 创建新窗口
         self.window = tk.Toplevel(self.parent)
         self.window.title("时间表设置向导 - 自定义上下课时间")
-        self.window.geometry("800x600")
+        self.window.geometry("800x710")
         self.window.iconbitmap("TKtimetable.ico")
         self.window.wm_iconbitmap("TKtimetable.ico")
         self.window.resizable(False, False)
@@ -221,6 +242,37 @@ class NewTimetableWizard:
         title_label = ttk.Label(main_frame, text="时间表设置 - 自定义每节课上下课时间", font=("Arial", 16, "bold"))
         title_label.pack(pady=(0, 20))
         
+        # 班级选择，输入新的班级名并保存即可创建班级
+        class_frame = ttk.Frame(main_frame)
+        class_frame.pack(fill=tk.X, pady=(0, 10))
+        ttk.Label(class_frame, text="班级:").pack(side=tk.LEFT, padx=5)
+        self.class_id_var = tk.StringVar(value=self.main_window.class_label_of(self.class_id))
+        self.class_id_combo = ttk.Combobox(class_frame, textvariable=self.class_id_var, width=20,
+                                           values=self.main_window.class_choices())
+        self.class_id_combo.pack(side=tk.LEFT, padx=5)
+        self.class_id_combo.bind('<<ComboboxSelected>>', self.switch_class)
+        
+        # 轮换设置框架（单双周等）
+        rotation_frame = ttk.LabelFrame(main_frame, text="单双周/轮换", padding="10")
+        rotation_frame.pack(fill=tk.X, pady=(0, 10))
+        
+        ttk.Label(rotation_frame, text="轮换周数:").grid(row=0, column=0, padx=5)
+        self.cycle_weeks_var = tk.StringVar(value=str(self.cycle_weeks))
+        cycle_weeks_spinbox = ttk.Spinbox(rotation_frame, from_=1, to=4, width=5,
+                                          textvariable=self.cycle_weeks_var, command=self.update_week_combo)
+        cycle_weeks_spinbox.grid(row=0, column=1, padx=5)
+        
+        ttk.Label(rotation_frame, text="第1周中的日期:").grid(row=0, column=2, padx=5)
+        self.rotation_start_var = tk.StringVar(value=self.rotation_start)
+        ttk.Entry(rotation_frame, textvariable=self.rotation_start_var, width=12).grid(row=0, column=3, padx=5)
+        
+        ttk.Label(rotation_frame, text="编辑:").grid(row=0, column=4, padx=5)
+        self.week_var = tk.StringVar(value="第1周")
+        self.week_combo = ttk.Combobox(rotation_frame, textvariable=self.week_var, state="readonly", width=8)
+        self.week_combo.grid(row=0, column=5, padx=5)
+        self.week_combo.bind('<<ComboboxSelected>>', self.switch_week)
+        self.update_week_combo()
+        
         # 星期选择框架
         day_frame = ttk.LabelFrame(main_frame, text="选择星期", padding="10")
         day_frame.pack(fill=tk.X, pady=(0, 20))
@@ -319,6 +371,48 @@ class NewTimetableWizard:
         cancel_button = ttk.Button(button_frame, text="取消", command=self.window.destroy)
         cancel_button.pack(side=tk.RIGHT, padx=5)
 
+    def switch_class(self, event=None):
+        """切换编辑的班级，重新读取该班级的课表（未保存的修改会丢弃）"""
+        self.class_id = self.main_window.class_id_of(self.class_id_var.get())
+        self.timetable_data = {day: [] for day in self.day_names}
+        self.cycle_weeks = 1
+        self.rotation_start = ""
+        self.rotation_weeks = {}
+        self.cycle_weeks_var.set("1")
+        self.rotation_start_var.set("")
+        self.current_week = 1
+        self.week_var.set("第1周")
+        self.update_week_combo()
+        self.load_existing_data()
+        self.display_day_classes()
+    
+    def update_week_combo(self):
+        """根据轮换周数更新可编辑的轮换周"""
+        try:
+            cycle_weeks = max(1, min(4, int(self.cycle_weeks_var.get())))
+        except ValueError:
+            cycle_weeks = 1
+        self.week_combo['values'] = [f"第{week}周" for week in range(1, cycle_weeks + 1)]
+        
+        # 当前编辑的周超出轮换周数时回到第1周
+        if self.current_week > cycle_weeks:
+            self.week_var.set("第1周")
+            self.switch_week()
+    
+    def switch_week(self, event=None):
+        """切换编辑的轮换周"""
+        # 保存当前星期的数据
+        self.save_current_day_data()
+        
+        self.current_week = int(self.week_var.get().replace("第", "").replace("周", ""))
+        self.display_day_classes()
+    
+    def get_day_classes(self, week, day):
+        """获取某个轮换周某天的课程，第2周起没有单独设置的日期沿用基础课表"""
+        if week > 1 and day in self.rotation_weeks.get(str(week), {}):
+            return self.rotation_weeks[str(week)][day]
+        return self.timetable_data.get(day, [])
+    
     def switch_day(self, day):
         """切换星期"""
         # 保存当前星期的数据
@@ -346,8 +440,8 @@ class NewTimetableWizard:
             frame.destroy()
         self.class_frames.clear()
         
-        # 添加当前星期的课程
-        classes = self.timetable_data.get(self.current_day, [])
+        # 添加当前轮换周当前星期的课程
+        classes = self.get_day_classes(self.current_week, self.current_day)
         for i, class_info in enumerate(classes):
             self.create_class_frame(i+1, class_info)
     
@@ -614,7 +708,13 @@ class NewTimetableWizard:
             classes.append(class_data)
         
         # 保存到数据结构
-        self.timetable_data[self.current_day] = classes
+        if self.current_week == 1:
+            self.timetable_data[self.current_day] = classes
+        elif classes == self.timetable_data.get(self.current_day, []):
+            # 与基础课表相同时不单独保存
+            self.rotation_weeks.get(str(self.current_week), {}).pop(self.current_day, None)
+        else:
+            self.rotation_weeks.setdefault(str(self.current_week), {})[self.current_day] = classes
     
     def save_and_close(self):
         """保存并关闭"""
@@ -1,7 +1,7 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
-import json
-import os
+import datetime
+from core.schedule_engine import rotation_day_key, single_change_key
 
 # 此文件是临时调课窗口文件和类
 class TempClassChangeWindow:
@@ -11,47 +11,30 @@ class TempClassChangeWindow:
         self.window = None
         self.classtable_meta = None
         self.single_change_var = tk.BooleanVar(value=True)
+        # 要调课的班级，默认为悬浮窗显示的班级
+        self.class_id = getattr(main_window, 'class_id', "")
         
-        # 加载classtableMeta.json
+        # 加载课程表数据
         self.load_classtable_meta()
     
     def load_classtable_meta(self):
-        """加载classtableMeta.json文件"""
+        """从所选班级的课程表数据库读取classtableMeta格式的数据"""
         try:
-            # 获取项目目录
-            project_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-            meta_file_path = os.path.join(project_path, "classtableMeta.json")
-            
-            if os.path.exists(meta_file_path):
-                with open(meta_file_path, 'r', encoding='utf-8') as f:
-                    self.classtable_meta = json.load(f)
-            else:
-                messagebox.showerror("错误", "未找到classtableMeta.json文件")
+            store = self.main_window.store_for_class(self.class_id)
+            if store.is_empty():
+                messagebox.showerror("错误", "未找到课程表，请先设置课表")
                 return False
+            self.classtable_meta = store.export_classtable_meta()
         except Exception as e:
-            messagebox.showerror("错误", f"加载classtableMeta.json时出错: {e}")
+            messagebox.showerror("错误", f"加载课程表时出错: {e}")
             return False
         
         return True
     
-    def save_classtable_meta(self):
-        """保存classtableMeta.json文件"""
-        try:
-            # 获取项目目录
-            project_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-            meta_file_path = os.path.join(project_path, "classtableMeta.json")
-            
-            with open(meta_file_path, 'w', encoding='utf-8') as f:
-                json.dump(self.classtable_meta, f, ensure_ascii=False, indent=2)
-            
-            # 同时更新timetable.json
-            timetable_file_path = os.path.join(project_path, "timetable.json")
-            self.main_window._convert_classtable_meta_to_timetable(meta_file_path, timetable_file_path)
-            
-            return True
-        except Exception as e:
-            messagebox.showerror("错误", f"保存classtableMeta.json时出错: {e}")
-            return False
+    def reload_main_window(self):
+        """主窗口只在课程状态切换时刷新，保存的是悬浮窗显示的班级时需要重新加载课表才能立即生效"""
+        if hasattr(self.main_window, 'reload_class'):
+            self.main_window.reload_class(self.class_id)
     
     def open_window(self):
         """打开临时调课界面"""
@@ -64,7 +47,7 @@ class TempClassChangeWindow:
         # 创建新窗口
         self.window = tk.Toplevel(self.parent)
         self.window.title("临时调课")
-        self.window.geometry("400x300")
+        self.window.geometry("400x340")
         self.window.resizable(False, False)
         self.window.iconbitmap("TKtimetable.ico")
         self.window.wm_iconbitmap("TKtimetable.ico")
@@ -90,9 +73,19 @@ class TempClassChangeWindow:
     
     def create_widgets(self):
         """创建界面元素"""
+        # 班级选择
+        class_frame = ttk.Frame(self.window, padding=(10, 10, 10, 0))
+        class_frame.grid(row=0, column=0, sticky=(tk.W, tk.E))
+        ttk.Label(class_frame, text="班级:").grid(row=0, column=0, sticky=tk.W)
+        self.class_id_var = tk.StringVar(value=self.main_window.class_label_of(self.class_id))
+        self.class_id_combo = ttk.Combobox(class_frame, textvariable=self.class_id_var, state="readonly", width=20,
+                                           values=self.main_window.class_choices())
+        self.class_id_combo.grid(row=0, column=1, sticky=tk.W, padx=(5, 0))
+        self.class_id_combo.bind('<<ComboboxSelected>>', self.on_class_selected)
+        
         # 主框架
         main_frame = ttk.Frame(self.window, padding="10")
-        main_frame.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+        main_frame.grid(row=1, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
         
         # 被调课的课程选择
         ttk.Label(main_frame, text="被调课的课程:").grid(row=0, column=0, sticky=tk.W, pady=5)
@@ -109,6 +102,12 @@ class TempClassChangeWindow:
         self.period_combo = ttk.Combobox(main_frame, textvariable=self.period_var, state="readonly", width=10)
         self.period_combo.grid(row=1, column=3, sticky=tk.W, padx=(5, 0), pady=5)
         
+        # 轮换周选择（单双周等，仅在设置了轮换时可选）
+        ttk.Label(main_frame, text="轮换周:").grid(row=0, column=2, sticky=tk.W, padx=(10, 0))
+        self.week_var = tk.StringVar(value="第1周")
+        self.week_combo = ttk.Combobox(main_frame, textvariable=self.week_var, state="readonly", width=10)
+        self.week_combo.grid(row=0, column=3, sticky=tk.W, padx=(5, 0), pady=5)
+        
         # 更改后的课程选择
         ttk.Label(main_frame, text="更改后的课程:").grid(row=2, column=0, sticky=tk.W, pady=(10, 5))
         
@@ -136,6 +135,7 @@ class TempClassChangeWindow:
         
         # 绑定选择事件
         self.day_combo.bind('<<ComboboxSelected>>', self.on_day_selected)
+        self.week_combo.bind('<<ComboboxSelected>>', self.on_day_selected)
     
     def populate_data(self):
         """填充数据"""
@@ -146,6 +146,12 @@ class TempClassChangeWindow:
         days = ["周一", "周二", "周三", "周四", "周五"]
         self.day_combo['values'] = days
         
+        # 填充轮换周选择
+        cycle_weeks = int(self.classtable_meta.get("rotation", {}).get("cycle_weeks", 1))
+        self.week_combo['values'] = [f"第{week}周" for week in range(1, cycle_weeks + 1)]
+        if cycle_weeks <= 1:
+            self.week_combo.config(state="disabled")
+        
         # 填充课程选择
         all_classes = self.classtable_meta.get("allclass", [])
         self.class_combo['values'] = all_classes
@@ -155,11 +161,35 @@ class TempClassChangeWindow:
             self.day_var.set(days[0])
             self.update_period_combo(days[0])
     
+    def on_class_selected(self, event=None):
+        """切换班级时重新读取该班级的课表"""
+        self.class_id = self.main_window.class_id_of(self.class_id_var.get())
+        self.classtable_meta = None
+        if self.load_classtable_meta():
+            self.week_combo.config(state="readonly")
+            self.week_var.set("第1周")
+            self.populate_data()
+    
     def on_day_selected(self, event=None):
         """当选择星期时更新节次选择"""
         selected_day = self.day_var.get()
         self.update_period_combo(selected_day)
     
+    def get_selected_week(self):
+        """获取选择的轮换周（从1开始）"""
+        try:
+            return int(self.week_var.get().replace("第", "").replace("周", ""))
+        except ValueError:
+            return 1
+    
+    def get_week_classtable(self, week, day_en):
+        """获取某个轮换周某天的课程列表，没有单独设置时沿用基础课表"""
+        if week > 1:
+            week_meta = self.classtable_meta.get("rotation", {}).get("weeks", {}).get(str(week), {})
+            if day_en in week_meta.get("classtable", {}):
+                return week_meta["classtable"][day_en]
+        return self.classtable_meta.get("classtable", {}).get(day_en, [])
+    
     def update_period_combo(self, day_cn):
         """更新节次选择框"""
         # 星期中文到英文的映射
@@ -175,7 +205,7 @@ class TempClassChangeWindow:
         
         # 获取该天的课程数量
         if self.classtable_meta and "classtable" in self.classtable_meta:
-            periods = self.classtable_meta["classtable"].get(day_en, [])
+            periods = self.get_week_classtable(self.get_selected_week(), day_en)
             # 确保至少显示8节课
             max_periods = max(8, len(periods))
             period_values = [f"第{i+1}节" for i in range(max_periods)]
@@ -216,21 +246,24 @@ class TempClassChangeWindow:
             return
         
         # 检查节次索引是否有效
+        week = self.get_selected_week()
         if day_en not in self.classtable_meta.get("classtable", {}) or \
-           period_index >= len(self.classtable_meta["classtable"][day_en]):
+           period_index >= len(self.get_week_classtable(week, day_en)):
             messagebox.showerror("错误", "选择的节次超出范围")
             return
         
-        # 保存更改
+        # 保存更改，保存失败时保留窗口
         if self.single_change_var.get():
             # 仅修改单次课程
-            self.save_single_change(day_en, period_index, selected_class)
+            message = self.save_single_change(day_en, period_index, selected_class, week)
         else:
             # 修改永久课程
-            self.save_permanent_change(day_en, period_index, selected_class)
+            message = self.save_permanent_change(day_en, period_index, selected_class, week)
+        if not message:
+            return
         
         # 显示成功消息
-        messagebox.showinfo("成功", "课程调整已保存")
+        messagebox.showinfo("成功", message)
         
         # 关闭窗口
         self._cleanup_resources()
@@ -242,6 +275,8 @@ class TempClassChangeWindow:
             # 解除所有事件绑定
             try:
                 self.day_combo.unbind('<<ComboboxSelected>>')
+                self.week_combo.unbind('<<ComboboxSelected>>')
+                self.class_id_combo.unbind('<<ComboboxSelected>>')
             except:
                 pass
             
@@ -278,31 +313,33 @@ class TempClassChangeWindow:
         except Exception as e:
             print(f"清理临时调课界面资源时出错: {e}")
     
-    def save_single_change(self, day_en, period_index, new_class):
-        """保存单次课程更改"""
-        # 对于单次课程更改，我们可以在classtableMeta.json中添加一个特殊字段来记录
-        # 这里简化处理，直接修改classtable，但在实际应用中可能需要更复杂的逻辑
-        if "single_changes" not in self.classtable_meta:
-            self.classtable_meta["single_changes"] = {}
-        
-        # 记录单次更改
-        change_key = f"{day_en}_{period_index}"
-        self.classtable_meta["single_changes"][change_key] = {
-            "original_class": self.classtable_meta["classtable"][day_en][period_index],
-            "new_class": new_class
-        }
+    def save_single_change(self, day_en, period_index, new_class, week=1):
+        """保存单次课程更改，只对今天或之后第一个使用所选星期（和轮换周）课表、且这节课还没有结束的日期生效，返回提示文字"""
+        # 按日期记录单次更改（如"2026-10-19_0"），过了这一天后由主窗口每天的清除任务删除
+        date = self.main_window.engine_for_class(self.class_id).next_change_date(rotation_day_key(day_en, week),
+                                                                               period_index, datetime.datetime.now())
+        if date is None:
+            messagebox.showerror("错误", "一年内没有使用所选课表的日期")
+            return None
+        try:
+            self.main_window.store_for_class(self.class_id).set_single_change(
+                single_change_key(date, period_index), self.get_week_classtable(week, day_en)[period_index], new_class)
+        except Exception as e:
+            messagebox.showerror("错误", f"保存临时调课时出错: {e}")
+            return None
         
-        # 保存文件
-        self.save_classtable_meta()
+        self.reload_main_window()
+        return f"{date.month}月{date.day}日的课程调整已保存"
     
-    def save_permanent_change(self, day_en, period_index, new_class):
-        """保存永久课程更改"""
-        # 直接修改classtable
-        self.classtable_meta["classtable"][day_en][period_index] = new_class
-        
-        # 如果新课程不在allclass中，添加到allclass
-        if new_class not in self.classtable_meta.get("allclass", []):
-            self.classtable_meta["allclass"].append(new_class)
+    def save_permanent_change(self, day_en, period_index, new_class, week=1):
+        """保存永久课程更改，返回提示文字"""
+        # 只更新数据库中这一节课的课程名（轮换周这天没有单独设置时先从基础课表复制一份），
+        # 新课程会同时加入课程名列表
+        try:
+            self.main_window.store_for_class(self.class_id).set_period_subject(week, day_en, period_index, new_class)
+        except Exception as e:
+            messagebox.showerror("错误", f"保存课程更改时出错: {e}")
+            return None
         
-        # 保存文件
-        self.save_classtable_meta()
\ No newline at end of file
+        self.reload_main_window()
+        return "课程调整已保存"
\ No newline at end of file
@@ -72,6 +72,10 @@ class TrayManager:
             MenuItem('临时调课', self.open_temp_class_change),
             MenuItem('UI设置', self.open_ui_settings),
             MenuItem('编辑课表和时间表', self.open_timetable_wizard),
+            MenuItem('导出日历文件', self.export_calendar_file),
+            MenuItem('切换班级', self.open_class_selector),
+            MenuItem('显示/隐藏耗时统计', self.toggle_profile_overlay,
+                     visible=lambda item: getattr(self.root_window, 'tick_profiler', None) is not None),
             MenuItem('退出', self.quit_window)
         )
         
@@ -186,6 +190,27 @@ class TrayManager:
         except Exception as e:
             print(f"打开时间表设置向导时出错: {e}")
     
+    def export_calendar_file(self, icon, item):
+        # 在主线程中打开保存对话框并导出
+        try:
+            self.root_window.after(0, self.root_window.export_calendar_file)
+        except Exception as e:
+            print(f"导出日历文件时出错: {e}")
+    
+    def open_class_selector(self, icon, item):
+        # 在主线程中打开班级选择窗口
+        try:
+            self.root_window.after(0, self.root_window.open_class_selector)
+        except Exception as e:
+            print(f"打开班级选择窗口时出错: {e}")
+    
+    def toggle_profile_overlay(self, icon, item):
+        # 在主线程中切换耗时统计浮层
+        try:
+            self.root_window.after(0, self.root_window.toggle_profile_overlay)
+        except Exception as e:
+            print(f"切换耗时统计浮层时出错: {e}")
+    
     def quit_window(self, icon, item):
         # 退出程序
         try:
@@ -1,7 +1,5 @@
 import tkinter as tk
 from tkinter import ttk, colorchooser
-import json
-import os
 
 class UISettings:
     def __init__(self, parent, drag_window):
@@ -32,7 +30,8 @@ class UISettings:
             "class_info_font_size": 12,
             "next_class_font_size": 12,
             "window_width": 280,
-            "window_height": 65
+            "window_height": 65,
+            "renderer": "label"
         }
         
         self.create_widgets()
@@ -168,15 +167,11 @@ class UISettings:
         tk.Button(button_frame, text="确定", command=self.save_and_close).pack(side=tk.RIGHT, padx=5)
     
     def load_settings(self):
-        """加载设置"""
+        """加载设置（从主窗口的设置存储读取，不再重新解析设置文件）"""
         try:
-            # 获取程序主目录
-            project_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-            settings_file = os.path.join(project_path, "timetable_ui_settings.json")
-            
-            if os.path.exists(settings_file):
-                with open(settings_file, 'r', encoding='utf-8') as f:
-                    self.settings = json.load(f)
+            settings_store = self.drag_window.settings_store
+            if settings_store.exists():
+                self.settings = settings_store.snapshot()
                 
                 # 确保所有设置项都存在
                 if "time_font_size" not in self.settings:
@@ -208,12 +203,8 @@ class UISettings:
             print(f"加载设置时出错: {e}")
     
     def save_settings(self):
-        """保存设置"""
+        """保存设置（写入主窗口的设置存储，由其延迟合并写入文件）"""
         try:
-            # 获取程序主目录
-            project_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-            settings_file = os.path.join(project_path, "timetable_ui_settings.json")
-            
             # 更新设置值
             self.settings["transparency"] = self.transparency_scale.get()
             self.settings["show_next_class"] = self.show_next_class_var.get()
@@ -228,8 +219,9 @@ class UISettings:
             self.settings["window_width"] = int(175 * scale_factor)
             self.settings["window_height"] = int(50 * scale_factor)
             
-            with open(settings_file, 'w', encoding='utf-8') as f:
-                json.dump(self.settings, f, ensure_ascii=False, indent=2)
+            # 窗口位置由主窗口拖动时保存，不用打开设置界面时读到的旧位置覆盖
+            self.drag_window.settings_store.update({key: value for key, value in self.settings.items()
+                                                    if key not in ("position_x", "position_y")})
         except Exception as e:
             print(f"保存设置时出错: {e}")
     